@@ -1,10 +1,19 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-import uuid
+
+from utils.time_utils import intervention_date_to_minutes, duree_to_minutes, iso_to_minutes
+from utils.stable_ids import visit_id, intervenant_id
+
+# Couleurs du calendrier: une couleur de la palette par intervenant, rouge pour les visites non planifiables
+INTERVENANT_COLORS = [
+    "#32a852", "#3b82f6", "#f59e0b", "#8b5cf6", "#ef4444",
+    "#06b6d4", "#84cc16", "#f97316", "#ec4899", "#6366f1"
+]
+NON_PLANIFIABLE_COLOR = "#ff6b6b"
 
 class Intervention(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = ""  # Par défaut: empreinte de (client, début, lieu), identique d'un import à l'autre
     client: str
     date: str  # Format: "29/06/2025 08:00"
     duree: str  # Format: "01:00"
@@ -14,9 +23,36 @@ class Intervention(BaseModel):
     binome: bool = False  # Si intervention nécessite 2 intervenants
     intervenant_referent: Optional[str] = ""  # Intervenant préféré pour ce client
     secteur: Optional[str] = ""  # Ville/secteur (peut être détecté depuis les coordonnées)
+    # Horaires pré-calculés (minutes depuis l'epoch), non sérialisés: l'API expose date et duree
+    start_minutes: Optional[int] = Field(default=None, exclude=True)
+    duree_minutes: Optional[int] = Field(default=None, exclude=True)
+
+    @model_validator(mode='after')
+    def _parse_schedule(self) -> 'Intervention':
+        # Calculés en masse à l'import des fichiers, sinon une seule fois ici (None si illisible)
+        if self.start_minutes is None:
+            try:
+                self.start_minutes = intervention_date_to_minutes(self.date)
+            except (ValueError, AttributeError):
+                pass
+        if self.duree_minutes is None:
+            try:
+                self.duree_minutes = duree_to_minutes(self.duree)
+            except (ValueError, AttributeError):
+                pass
+        if not self.id:
+            self.id = visit_id(self.client, self.start_minutes if self.start_minutes is not None else self.date,
+                               self.latitude, self.longitude)
+        return self
+
+    @property
+    def end_minutes(self) -> Optional[int]:
+        if self.start_minutes is None or self.duree_minutes is None:
+            return None
+        return self.start_minutes + self.duree_minutes
     
 class Intervenant(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = ""  # Par défaut: empreinte du nom
     nom_prenom: str
     latitude: float
     longitude: float
@@ -26,8 +62,14 @@ class Intervenant(BaseModel):
     specialites: List[str] = []  # ["volant", "14h-22h_only"] pour cas spéciaux
     roulement_weekend: Optional[str] = ""  # "A", "B" ou "exempt"
 
+    @model_validator(mode='after')
+    def _default_id(self) -> 'Intervenant':
+        if not self.id:
+            self.id = intervenant_id(self.nom_prenom)
+        return self
+
 class PlanningEvent(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = ""  # Par défaut: même empreinte que l'intervention placée à cet horaire
     client: str
     intervenant: str
     start: str  # Format ISO: "2025-06-29T08:00"
@@ -38,6 +80,47 @@ class PlanningEvent(BaseModel):
     latitude: float
     longitude: float
     raison: Optional[str] = None  # Si non planifiable
+    binome_id: Optional[str] = None  # Identifiant commun aux deux événements d'un binôme
+    _parsed: Dict[str, Tuple[str, int]] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode='after')
+    def _default_id(self) -> 'PlanningEvent':
+        if not self.id:
+            try:
+                start = self.start_minutes
+            except ValueError:
+                start = self.start
+            self.id = visit_id(self.client, start, self.latitude, self.longitude)
+        return self
+
+    def _minutes(self, field: str) -> int:
+        # Horaire ISO converti une fois, reconverti seulement si la chaîne a été modifiée
+        value = getattr(self, field)
+        cached = self._parsed.get(field)
+        if cached is None or cached[0] != value:
+            cached = (value, iso_to_minutes(value))
+            self._parsed[field] = cached
+        return cached[1]
+
+    @property
+    def start_minutes(self) -> int:
+        """Début en minutes depuis l'epoch (ValueError si la date ISO est illisible)"""
+        return self._minutes('start')
+
+    @property
+    def end_minutes(self) -> int:
+        """Fin en minutes depuis l'epoch (ValueError si la date ISO est illisible)"""
+        return self._minutes('end')
+
+class IntervenantWorkload(BaseModel):
+    intervenant: str
+    minutes_travail: int  # Temps d'intervention sur la période planifiée
+    minutes_trajet: int  # Temps de trajet sur la période planifiée
+    contrat_hebdo_minutes: Optional[int] = None
+    contrat_mensuel_minutes: Optional[int] = None
+    utilisation_hebdo: float = 0.0  # % du contrat, semaine ISO la plus chargée
+    utilisation_mensuelle: float = 0.0  # % du contrat, mois le plus chargé
+    depassements: List[str] = []  # Ex: "Semaine 2025-W27: 37h10 / 35h00"
 
 class PlanningStats(BaseModel):
     total_interventions: int
@@ -45,12 +128,15 @@ class PlanningStats(BaseModel):
     interventions_non_planifiables: int
     intervenants: int
     taux_planification: float
+    depassements_horaires: int = 0  # Nombre de semaines/mois au-delà du contrat
+    charge_intervenants: List[IntervenantWorkload] = []
 
 class PlanningResponse(BaseModel):
     success: bool
     message: str
     planning: List[PlanningEvent]
     stats: PlanningStats
+    planning_id: Optional[str] = None  # Identifiant du planning conservé côté serveur (exports sans renvoi)
 
 class FileUploadResponse(BaseModel):
     success: bool
@@ -62,4 +148,77 @@ class ExportResponse(BaseModel):
     success: bool
     message: str
     filename: str
-    download_url: Optional[str] = None
\ No newline at end of file
+    download_url: Optional[str] = None
+
+class ModifiedIntervention(BaseModel):
+    event_id: str  # ID de l'événement de planning à remplacer
+    intervention: Intervention
+
+class PlanningDelta(BaseModel):
+    added: List[Intervention] = []
+    removed: List[str] = []  # IDs des événements de planning à retirer
+    modified: List[ModifiedIntervention] = []
+    unavailable_intervenants: List[str] = []  # Noms des intervenants indisponibles
+
+class ReplanRequest(BaseModel):
+    planning: List[PlanningEvent]
+    delta: PlanningDelta
+    intervenants: List[Intervenant] = []  # Domiciles et liste des candidats (optionnel)
+    interventions: List[Intervention] = []  # Interventions d'origine: intervenants imposés (optionnel)
+
+class JobSubmitResponse(BaseModel):
+    success: bool
+    message: str
+    job_id: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # "pending" (en file d'attente), "running", "succeeded" ou "failed"
+    stage: int = 0  # Étape courante (1 à 5)
+    stage_label: str = ""
+    percent: int = 0
+    created_at: str
+    updated_at: str
+    result: Optional[PlanningResponse] = None
+    planning_id: Optional[str] = None  # Planning conservé côté serveur, pour relire le résultat depuis un autre worker
+    error: Optional[str] = None
+
+class ValidationConflict(BaseModel):
+    type: str  # "chevauchement", "trajet_insuffisant" ou "binome_desaligne"
+    intervenant: str
+    event_id: str
+    other_event_id: Optional[str] = None
+    missing_minutes: int = 0  # Minutes manquantes pour enchaîner les deux événements
+    message: str
+
+class EventMove(BaseModel):
+    start: str  # Format ISO: "2025-06-29T08:00:00"
+    end: str
+    intervenant: Optional[str] = None  # Nouvel intervenant (inchangé si absent)
+
+class ValidationSessionResponse(BaseModel):
+    success: bool
+    session_id: str
+    events_count: int
+    conflicts: List[ValidationConflict] = []
+    duration_us: float = 0.0  # Durée de la validation en microsecondes
+
+class StorePlanningRequest(BaseModel):
+    planning: List[PlanningEvent]
+    stats: Optional[PlanningStats] = None
+    locked_ids: List[str] = []  # Événements à ne pas réattribuer lors d'une re-validation (optionnel)
+    intervenants: List[Intervenant] = []  # Contrats, plages horaires et domiciles (optionnel)
+
+class StoredPlanningResponse(BaseModel):
+    success: bool
+    planning_id: str
+    events_count: int
+
+class PlanningEventPage(BaseModel):
+    success: bool
+    planning_id: str
+    total: int  # Événements correspondant aux filtres, toutes pages confondues
+    offset: int
+    limit: int
+    events: List[PlanningEvent]
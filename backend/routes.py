@@ -1,23 +1,208 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from typing import List
+from typing import BinaryIO, Iterable, List, Set, Tuple, Optional, Callable, Union
 import io
 import os
+import json
+import re
+import unicodedata
+import shutil
+import sqlite3
+import tempfile
+import asyncio
 import logging
+import time
 from datetime import datetime
 
 from models import (
     PlanningResponse, FileUploadResponse, ExportResponse,
-    PlanningStats, PlanningEvent
+    PlanningStats, PlanningEvent, Intervention, Intervenant, ReplanRequest,
+    JobSubmitResponse, JobStatus, EventMove, ValidationSessionResponse, StorePlanningRequest,
+    StoredPlanningResponse, PlanningEventPage
 )
 from utils.csv_parser import parse_interventions_csv, parse_intervenants_csv, validate_csv_data
+from utils.input_readers import SUPPORTED_EXTENSIONS
 from utils.openai_client import openai_client
 from utils.export_service import export_service
+from utils.ics_export import ics_export_service
 from utils.travel_cache_service import travel_cache_service
+from utils.replanner import replanner
+from utils.route_optimizer import route_optimizer
+from utils.job_manager import job_manager
+from utils.validation_session import validation_session_manager
+from utils.planning_store import planning_store, StoredPlanning
+from utils.planning_index import PlanningIndex
+from utils.time_utils import iso_to_minutes
+from utils.planning_validator import planning_validator
+from utils.event_table import EventTable
+from utils.travel_matrix import TravelMatrix
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api")
 
+UploadSource = Union[bytes, BinaryIO]  # Contenu en mémoire ou fichier lu par blocs
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PLANNING_PAGE_SIZE = 500  # Événements par page des requêtes sur un planning stocké
+PLANNING_PAGE_MAX = 5000
+
+def _check_csv_extensions(interventions_file: UploadFile, intervenants_file: UploadFile) -> None:
+    """Vérifie les extensions des fichiers envoyés (CSV, XLSX, Parquet ou Arrow)"""
+    if not interventions_file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(400, "Le fichier interventions doit être au format CSV, XLSX, Parquet ou Arrow")
+    if not intervenants_file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(400, "Le fichier intervenants doit être au format CSV, XLSX, Parquet ou Arrow")
+
+def _source_size(source: UploadSource) -> int:
+    """Taille en octets d'un contenu ou d'un fichier ouvert (sans le consommer)"""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+async def _parse_and_validate_contents(interventions_source: UploadSource, intervenants_source: UploadSource) -> Tuple[List[Intervention], List[Intervenant]]:
+    """Parse (les deux fichiers en parallèle, lus par blocs) et valide les CSV (ÉTAPES 1 et 2)"""
+    logger.info(f"📊 ÉTAPE 1/5 - PARSING CSV")
+    logger.info(f"📄 Traitement des interventions ({_source_size(interventions_source)} bytes)")
+    logger.info(f"📄 Traitement des intervenants ({_source_size(intervenants_source)} bytes)")
+    
+    # Parser les CSV dans le pool de threads
+    try:
+        logger.info("🔄 Parsing interventions.csv et intervenants.csv en cours...")
+        # Attendre les deux parsings même en cas d'échec: les fichiers sont fermés à la fin de la requête
+        interventions, intervenants = await asyncio.gather(
+            asyncio.to_thread(parse_interventions_csv, interventions_source),
+            asyncio.to_thread(parse_intervenants_csv, intervenants_source),
+            return_exceptions=True
+        )
+        for result in (interventions, intervenants):
+            if isinstance(result, Exception):
+                raise result
+        logger.info(f"✅ Interventions parsées: {len(interventions)} lignes valides")
+        logger.info(f"✅ Intervenants parsés: {len(intervenants)} lignes valides")
+    except ValueError as e:
+        raise HTTPException(400, f"Erreur parsing CSV: {str(e)}")
+    
+    logger.info(f"📊 ÉTAPE 2/5 - VALIDATION DES DONNÉES")
+    # Valider les données
+    is_valid, validation_message = validate_csv_data(interventions, intervenants)
+    if not is_valid:
+        raise HTTPException(400, f"Données invalides: {validation_message}")
+    
+    logger.info(f"✅ Validation réussie: {len(interventions)} interventions, {len(intervenants)} intervenants")
+    
+    return interventions, intervenants
+
+async def _parse_and_validate_uploads(interventions_file: UploadFile, intervenants_file: UploadFile) -> Tuple[List[Intervention], List[Intervenant]]:
+    """Parse et valide les deux fichiers CSV en les lisant par blocs (ÉTAPES 1 et 2)"""
+    _check_csv_extensions(interventions_file, intervenants_file)
+    
+    return await _parse_and_validate_contents(interventions_file.file, intervenants_file.file)
+
+def _locked_ids(planning_events: List[PlanningEvent], interventions: List[Intervention]) -> Set[str]:
+    """Événements à ne pas réattribuer (intervenant imposé ou binôme), conservés avec le planning stocké"""
+    mask = route_optimizer.locked_mask(planning_events, interventions)
+    return {event.id for event, locked in zip(planning_events, mask) if locked}
+
+async def _store_planning(planning_events: Union[EventTable, List[PlanningEvent]],
+                          stats: Optional[PlanningStats] = None, locked_ids: Optional[Iterable[str]] = None,
+                          intervenants: Optional[List[Intervenant]] = None) -> Optional[str]:
+    """Conserve le planning côté serveur; un échec du stockage n'empêche pas de renvoyer le planning"""
+    try:
+        return await asyncio.to_thread(planning_store.save, planning_events, stats, locked_ids, intervenants)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Erreur stockage planning: {str(e)}")
+        return None
+
+async def _load_planning(planning_id: str) -> StoredPlanning:
+    """Charge un planning stocké ou lève une 404"""
+    try:
+        stored = await asyncio.to_thread(planning_store.load, planning_id)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.error(f"Erreur lecture planning {planning_id}: {str(e)}")
+        raise HTTPException(500, f"Erreur lecture planning: {str(e)}")
+    if stored is None:
+        raise HTTPException(404, "Planning introuvable ou expiré")
+    return stored
+
+async def _load_planning_index(planning_id: str) -> PlanningIndex:
+    """Index de requête d'un planning stocké ou 404"""
+    try:
+        index = await asyncio.to_thread(planning_store.index, planning_id)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.error(f"Erreur lecture planning {planning_id}: {str(e)}")
+        raise HTTPException(500, f"Erreur lecture planning: {str(e)}")
+    if index is None:
+        raise HTTPException(404, "Planning introuvable ou expiré")
+    return index
+
+def _spool_upload(upload: UploadFile) -> BinaryIO:
+    """Copie par blocs un fichier reçu dans un fichier temporaire qui survit à la requête"""
+    spool = tempfile.TemporaryFile()
+    upload.file.seek(0)
+    shutil.copyfileobj(upload.file, spool, UPLOAD_CHUNK_SIZE)
+    spool.seek(0)
+    return spool
+
+async def _run_planning_pipeline(
+    interventions_source: UploadSource,
+    intervenants_source: UploadSource,
+    on_stage: Optional[Callable[[int, str], None]] = None
+) -> PlanningResponse:
+    """Exécute les 5 étapes de génération du planning, en notifiant chaque changement d'étape"""
+    def notify(stage: int, label: str):
+        if on_stage:
+            on_stage(stage, label)
+    
+    notify(1, "PARSING CSV")
+    interventions, intervenants = await _parse_and_validate_contents(interventions_source, intervenants_source)
+    notify(2, "VALIDATION DES DONNÉES")
+    
+    logger.info(f"📊 ÉTAPE 3/5 - GÉNÉRATION PLANNING IA")
+    notify(3, "GÉNÉRATION PLANNING IA")
+    
+    # Générer le planning avec OpenAI
+    try:
+        logger.info("🤖 Lancement de la génération de planning par IA...")
+        planning_events = await openai_client.generate_planning(interventions, intervenants,
+                                                                on_step=lambda label: notify(3, label))
+        logger.info(f"✅ Planning IA généré avec {len(planning_events)} événements")
+    except ValueError as e:
+        raise HTTPException(500, f"Erreur génération planning IA: {str(e)}")
+    
+    logger.info(f"📊 ÉTAPE 4/5 - CALCUL DES STATISTIQUES")
+    notify(4, "CALCUL DES STATISTIQUES")
+    # Calculer les statistiques
+    stats_data = await asyncio.to_thread(
+        openai_client.calculate_stats,
+        planning_events, 
+        len(interventions), 
+        len(intervenants),
+        intervenants
+    )
+    stats = PlanningStats(**stats_data)
+    
+    logger.info(f"📊 ÉTAPE 5/5 - FINALISATION")
+    notify(5, "FINALISATION")
+    logger.info(f"📈 Statistiques finales:")
+    logger.info(f"   • Total interventions: {stats.total_interventions}")
+    logger.info(f"   • Interventions planifiées: {stats.interventions_planifiees}")
+    logger.info(f"   • Taux de planification: {stats.taux_planification}%")
+    logger.info(f"   • Intervenants utilisés: {stats.intervenants}")
+    logger.info(f"   • Dépassements de contrat horaire: {stats.depassements_horaires}")
+    
+    logger.info(f"🎉 SUCCÈS COMPLET - Planning généré avec succès!")
+    
+    return PlanningResponse(
+        success=True,
+        message=f"Planning généré avec succès par l'IA ! {stats.interventions_planifiees}/{stats.total_interventions} interventions planifiées",
+        planning=planning_events,
+        stats=stats,
+        planning_id=await _store_planning(planning_events, stats, _locked_ids(planning_events, interventions),
+                                          intervenants)
+    )
+
 @router.post("/upload-csv", response_model=PlanningResponse)
 async def upload_and_process_csv(
     interventions_file: UploadFile = File(...),
@@ -27,103 +212,317 @@ async def upload_and_process_csv(
     try:
         logger.info(f"Réception fichiers: {interventions_file.filename}, {intervenants_file.filename}")
         
-        # Vérifier les extensions
-        if not interventions_file.filename.endswith('.csv'):
-            raise HTTPException(400, "Le fichier interventions doit être au format CSV")
-        if not intervenants_file.filename.endswith('.csv'):
-            raise HTTPException(400, "Le fichier intervenants doit être au format CSV")
-        
-        # Lire les fichiers
-        interventions_content = await interventions_file.read()
-        intervenants_content = await intervenants_file.read()
+        _check_csv_extensions(interventions_file, intervenants_file)
         
-        logger.info(f"📊 ÉTAPE 1/5 - PARSING CSV")
-        logger.info(f"📄 Traitement de {interventions_file.filename} ({len(interventions_content)} bytes)")
-        logger.info(f"📄 Traitement de {intervenants_file.filename} ({len(intervenants_content)} bytes)")
+        # Les fichiers sont lus par blocs pendant le parsing, sans être chargés en mémoire
+        return await _run_planning_pipeline(interventions_file.file, intervenants_file.file)
         
-        # Parser les CSV
-        try:
-            logger.info("🔄 Parsing interventions.csv en cours...")
-            interventions = parse_interventions_csv(interventions_content)
-            logger.info(f"✅ Interventions parsées: {len(interventions)} lignes valides")
-            
-            logger.info("🔄 Parsing intervenants.csv en cours...")
-            intervenants = parse_intervenants_csv(intervenants_content)
-            logger.info(f"✅ Intervenants parsés: {len(intervenants)} lignes valides")
-        except ValueError as e:
-            raise HTTPException(400, f"Erreur parsing CSV: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur traitement CSV: {str(e)}")
+        raise HTTPException(500, f"Erreur interne: {str(e)}")
+
+@router.post("/jobs", response_model=JobSubmitResponse)
+async def submit_planning_job(
+    interventions_file: UploadFile = File(...),
+    intervenants_file: UploadFile = File(...)
+):
+    """Soumet une génération de planning en tâche de fond et retourne immédiatement un identifiant de job"""
+    try:
+        logger.info(f"Réception fichiers (job): {interventions_file.filename}, {intervenants_file.filename}")
         
-        logger.info(f"📊 ÉTAPE 2/5 - VALIDATION DES DONNÉES")
-        # Valider les données
-        is_valid, validation_message = validate_csv_data(interventions, intervenants)
-        if not is_valid:
-            raise HTTPException(400, f"Données invalides: {validation_message}")
+        _check_csv_extensions(interventions_file, intervenants_file)
         
-        logger.info(f"✅ Validation réussie: {len(interventions)} interventions, {len(intervenants)} intervenants")
+        # Les fichiers doivent être copiés pendant la requête (UploadFile est fermé ensuite)
+        interventions_spool = await asyncio.to_thread(_spool_upload, interventions_file)
+        intervenants_spool = await asyncio.to_thread(_spool_upload, intervenants_file)
         
-        logger.info(f"📊 ÉTAPE 3/5 - GÉNÉRATION PLANNING IA")
+        async def run_pipeline(on_stage):
+            try:
+                return await _run_planning_pipeline(interventions_spool, intervenants_spool, on_stage)
+            finally:
+                interventions_spool.close()
+                intervenants_spool.close()
         
-        # Générer le planning avec OpenAI
         try:
-            logger.info("🤖 Lancement de la génération de planning par IA...")
-            planning_events = await openai_client.generate_planning(interventions, intervenants)
-            logger.info(f"✅ Planning IA généré avec {len(planning_events)} événements")
+            job = job_manager.submit(run_pipeline)
         except ValueError as e:
-            raise HTTPException(500, f"Erreur génération planning IA: {str(e)}")
-        
-        logger.info(f"📊 ÉTAPE 4/5 - CALCUL DES STATISTIQUES")
-        # Calculer les statistiques
-        stats_data = openai_client.calculate_stats(
-            planning_events, 
-            len(interventions), 
-            len(intervenants)
+            interventions_spool.close()
+            intervenants_spool.close()
+            raise HTTPException(503, str(e))
+        
+        return JobSubmitResponse(
+            success=True,
+            message="Génération du planning lancée en tâche de fond",
+            job_id=job.job_id,
+            status_url=f"/api/jobs/{job.job_id}"
         )
-        stats = PlanningStats(**stats_data)
         
-        logger.info(f"📊 ÉTAPE 5/5 - FINALISATION")
-        logger.info(f"📈 Statistiques finales:")
-        logger.info(f"   • Total interventions: {stats.total_interventions}")
-        logger.info(f"   • Interventions planifiées: {stats.interventions_planifiees}")
-        logger.info(f"   • Taux de planification: {stats.taux_planification}%")
-        logger.info(f"   • Intervenants utilisés: {stats.intervenants}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur soumission job: {str(e)}")
+        raise HTTPException(500, f"Erreur interne: {str(e)}")
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_planning_job(job_id: str):
+    """Retourne l'étape courante, la progression et le résultat final d'un job de planning"""
+    job = await asyncio.to_thread(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(404, "Job de planning introuvable ou expiré")
+    if job.status == "succeeded" and job.result is None and job.planning_id:
+        # Job terminé dans un autre worker: le résultat est relu depuis le stockage des plannings
+        job.result = await _stored_planning_response(await _load_planning(job.planning_id))
+    return job
+
+def _sse_message(event: str, data) -> str:
+    """Formate un message Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/upload-csv/stream")
+async def upload_and_stream_planning(
+    interventions_file: UploadFile = File(...),
+    intervenants_file: UploadFile = File(...)
+):
+    """Upload des fichiers CSV et génération du planning diffusée en Server-Sent Events"""
+    logger.info(f"Réception fichiers (streaming): {interventions_file.filename}, {intervenants_file.filename}")
+    
+    # Les erreurs de parsing/validation sont renvoyées en HTTP classique, avant l'ouverture du flux
+    interventions, intervenants = await _parse_and_validate_uploads(interventions_file, intervenants_file)
+    
+    async def event_stream():
+        logger.info(f"📊 ÉTAPE 3/5 - GÉNÉRATION PLANNING IA (STREAMING)")
+        yield _sse_message("progress", {"step": "ÉTAPE 3/5 - GÉNÉRATION PLANNING IA"})
+        try:
+            streamed_count = 0
+            async for kind, payload in openai_client.stream_planning(interventions, intervenants):
+                if kind == "event":
+                    streamed_count += 1
+                    yield _sse_message("planning_event", payload.model_dump())
+                    continue
+                
+                logger.info(f"📊 ÉTAPE 4/5 - CALCUL DES STATISTIQUES")
+                stats_data = await asyncio.to_thread(openai_client.calculate_stats, payload, len(interventions),
+                                                     len(intervenants), intervenants)
+                stats = PlanningStats(**stats_data)
+                
+                logger.info(f"📊 ÉTAPE 5/5 - FINALISATION")
+                logger.info(f"🎉 SUCCÈS COMPLET - {streamed_count} événements diffusés, {len(payload)} après validation")
+                response = PlanningResponse(
+                    success=True,
+                    message=f"Planning généré avec succès par l'IA ! {stats.interventions_planifiees}/{stats.total_interventions} interventions planifiées",
+                    planning=payload,
+                    stats=stats,
+                    planning_id=await _store_planning(payload, stats, _locked_ids(payload, interventions),
+                                                      intervenants)
+                )
+                yield _sse_message("complete", response.model_dump())
+        except ValueError as e:
+            logger.error(f"Erreur génération planning IA (streaming): {str(e)}")
+            yield _sse_message("error", {"detail": f"Erreur génération planning IA: {str(e)}"})
+        except Exception as e:
+            logger.error(f"Erreur streaming planning: {str(e)}")
+            yield _sse_message("error", {"detail": f"Erreur interne: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Désactive le buffering des reverse proxies (nginx)
+        }
+    )
+
+@router.post("/replan", response_model=PlanningResponse)
+async def replan_planning(request: ReplanRequest):
+    """Re-planification incrémentale d'un planning existant à partir d'un delta"""
+    try:
+        if not request.planning:
+            raise HTTPException(400, "Aucun planning existant à mettre à jour")
         
-        logger.info(f"🎉 SUCCÈS COMPLET - Planning généré avec succès!")
+        try:
+            # Optimisation des journées impactées incluse (jusqu'au budget de l'optimiseur): hors de la boucle
+            planning_events, summary = await asyncio.to_thread(replanner.replan, request.planning, request.delta,
+                                                               request.intervenants, request.interventions)
+        except ValueError as e:
+            raise HTTPException(400, f"Delta invalide: {str(e)}")
+        
+        # Une intervention par visite: les deux postes d'un binôme comptent pour une seule
+        total_interventions = len({e.binome_id or e.id for e in planning_events})
+        total_intervenants = len(request.intervenants) or len({e.intervenant for e in planning_events if e.intervenant})
+        stats_data = await asyncio.to_thread(openai_client.calculate_stats, planning_events, total_interventions,
+                                             total_intervenants, request.intervenants)
+        stats = PlanningStats(**stats_data)
         
         return PlanningResponse(
             success=True,
-            message=f"Planning généré avec succès par l'IA ! {stats.interventions_planifiees}/{stats.total_interventions} interventions planifiées",
+            message=f"Planning mis à jour: {summary['placed']} intervention(s) replacée(s), "
+                    f"{summary['unplaced']} non planifiable(s), {summary['affected_days']} journée(s) recalculée(s)",
             planning=planning_events,
-            stats=stats
+            stats=stats,
+            planning_id=await _store_planning(planning_events, stats,
+                                              _locked_ids(planning_events, request.interventions),
+                                              request.intervenants)
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur traitement CSV: {str(e)}")
-        raise HTTPException(500, f"Erreur interne: {str(e)}")
+        logger.error(f"Erreur re-planification: {str(e)}")
+        raise HTTPException(500, f"Erreur re-planification: {str(e)}")
+
+def _get_validation_session(session_id: str):
+    """Retourne une session de validation active ou lève une 404"""
+    session = validation_session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(404, "Session de validation introuvable ou expirée")
+    return session
+
+def _validation_response(session, conflicts, started: float) -> ValidationSessionResponse:
+    return ValidationSessionResponse(
+        success=True,
+        session_id=session.session_id,
+        events_count=len(session.events),
+        conflicts=conflicts,
+        duration_us=round((time.perf_counter() - started) * 1_000_000, 1)
+    )
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible des ETag d'un en-tête If-None-Match (RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def _calendar_response(request: Request, planning_events: Union[EventTable, List[PlanningEvent]], intervenant: Optional[str],
+                       disposition: str = "inline") -> Response:
+    """Calendrier iCalendar diffusé par blocs; 304 sans corps si le client possède déjà cette version"""
+    try:
+        table, rows = ics_export_service.select(planning_events, intervenant)
+    except ValueError as e:
+        raise HTTPException(404, str(e))
+    
+    etag = ics_export_service.etag(table, rows, intervenant)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    # Nom de fichier ASCII (en-têtes HTTP en Latin-1)
+    slug = unicodedata.normalize("NFKD", intervenant or "tournees").encode("ascii", "ignore").decode("ascii")
+    filename = f"planning_{re.sub(r'[^A-Za-z0-9_-]+', '_', slug).strip('_') or 'intervenant'}.ics"
+    return StreamingResponse(
+        ics_export_service.iter_ics(table, rows, intervenant),
+        media_type="text/calendar; charset=utf-8",
+        headers={
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Content-Disposition": f"{disposition}; filename={filename}"
+        }
+    )
+
+@router.post("/validation-sessions", response_model=ValidationSessionResponse)
+async def open_validation_session(planning_data: List[PlanningEvent]):
+    """Ouvre une session de validation incrémentale et retourne les conflits existants"""
+    started = time.perf_counter()
+    try:
+        session = validation_session_manager.create(planning_data)
+    except ValueError as e:
+        raise HTTPException(400, f"Planning invalide: {str(e)}")
+    return _validation_response(session, session.all_conflicts(), started)
+
+@router.post("/validation-sessions/{session_id}/events", response_model=ValidationSessionResponse)
+async def insert_session_event(session_id: str, event: PlanningEvent):
+    """Ajoute un événement et retourne uniquement les conflits qu'il introduit"""
+    session = _get_validation_session(session_id)
+    started = time.perf_counter()
+    try:
+        conflicts = session.insert(event)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return _validation_response(session, conflicts, started)
+
+@router.patch("/validation-sessions/{session_id}/events/{event_id}", response_model=ValidationSessionResponse)
+async def move_session_event(session_id: str, event_id: str, move: EventMove):
+    """Déplace un événement (glisser-déposer) et retourne uniquement les conflits introduits"""
+    session = _get_validation_session(session_id)
+    if event_id not in session.events:
+        raise HTTPException(404, "Événement introuvable dans la session")
+    started = time.perf_counter()
+    try:
+        conflicts = session.move(event_id, move)
+    except ValueError as e:
+        raise HTTPException(400, f"Déplacement invalide: {str(e)}")
+    return _validation_response(session, conflicts, started)
+
+@router.delete("/validation-sessions/{session_id}/events/{event_id}", response_model=ValidationSessionResponse)
+async def delete_session_event(session_id: str, event_id: str):
+    """Supprime un événement de la session"""
+    session = _get_validation_session(session_id)
+    if event_id not in session.events:
+        raise HTTPException(404, "Événement introuvable dans la session")
+    started = time.perf_counter()
+    conflicts = session.delete(event_id)
+    return _validation_response(session, conflicts, started)
+
+@router.delete("/validation-sessions/{session_id}")
+async def close_validation_session(session_id: str):
+    """Ferme une session de validation"""
+    if not validation_session_manager.close(session_id):
+        raise HTTPException(404, "Session de validation introuvable ou expirée")
+    return {"success": True, "message": "Session de validation fermée"}
+
+@router.get("/validation-sessions/{session_id}/calendar.ics")
+async def session_calendar(session_id: str, request: Request, intervenant: Optional[str] = None):
+    """Flux iCalendar abonnable du planning en cours de validation (un intervenant ou tous)"""
+    session = _get_validation_session(session_id)
+    return _calendar_response(request, list(session.events.values()), intervenant)
 
 @router.post("/export-csv")
 async def export_planning_csv(planning_data: List[PlanningEvent]):
     """Export du planning en format CSV"""
+    if not planning_data:
+        raise HTTPException(400, "Aucune donnée de planning à exporter")
+
+    # Fichier CSV généré par blocs pendant l'envoi (erreurs journalisées par le générateur)
+    filename = f"planning_tournees_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    return StreamingResponse(
+        export_service.iter_csv(planning_data),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.post("/export-ics")
+async def export_planning_ics(planning_data: List[PlanningEvent], request: Request, intervenant: Optional[str] = None):
+    """Export du planning au format iCalendar (un intervenant ou tous), avec ETag"""
+    if not planning_data:
+        raise HTTPException(400, "Aucune donnée de planning à exporter")
+    return _calendar_response(request, planning_data, intervenant, disposition="attachment")
+
+@router.post("/export-pdf/intervenants")
+async def export_route_sheets(planning_data: List[PlanningEvent]):
+    """Export des feuilles de route PDF (une par intervenant) dans une archive ZIP"""
+    if not planning_data:
+        raise HTTPException(400, "Aucune donnée de planning à exporter")
+    
     try:
-        if not planning_data:
-            raise HTTPException(400, "Aucune donnée de planning à exporter")
-        
-        csv_content = export_service.generate_csv(planning_data)
-        
-        # Créer la réponse avec le fichier CSV
-        csv_bytes = csv_content.encode('utf-8')
-        filename = f"planning_tournees_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        return StreamingResponse(
-            io.BytesIO(csv_bytes),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+        # Rendu parallèle dans des processus séparés, feuilles inchangées servies depuis le cache
+        sheets = await export_service.render_route_sheets(planning_data)
     except Exception as e:
-        logger.error(f"Erreur export CSV: {str(e)}")
-        raise HTTPException(500, f"Erreur export CSV: {str(e)}")
+        logger.error(f"Erreur export feuilles de route: {str(e)}")
+        raise HTTPException(500, f"Erreur export feuilles de route: {str(e)}")
+    
+    if not sheets:
+        raise HTTPException(400, "Aucune intervention planifiée à exporter")
+    
+    filename = f"feuilles_de_route_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        export_service.iter_zip(sheets),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.post("/export-pdf")
 async def export_planning_pdf(request_data: dict):
@@ -153,6 +552,184 @@ async def export_planning_pdf(request_data: dict):
         logger.error(f"Erreur export PDF: {str(e)}")
         raise HTTPException(500, f"Erreur export PDF: {str(e)}")
 
+def _stored_stats(stored: StoredPlanning, table: Optional[EventTable] = None) -> PlanningStats:
+    """Statistiques d'un planning stocké (recalculées si absentes ou si la table a changé)"""
+    if stored.stats is not None and table is None:
+        return stored.stats
+    table = table if table is not None else stored.table
+    if stored.stats is not None:
+        total_interventions, total_intervenants = stored.stats.total_interventions, stored.stats.intervenants
+    else:
+        total_interventions = len(table)
+        total_intervenants = len(stored.intervenants) or sum(1 for name in set(table.intervenants.tolist()) if name)
+    # Contrats enregistrés avec le planning: dépassements horaires et champs de contrat recalculés
+    return PlanningStats(**openai_client.calculate_stats(table, total_interventions, total_intervenants,
+                                                         stored.intervenants or None))
+
+async def _stored_planning_response(stored: StoredPlanning) -> PlanningResponse:
+    """Réponse complète d'un planning stocké (événements et statistiques)"""
+    stats = await asyncio.to_thread(_stored_stats, stored)
+    planning = await asyncio.to_thread(stored.table.to_events)
+    return PlanningResponse(
+        success=True,
+        message=f"Planning {stored.planning_id}: {stats.interventions_planifiees}/{stats.total_interventions} interventions planifiées",
+        planning=planning,
+        stats=stats,
+        planning_id=stored.planning_id
+    )
+
+def _revalidate_table(stored: StoredPlanning) -> EventTable:
+    """Re-validation d'un planning stocké avec ses visites verrouillées et les domiciles de ses intervenants"""
+    coordinates = stored.table.coordinates() + [(i.latitude, i.longitude) for i in stored.intervenants]
+    return planning_validator.validate_table(stored.table, TravelMatrix(coordinates), stored.locked_ids,
+                                             stored.intervenants or None)
+
+@router.post("/plannings", response_model=StoredPlanningResponse)
+async def store_planning(request: StorePlanningRequest):
+    """Enregistre un planning (modifié côté client par exemple) pour l'exporter ensuite par identifiant"""
+    if not request.planning:
+        raise HTTPException(400, "Aucun planning à enregistrer")
+    try:
+        planning_id = await asyncio.to_thread(planning_store.save, request.planning, request.stats,
+                                              request.locked_ids, request.intervenants)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Erreur stockage planning: {str(e)}")
+        raise HTTPException(500, f"Erreur stockage planning: {str(e)}")
+    return StoredPlanningResponse(success=True, planning_id=planning_id, events_count=len(request.planning))
+
+@router.get("/plannings/{planning_id}", response_model=PlanningResponse)
+async def get_stored_planning(planning_id: str):
+    """Retourne un planning stocké"""
+    return await _stored_planning_response(await _load_planning(planning_id))
+
+@router.get("/plannings/{planning_id}/events", response_model=PlanningEventPage)
+async def query_stored_planning(
+    planning_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    intervenant: Optional[str] = None,
+    non_planifiable: Optional[bool] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(PLANNING_PAGE_SIZE, ge=1, le=PLANNING_PAGE_MAX)
+):
+    """Événements d'un planning stocké chevauchant [start, end), filtrés par intervenant et statut, paginés
+    
+    Les événements sont renvoyés dans l'ordre chronologique; start et end sont des dates ISO
+    ("2025-06-23" ou "2025-06-23T00:00:00").
+    """
+    try:
+        window_start, window_end = (iso_to_minutes(value) if value else None for value in (start, end))
+    except ValueError as e:
+        raise HTTPException(400, f"Date invalide: {str(e)}")
+    
+    index = await _load_planning_index(planning_id)
+    rows = index.query(window_start, window_end, intervenant, non_planifiable)
+    return PlanningEventPage(
+        success=True,
+        planning_id=planning_id,
+        total=len(rows),
+        offset=offset,
+        limit=limit,
+        events=index.table.to_events(rows[offset:offset + limit])
+    )
+
+@router.delete("/plannings/{planning_id}")
+async def delete_stored_planning(planning_id: str):
+    """Supprime un planning stocké"""
+    if not await asyncio.to_thread(planning_store.delete, planning_id):
+        raise HTTPException(404, "Planning introuvable ou expiré")
+    return {"success": True, "message": "Planning supprimé"}
+
+@router.post("/plannings/{planning_id}/validate", response_model=PlanningResponse)
+async def revalidate_stored_planning(planning_id: str):
+    """Re-valide un planning stocké (doublons, conflits, binômes, couleurs) et enregistre le résultat"""
+    stored = await _load_planning(planning_id)
+    try:
+        table = await asyncio.to_thread(_revalidate_table, stored)
+        stats = await asyncio.to_thread(_stored_stats, stored, table)
+        await asyncio.to_thread(planning_store.update, planning_id, table, stats)
+        planning = await asyncio.to_thread(table.to_events)
+    except Exception as e:
+        logger.error(f"Erreur re-validation planning {planning_id}: {str(e)}")
+        raise HTTPException(500, f"Erreur re-validation planning: {str(e)}")
+    
+    return PlanningResponse(
+        success=True,
+        message=f"Planning re-validé: {stats.interventions_planifiees}/{stats.total_interventions} interventions planifiées",
+        planning=planning,
+        stats=stats,
+        planning_id=planning_id
+    )
+
+@router.post("/plannings/{planning_id}/validation-sessions", response_model=ValidationSessionResponse)
+async def open_stored_validation_session(planning_id: str):
+    """Ouvre une session de validation incrémentale sur un planning stocké"""
+    stored = await _load_planning(planning_id)
+    planning = await asyncio.to_thread(stored.table.to_events)
+    started = time.perf_counter()
+    try:
+        session = validation_session_manager.create(planning)
+    except ValueError as e:
+        # Identifiants en double ou horaire illisible dans le planning enregistré
+        raise HTTPException(400, f"Planning invalide: {str(e)}")
+    return _validation_response(session, session.all_conflicts(), started)
+
+@router.get("/plannings/{planning_id}/export-csv")
+async def export_stored_planning_csv(planning_id: str):
+    """Export CSV d'un planning stocké"""
+    stored = await _load_planning(planning_id)
+    filename = f"planning_tournees_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return StreamingResponse(
+        export_service.iter_csv(stored.table),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.get("/plannings/{planning_id}/export-pdf")
+async def export_stored_planning_pdf(planning_id: str):
+    """Export PDF d'un planning stocké"""
+    stored = await _load_planning(planning_id)
+    try:
+        stats = await asyncio.to_thread(_stored_stats, stored)
+        planning = await asyncio.to_thread(stored.table.to_events)
+        pdf_bytes = await asyncio.to_thread(export_service.generate_pdf, planning, stats)
+    except Exception as e:
+        logger.error(f"Erreur export PDF: {str(e)}")
+        raise HTTPException(500, f"Erreur export PDF: {str(e)}")
+    
+    filename = f"planning_tournees_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return StreamingResponse(
+        io.BytesIO(pdf_bytes),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.get("/plannings/{planning_id}/export-pdf/intervenants")
+async def export_stored_route_sheets(planning_id: str):
+    """Feuilles de route PDF (une par intervenant) d'un planning stocké, dans une archive ZIP"""
+    stored = await _load_planning(planning_id)
+    try:
+        sheets = await export_service.render_route_sheets(stored.table)
+    except Exception as e:
+        logger.error(f"Erreur export feuilles de route: {str(e)}")
+        raise HTTPException(500, f"Erreur export feuilles de route: {str(e)}")
+    
+    if not sheets:
+        raise HTTPException(400, "Aucune intervention planifiée à exporter")
+    
+    filename = f"feuilles_de_route_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        export_service.iter_zip(sheets),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.get("/plannings/{planning_id}/calendar.ics")
+async def stored_planning_calendar(planning_id: str, request: Request, intervenant: Optional[str] = None):
+    """Flux iCalendar abonnable d'un planning stocké (un intervenant ou tous)"""
+    stored = await _load_planning(planning_id)
+    return _calendar_response(request, stored.table, intervenant)
+
 @router.get("/health")
 async def health_check():
     """Vérification de l'état du service"""
@@ -6,6 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from routes import router
+from utils.export_service import export_service
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -42,4 +43,5 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    export_service.shutdown()
     logger.info("API Planning Tournées fermée")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Les modules du backend s'importent depuis la racine du backend (comme dans server.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'test')
@@ -0,0 +1,106 @@
+from typing import List, Optional
+
+from models import Intervenant, PlanningEvent
+from utils.planning_validator import planning_validator
+from utils.travel_matrix import TravelMatrix, coordinate_key
+
+A = (48.5, 7.7)
+B = (48.6, 7.8)
+HOME = (48.55, 7.75)
+# 5 minutes de trajet entre deux lieux distincts
+TRAVEL_TIMES = {coordinate_key(*p): {coordinate_key(*q): 5 for q in (A, B, HOME) if q != p} for p in (A, B, HOME)}
+
+
+def event(client: str, intervenant: str, start: str, end: str, place, **kwargs) -> PlanningEvent:
+    return PlanningEvent(client=client, intervenant=intervenant, start=f"2025-07-01T{start}:00",
+                         end=f"2025-07-01T{end}:00", color="#000", latitude=place[0], longitude=place[1], **kwargs)
+
+
+def intervenant(name: str, plage: str = "") -> Intervenant:
+    return Intervenant(nom_prenom=name, latitude=HOME[0], longitude=HOME[1], heure_mensuel="151h",
+                       heure_hebdomaire="35h", plage_horaire_autorisee=plage)
+
+
+def repair(events: List[PlanningEvent], intervenants: Optional[List[Intervenant]] = None,
+           locked: tuple = ()) -> dict:
+    matrix = TravelMatrix([(e.latitude, e.longitude) for e in events] + [HOME], travel_times=TRAVEL_TIMES)
+    fixed = planning_validator.validate_and_fix_planning(events, matrix, {events[i].id for i in locked},
+                                                         intervenants)
+    return {e.client: e for e in fixed}
+
+
+def test_travel_conflict_is_shifted_within_tolerance():
+    fixed = repair([event("c1", "X", "08:00", "09:00", A), event("c2", "X", "09:00", "10:00", B)])
+
+    assert fixed["c2"].start == "2025-07-01T09:05:00"
+    assert fixed["c2"].end == "2025-07-01T10:05:00"
+    assert fixed["c2"].intervenant == "X"
+    assert not fixed["c2"].non_planifiable
+
+
+def test_short_visit_is_swapped_before_previous_one():
+    fixed = repair([event("p", "X", "10:00", "10:30", A), event("c", "X", "10:01", "10:05", B)])
+
+    assert fixed["c"].start == "2025-07-01T10:01:00"
+    assert fixed["p"].start == "2025-07-01T10:10:00"
+    assert not fixed["p"].non_planifiable and not fixed["c"].non_planifiable
+
+
+def test_reassignment_respects_time_window():
+    events = [event("c3", "X", "10:00", "11:00", A), event("c4", "X", "10:30", "11:00", B)]
+
+    fixed = repair([e.model_copy() for e in events], [intervenant("X"), intervenant("Late", "14h00-22h00"),
+                                                       intervenant("Free")])
+    assert fixed["c4"].intervenant == "Free"
+    assert fixed["c4"].start == "2025-07-01T10:30:00"
+
+    fixed = repair([e.model_copy() for e in events], [intervenant("X"), intervenant("Late", "14h00-22h00")])
+    assert fixed["c4"].non_planifiable
+
+
+def test_reassignment_respects_daily_cap():
+    overlap = [event("c3", "X", "10:00", "11:00", A), event("c4", "X", "10:30", "11:00", B)]
+    morning = [event(f"b{k}", "Busy", f"{7 + k:02d}:00", f"{7 + k:02d}:50", A) for k in range(3)]
+    roster = [intervenant("X"), intervenant("Busy")]
+
+    # 12h20 déjà travaillées: la visite de 30 min tient dans les 13h
+    fixed = repair(overlap + morning + [event("long", "Busy", "12:00", "21:50", A)], roster)
+    assert fixed["c4"].intervenant == "Busy"
+
+    # 12h50 déjà travaillées: la visite dépasserait les 13h
+    fixed = repair(overlap + morning + [event("long", "Busy", "11:30", "21:50", A)], roster)
+    assert fixed["c4"].intervenant == "X"
+    assert fixed["c4"].non_planifiable
+
+
+def test_locked_visits_are_never_reassigned():
+    events = [event("z1", "Z", "10:00", "11:00", A), event("z2", "Z", "10:00", "11:00", B)]
+
+    fixed = repair(events, [intervenant("Z"), intervenant("Free")], locked=(0, 1))
+
+    assert fixed["z1"].intervenant == "Z" and fixed["z2"].intervenant == "Z"
+    assert fixed["z2"].non_planifiable
+
+
+def test_binome_visits_are_never_moved():
+    events = [event("f", "X", "10:00", "11:00", A),
+              event("b", "X", "10:30", "11:00", B, binome_id="bn1"),
+              event("b2", "Y", "10:30", "11:00", B, binome_id="bn1")]
+
+    fixed = repair(events, [intervenant("X"), intervenant("Y"), intervenant("Free")])
+
+    # La visite libre cède la place: le binôme garde ses intervenants et son horaire
+    assert fixed["f"].intervenant == "Free"
+    assert (fixed["b"].intervenant, fixed["b"].start) == ("X", "2025-07-01T10:30:00")
+    assert (fixed["b2"].intervenant, fixed["b2"].start) == ("Y", "2025-07-01T10:30:00")
+
+
+def test_detect_conflicts_reports_missing_travel_time():
+    events = [event("c1", "X", "08:00", "09:00", A), event("c2", "X", "09:00", "10:00", B),
+              event("y1", "Y", "09:00", "10:00", B)]
+    matrix = TravelMatrix([(e.latitude, e.longitude) for e in events], travel_times=TRAVEL_TIMES)
+
+    conflicts = planning_validator.detect_conflicts(events, matrix)
+
+    assert len(conflicts) == 1
+    assert conflicts[0]["intervenant"] == "X"
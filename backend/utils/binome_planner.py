@@ -0,0 +1,266 @@
+import bisect
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models import Intervention, Intervenant, PlanningEvent, NON_PLANIFIABLE_COLOR
+from utils.time_utils import minutes_to_iso, day_of, parse_plage_horaire, MINUTES_PER_DAY, START_TOLERANCE_MINUTES
+from utils.stable_ids import derived_id
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+class IntervalIndex:
+    """Créneaux occupés par intervenant, triés par début, pour tester rapidement qu'un créneau est libre"""
+
+    def __init__(self, matrix: TravelMatrix):
+        self.matrix = matrix
+        self.busy: Dict[str, List[Tuple[int, int, int]]] = {}
+
+    def add(self, name: str, start: int, end: int, loc: int) -> None:
+        bisect.insort(self.busy.setdefault(name, []), (start, end, loc))
+
+    def remove(self, name: str, start: int, end: int, loc: int) -> None:
+        intervals = self.busy.get(name, [])
+        position = bisect.bisect_left(intervals, (start, end, loc))
+        if position < len(intervals) and intervals[position] == (start, end, loc):
+            intervals.pop(position)
+
+    def insertion_cost(self, name: str, start: int, end: int, loc: int,
+                       home_loc: int = -1) -> Optional[int]:
+        """Minutes de trajet ajoutées si le créneau [start, end) est libre (trajets compris), sinon None"""
+        intervals = self.busy.get(name, [])
+        position = bisect.bisect_left(intervals, (start,))
+        before = intervals[position - 1] if position > 0 else None
+        after = intervals[position] if position < len(intervals) else None
+
+        # Le précédent n'est pris en compte que le même jour, sinon départ du domicile
+        if before is not None and day_of(before[0]) != day_of(start):
+            before = None
+        if after is not None and day_of(after[0]) != day_of(start):
+            after = None
+
+        travel_in = self.matrix.between(before[2], loc) if before else (
+            self.matrix.between(home_loc, loc) if home_loc >= 0 else 0)
+        if before is not None and before[1] + travel_in > start:
+            return None
+        travel_out = 0
+        if after is not None:
+            travel_out = self.matrix.between(loc, after[2])
+            if end + travel_out > after[0]:
+                return None
+        return travel_in + travel_out
+
+class BinomePlanner:
+    """Représente chaque binôme par deux événements liés et complète le second intervenant"""
+
+    def ensure_pairs(self, planning_events: List[PlanningEvent], interventions: List[Intervention],
+                     intervenants: List[Intervenant],
+                     travel_times: Optional[Dict[str, Dict[str, int]]] = None
+                     ) -> Tuple[List[PlanningEvent], Dict[str, Any]]:
+        """Complète les binômes du planning et retourne le planning avec un résumé"""
+        summary = {"binomes": 0, "complete": 0, "partners_added": 0, "pairs_planned": 0, "understaffed": 0}
+
+        # Une visite binôme par (client, début): un même client peut avoir plusieurs visites dans la journée
+        binome_visits: Dict[Tuple[str, int], Intervention] = {}
+        for intervention in interventions:
+            if intervention.binome and intervention.start_minutes is not None:
+                binome_visits[(intervention.client, intervention.start_minutes)] = intervention
+        if not binome_visits:
+            return planning_events, summary
+        summary["binomes"] = len(binome_visits)
+
+        homes = {i.nom_prenom: (i.latitude, i.longitude) for i in intervenants}
+        windows = {i.nom_prenom: parse_plage_horaire(i.plage_horaire_autorisee) for i in intervenants}
+        coordinates = [(e.latitude, e.longitude) for e in planning_events] + list(homes.values())
+        coordinates += [(i.latitude, i.longitude) for i in binome_visits.values()]
+        matrix = TravelMatrix(coordinates, travel_times=travel_times)
+        home_locs = {name: matrix.index_of(*home) for name, home in homes.items()}
+
+        visit_starts: Dict[str, List[int]] = {}
+        for client, start in sorted(binome_visits):
+            visit_starts.setdefault(client, []).append(start)
+
+        index = IntervalIndex(matrix)
+        legs: Dict[Tuple[str, int], List[PlanningEvent]] = {}
+        for event in planning_events:
+            try:
+                start, end = event.start_minutes, event.end_minutes
+            except ValueError:
+                continue
+            key = self._visit_key(event.client, start, visit_starts)
+            if key is not None:
+                legs.setdefault(key, []).append(event)
+            if not event.non_planifiable and event.intervenant and event.intervenant != "Non assigné":
+                index.add(event.intervenant, start, end, matrix.index_of(event.latitude, event.longitude))
+
+        result = list(planning_events)
+        touched: Set[Tuple[str, int]] = set()
+        for key in sorted(binome_visits):
+            intervention = binome_visits[key]
+            visit_legs = legs.get(key, [])
+            planned = [e for e in visit_legs if not e.non_planifiable]
+
+            if not planned:
+                # Visite non planifiée: chercher directement une paire d'intervenants libres
+                pair = self._plan_pair(visit_legs[0], intervention, index, matrix, home_locs, windows, result) \
+                    if visit_legs else None
+                if pair:
+                    touched.update((name, day_of(key[1])) for name in pair)
+                    summary["pairs_planned"] += 1
+                continue
+
+            primary = planned[0]
+            start, end = primary.start_minutes, primary.end_minutes
+            loc = matrix.index_of(primary.latitude, primary.longitude)
+            binome_id = primary.binome_id or derived_id(primary.id, "binome")
+            primary.binome_id = binome_id
+
+            partner = next((e for e in planned[1:] if e.intervenant != primary.intervenant), None)
+            if partner is not None and (partner.start, partner.end) != (primary.start, primary.end):
+                touched.add((partner.intervenant, day_of(start)))
+                # Second intervenant désaligné: le recaler sur le même créneau s'il est libre
+                index.remove(partner.intervenant, partner.start_minutes, partner.end_minutes,
+                             matrix.index_of(partner.latitude, partner.longitude))
+                if self._is_available(partner.intervenant, start, end, loc, index, home_locs, windows) is not None:
+                    partner.start, partner.end = primary.start, primary.end
+                    index.add(partner.intervenant, start, end, loc)
+                else:
+                    result.remove(partner)
+                    partner = None
+
+            # Legs surnuméraires (même intervenant ou troisième intervenant)
+            for extra in planned[1:]:
+                if extra is not partner and extra in result:
+                    index.remove(extra.intervenant, extra.start_minutes, extra.end_minutes,
+                                 matrix.index_of(extra.latitude, extra.longitude))
+                    result.remove(extra)
+                    touched.add((extra.intervenant, day_of(extra.start_minutes)))
+                    logger.info(f"👥 Binôme {primary.client}: leg surnuméraire de {extra.intervenant} retiré")
+
+            if partner is not None:
+                partner.binome_id = binome_id
+                summary["complete"] += 1
+                continue
+
+            candidates = self.free_partners(start, end, loc, {primary.intervenant}, index, home_locs, windows)
+            if candidates:
+                name = candidates[0][1]
+                result.append(self._leg(primary, name, binome_id))
+                index.add(name, start, end, loc)
+                touched.add((name, day_of(start)))
+                summary["partners_added"] += 1
+                logger.info(f"👥 Binôme {primary.client}: {primary.intervenant} + {name}")
+            else:
+                missing = self._leg(primary, "Non assigné", binome_id)
+                missing.non_planifiable = True
+                missing.color = NON_PLANIFIABLE_COLOR
+                missing.raison = "Binôme: aucun second intervenant libre sur le créneau"
+                result.append(missing)
+                summary["understaffed"] += 1
+                logger.warning(f"⚠️ Binôme {primary.client}: aucun second intervenant disponible")
+
+        self._refresh_trajets(result, touched, matrix)
+
+        logger.info(f"👥 Binômes: {summary['binomes']} visites, {summary['complete']} déjà complètes, "
+                    f"{summary['partners_added']} complétées, {summary['pairs_planned']} paires planifiées, "
+                    f"{summary['understaffed']} en sous-effectif")
+        return result, summary
+
+    def _visit_key(self, client: str, start: int, visit_starts: Dict[str, List[int]]) -> Optional[Tuple[str, int]]:
+        """Visite binôme à laquelle rattacher un événement: même client, début le plus proche dans la tolérance"""
+        starts = visit_starts.get(client)
+        if not starts:
+            return None
+        position = bisect.bisect_left(starts, start)
+        nearest = min(starts[max(position - 1, 0):position + 1], key=lambda visit_start: abs(visit_start - start))
+        return (client, nearest) if abs(nearest - start) <= START_TOLERANCE_MINUTES else None
+
+    def free_partners(self, start: int, end: int, loc: int, exclude: Set[str], index: IntervalIndex,
+                      home_locs: Dict[str, int], windows: Dict[str, Optional[Tuple[int, int]]]) -> List[Tuple[int, str]]:
+        """Intervenants libres sur le créneau, du plus proche au plus éloigné (surcoût de trajet)"""
+        candidates = []
+        for name in sorted(home_locs):
+            if name in exclude:
+                continue
+            cost = self._is_available(name, start, end, loc, index, home_locs, windows)
+            if cost is not None:
+                candidates.append((cost, name))
+        candidates.sort()
+        return candidates
+
+    def _is_available(self, name: str, start: int, end: int, loc: int, index: IntervalIndex,
+                      home_locs: Dict[str, int], windows: Dict[str, Optional[Tuple[int, int]]]) -> Optional[int]:
+        """Surcoût de trajet si l'intervenant est libre et dans sa plage horaire, sinon None"""
+        window = windows.get(name)
+        if window:
+            minute_of_day = start - day_of(start) * MINUTES_PER_DAY
+            if minute_of_day < window[0] or minute_of_day + (end - start) > window[1]:
+                return None
+        return index.insertion_cost(name, start, end, loc, home_locs.get(name, -1))
+
+    def _plan_pair(self, event: PlanningEvent, intervention: Intervention, index: IntervalIndex,
+                   matrix: TravelMatrix, home_locs: Dict[str, int],
+                   windows: Dict[str, Optional[Tuple[int, int]]], result: List[PlanningEvent]) -> Optional[Tuple[str, str]]:
+        """Planifie une visite binôme non planifiée sur deux intervenants libres à l'heure prévue"""
+        if intervention.end_minutes is None:
+            return None
+        start, end = intervention.start_minutes, intervention.end_minutes
+        loc = matrix.index_of(intervention.latitude, intervention.longitude)
+        candidates = self.free_partners(start, end, loc, set(), index, home_locs, windows)
+        if len(candidates) < 2:
+            return None
+
+        binome_id = derived_id(event.id, "binome")
+        first, second = candidates[0][1], candidates[1][1]
+        event.intervenant = first
+        event.start, event.end = minutes_to_iso(start), minutes_to_iso(end)
+        event.non_planifiable = False
+        event.raison = None
+        event.binome_id = binome_id
+        result.append(self._leg(event, second, binome_id))
+        index.add(first, start, end, loc)
+        index.add(second, start, end, loc)
+        logger.info(f"👥 Binôme {event.client} planifié: {first} + {second}")
+        return first, second
+
+    def _refresh_trajets(self, events: List[PlanningEvent], touched: Set[Tuple[str, int]],
+                         matrix: TravelMatrix) -> None:
+        """Recalcule les trajets des journées ayant reçu un intervenant de binôme"""
+        if not touched:
+            return
+        days: Dict[Tuple[str, int], List[Tuple[int, PlanningEvent]]] = {}
+        for event in events:
+            if event.non_planifiable:
+                continue
+            try:
+                start = event.start_minutes
+            except ValueError:
+                continue
+            key = (event.intervenant, day_of(start))
+            if key in touched:
+                days.setdefault(key, []).append((start, event))
+        for day_events in days.values():
+            day_events.sort(key=lambda item: item[0])
+            previous = None
+            for _, event in day_events:
+                minutes = 0 if previous is None else matrix.travel(
+                    previous.latitude, previous.longitude, event.latitude, event.longitude)
+                event.trajet_precedent = f"{minutes} min"
+                previous = event
+
+    def _leg(self, primary: PlanningEvent, intervenant: str, binome_id: str) -> PlanningEvent:
+        """Second événement d'un binôme, aligné sur le premier"""
+        return PlanningEvent(
+            id=derived_id(primary.id, "binome", intervenant),
+            client=primary.client,
+            intervenant=intervenant,
+            start=primary.start,
+            end=primary.end,
+            color=primary.color,
+            latitude=primary.latitude,
+            longitude=primary.longitude,
+            binome_id=binome_id
+        )
+
+# Instance globale du planificateur de binômes
+binome_planner = BinomePlanner()
@@ -0,0 +1,128 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_column_name(name: str) -> str:
+    """Normalise un nom de colonne: sans accents, casse, espaces, tirets ni underscores
+
+    Les en-têtes UTF-8 lus en Latin-1 ("DurÃ©e") sont d'abord réparés.
+    """
+    name = str(name).strip()
+    try:
+        name = name.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        pass
+    decomposed = unicodedata.normalize('NFKD', name)
+    ascii_name = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r'[\s_\-\.]+', '', ascii_name.lower())
+
+class ColumnSpec:
+    """Colonne attendue: nom logique, alias acceptés et mots-clés pour la recherche partielle"""
+
+    def __init__(self, name: str, aliases: Sequence[str] = (), keywords: Sequence[Tuple[str, ...]] = (),
+                 required: bool = True):
+        self.name = name
+        self.required = required
+        self.aliases = [name, *aliases]
+        self.normalized = {normalize_column_name(alias) for alias in self.aliases}
+        # Recherche partielle: tous les mots-clés d'un groupe présents dans le nom normalisé
+        self.keywords = [tuple(normalize_column_name(k) for k in group) for group in keywords] \
+            or [(normalize_column_name(name),)]
+
+    def matches_partially(self, normalized: str) -> bool:
+        return any(all(k in normalized for k in group) for group in self.keywords)
+
+class ColumnPlan:
+    """Correspondance résolue une fois par fichier entre colonnes logiques et colonnes du fichier"""
+
+    def __init__(self, label: str, mapping: Dict[str, str], matches: Dict[str, str], available: List[str]):
+        self.label = label
+        self.mapping = mapping  # Nom logique -> colonne du fichier
+        self.matches = matches  # Nom logique -> type de correspondance (exacte, alias, partielle)
+        self.available = available
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.mapping
+
+    def __getitem__(self, name: str) -> str:
+        return self.mapping[name]
+
+    def get(self, name: str) -> Optional[str]:
+        return self.mapping.get(name)
+
+    def describe(self) -> str:
+        return ", ".join(f"{name} <- {column} ({self.matches[name]})" for name, column in self.mapping.items())
+
+class ColumnSchema:
+    """Schéma déclaratif des colonnes d'un fichier d'entrée"""
+
+    def __init__(self, label: str, columns: Iterable[ColumnSpec]):
+        self.label = label
+        self.columns = list(columns)
+
+    def resolve(self, available_columns: Iterable[str]) -> ColumnPlan:
+        """Résout le schéma sur les colonnes d'un fichier
+
+        Les correspondances exactes et par alias sont attribuées en premier pour toutes les colonnes,
+        puis la recherche partielle porte sur les colonnes restantes (une colonne du fichier ne sert
+        qu'une fois: "Intervenant_referent" n'est pas prise pour "Intervenant").
+        """
+        available = [str(column).strip() for column in available_columns]
+        normalized = [normalize_column_name(column) for column in available]
+        mapping: Dict[str, str] = {}
+        matches: Dict[str, str] = {}
+        claimed = set()
+
+        for spec in self.columns:
+            for k, column in enumerate(available):
+                if k in claimed:
+                    continue
+                if column == spec.name or normalized[k] in spec.normalized:
+                    mapping[spec.name] = column
+                    matches[spec.name] = "exacte" if column == spec.name else "alias"
+                    claimed.add(k)
+                    break
+
+        for spec in self.columns:
+            if spec.name in mapping:
+                continue
+            for k, column in enumerate(available):
+                if k not in claimed and spec.matches_partially(normalized[k]):
+                    mapping[spec.name] = column
+                    matches[spec.name] = "partielle"
+                    claimed.add(k)
+                    break
+
+        missing = [spec for spec in self.columns if spec.required and spec.name not in mapping]
+        if missing:
+            details = "; ".join(f"'{spec.name}' (noms acceptés: {', '.join(spec.aliases)})" for spec in missing)
+            raise ValueError(f"Colonne(s) manquante(s) dans le fichier {self.label}: {details}. "
+                             f"Colonnes disponibles: {available}")
+
+        # Mapping trié dans l'ordre du schéma
+        ordered = {spec.name: mapping[spec.name] for spec in self.columns if spec.name in mapping}
+        plan = ColumnPlan(self.label, ordered, matches, available)
+        logger.info(f"🧭 Colonnes {self.label}: {plan.describe()}")
+        return plan
+
+INTERVENTIONS_SCHEMA = ColumnSchema("interventions", [
+    ColumnSpec("Client", aliases=["Bénéficiaire"]),
+    ColumnSpec("Date", aliases=["Date intervention", "Début"]),
+    ColumnSpec("Duree", aliases=["Durée", "Duration"], keywords=[("duree",), ("duration",)]),
+    ColumnSpec("Latitude", aliases=["Lat"]),
+    ColumnSpec("Longitude", aliases=["Lon", "Lng"]),
+    ColumnSpec("Intervenant", aliases=["Intervenant imposé"], required=False),
+    ColumnSpec("Binome", aliases=["Binôme"], required=False),
+    ColumnSpec("Intervenant_referent", aliases=["Référent", "Referent"], keywords=[("referent",)], required=False),
+])
+
+INTERVENANTS_SCHEMA = ColumnSchema("intervenants", [
+    ColumnSpec("Nom_Prenom", aliases=["Nom Prénom", "Prénom Nom", "Nom"], keywords=[("nom",), ("prenom",)]),
+    ColumnSpec("Latitude", aliases=["Lat"]),
+    ColumnSpec("Longitude", aliases=["Lon", "Lng"]),
+    ColumnSpec("Heure_Mensuel", aliases=["Heures mensuelles"], keywords=[("heure", "mensuel")]),
+    ColumnSpec("Heure_hebdomadaire", aliases=["Heures hebdomadaires"], keywords=[("heure", "hebdo")]),
+])
@@ -1,144 +1,274 @@
-import pandas as pd
-import io
+import codecs
+import csv
 import logging
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024  # Taille des blocs d'octets décodés à la volée
+MAX_QUOTED_LINES = 5  # Au-delà, un champ entre guillemets sur plusieurs lignes est considéré comme non fermé
+
 def clean_csv_file(file_content: bytes) -> bytes:
     """Nettoie un fichier CSV pour corriger les erreurs de format communes"""
     try:
-        # Essayer de décoder avec différents encodages
-        content_str = None
-        for encoding in ['utf-8', 'utf-8-sig', 'iso-8859-1', 'cp1252']:
-            try:
-                content_str = file_content.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if content_str is None:
-            content_str = file_content.decode('utf-8', errors='ignore')
-        
-        lines = content_str.split('\n')
-        cleaned_lines = []
-        
-        # Analyser l'en-tête pour déterminer le nombre de colonnes attendu
-        if lines:
-            header = lines[0].strip()
-            expected_columns = len(header.split(','))
-            cleaned_lines.append(header)
-            logger.info(f"En-tête détecté: {header}")
-            logger.info(f"Nombre de colonnes attendu: {expected_columns}")
-        
-        # Nettoyer chaque ligne
-        for line_num, line in enumerate(lines[1:], start=2):
-            if line.strip():
-                cleaned_line = clean_csv_line(line.strip(), expected_columns, line_num)
-                if cleaned_line:
-                    cleaned_lines.append(cleaned_line)
-        
-        # Reconstituer le contenu
-        cleaned_content = '\n'.join(cleaned_lines)
-        return cleaned_content.encode('utf-8')
-        
+        # UTF-8 (avec ou sans BOM), sinon Windows-1252
+        encoding = 'utf-8-sig'
+        try:
+            file_content.decode(encoding)
+        except UnicodeDecodeError:
+            encoding = 'cp1252'
+
+        return ''.join(CsvRepairStream(iter_decoded_chunks(file_content, encoding))).encode('utf-8')
+
     except Exception as e:
         logger.error(f"Erreur lors du nettoyage du fichier CSV: {str(e)}")
         return file_content
 
-def clean_csv_line(line: str, expected_columns: int, line_num: int) -> str:
-    """Nettoie une ligne CSV individuelle"""
+def clean_csv_text(content_str: str, delimiter: str = ',', quotechar: str = '"') -> str:
+    """Nettoie un contenu CSV déjà décodé (séparateur détecté en amont)"""
+    return ''.join(CsvRepairStream([content_str], delimiter, quotechar))
+
+def iter_decoded_chunks(source: Union[bytes, BinaryIO], encoding: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Décode le fichier (contenu ou fichier binaire ouvert) par blocs
+
+    Un caractère multi-octets peut être à cheval sur deux blocs: le décodeur incrémental le reconstitue.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for block in iter_byte_chunks(source, chunk_size):
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_byte_chunks(source: Union[bytes, BinaryIO], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Blocs d'octets d'un contenu en mémoire ou d'un fichier lu au fil de l'eau"""
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+        return
+    while True:
+        block = source.read(chunk_size)
+        if not block:
+            return
+        yield block
+
+def read_sample(source: Union[bytes, BinaryIO], size: int) -> bytes:
+    """Premiers octets du fichier, sans consommer un fichier ouvert"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:size])
+    position = source.tell()
+    sample = source.read(size)
+    source.seek(position)
+    return sample
+
+def iter_physical_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Découpe un flux de blocs texte en lignes physiques (sans fin de ligne)"""
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if pending:
+        yield pending.rstrip('\r')
+
+def iter_csv_records(chunks: Iterable[str], delimiter: str = ',',
+                     quotechar: str = '"') -> Iterator[Tuple[int, List[str], Optional[str]]]:
+    """Découpe le flux en enregistrements (n° de ligne, champs, texte d'origine) en respectant les guillemets
+
+    Un champ entre guillemets peut contenir le séparateur ou un retour à la ligne. Un enregistrement
+    dont les guillemets restent ouverts au-delà de MAX_QUOTED_LINES lignes est traité comme une ligne
+    aux guillemets déséquilibrés: sa première ligne est découpée sans guillemets, les suivantes relues.
+    """
+    lines = iter_physical_lines(chunks)
+    replay: List[Tuple[int, str]] = []
+    pending: List[Tuple[int, str]] = []
+    quotes = 0
+    line_num = 0
+
+    while True:
+        if replay:
+            number, line = replay.pop(0)
+        else:
+            line = next(lines, None)
+            if line is None:
+                if not pending:
+                    return
+                number = None
+            else:
+                line_num += 1
+                number = line_num
+
+        if number is not None:
+            if not pending and not line.strip():
+                continue
+            pending.append((number, line))
+            quotes += line.count(quotechar)
+            if quotes % 2 == 0:
+                record = pending[0][1] if len(pending) == 1 else '\n'.join(text for _, text in pending)
+                yield pending[0][0], _split_record(record, delimiter, quotechar), record
+                pending, quotes = [], 0
+                continue
+            if len(pending) < MAX_QUOTED_LINES:
+                continue
+
+        # Guillemets non fermés: ancienne stratégie sur la première ligne, relecture des suivantes
+        first_num, first_line = pending[0]
+        logger.warning(f"Ligne {first_num}: Guillemets déséquilibrés")
+        yield first_num, first_line.replace(quotechar, '').split(delimiter), None
+        replay = pending[1:] + replay
+        pending, quotes = [], 0
+
+def _split_record(record: str, delimiter: str, quotechar: str) -> List[str]:
+    if quotechar not in record:
+        return record.split(delimiter)
+    return next(csv.reader([record], delimiter=delimiter, quotechar=quotechar))
+
+def format_csv_record(fields: List[str], delimiter: str = ',', quotechar: str = '"') -> str:
+    """Réécrit un enregistrement en CSV valide (guillemets uniquement si nécessaire)"""
+    formatted = []
+    for field in fields:
+        if delimiter in field or quotechar in field or '\n' in field or '\r' in field:
+            field = quotechar + field.replace(quotechar, quotechar * 2) + quotechar
+        formatted.append(field)
+    return delimiter.join(formatted) + '\n'
+
+class CsvRepairStream:
+    """Flux texte réparé enregistrement par enregistrement, lisible directement par pandas.read_csv
+
+    La mémoire utilisée reste de l'ordre d'une ligne: les blocs sont décodés, découpés et corrigés
+    à la demande, au rythme des lectures du parseur.
+    """
+
+    def __init__(self, chunks: Iterable[str], delimiter: str = ',', quotechar: str = '"'):
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.expected_columns: Optional[int] = None
+        self.repaired_lines = 0
+        self._lines = self._repair(chunks)
+        self._buffer = ''
+
+    def _repair(self, chunks: Iterable[str]) -> Iterator[str]:
+        for line_num, fields, record in iter_csv_records(chunks, self.delimiter, self.quotechar):
+            if self.expected_columns is None:
+                # L'en-tête détermine le nombre de colonnes attendu
+                self.expected_columns = len(fields)
+                logger.info(f"En-tête détecté: {self.delimiter.join(fields)}")
+                logger.info(f"Nombre de colonnes attendu: {self.expected_columns}")
+            elif len(fields) != self.expected_columns:
+                fields = repair_fields(fields, self.expected_columns, line_num, self.delimiter)
+                self.repaired_lines += 1
+            elif record is not None:
+                # Enregistrement déjà valide: recopié tel quel
+                yield record + '\n'
+                continue
+            yield format_csv_record(fields, self.delimiter, self.quotechar)
+
+    def read(self, size: int = -1) -> str:
+        if size is None or size < 0:
+            data, self._buffer = self._buffer + ''.join(self._lines), ''
+            return data
+        parts, length = [self._buffer], len(self._buffer)
+        while length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        data = ''.join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._buffer:
+            yield self._buffer
+            self._buffer = ''
+        yield from self._lines
+
+def repair_fields(parts: List[str], expected_columns: int, line_num: int, delimiter: str = ',') -> List[str]:
+    """Ramène un enregistrement au nombre de colonnes attendu"""
     try:
-        # Cas 1: Ligne avec guillemets déséquilibrés
-        if line.count('"') % 2 != 0:
-            logger.warning(f"Ligne {line_num}: Guillemets déséquilibrés")
-            line = line.replace('"', '')
-        
-        # Cas 2: Trop de virgules (probablement dans l'adresse)
-        parts = line.split(',')
-        
+        # Trop de champs: séparateur non protégé (probablement dans l'adresse)
         if len(parts) > expected_columns:
             logger.warning(f"Ligne {line_num}: {len(parts)} champs trouvés, {expected_columns} attendus")
-            
+
             # Stratégie de correction basée sur le format attendu
             if expected_columns == 6:  # Client,Date,Durée,Adresse,CodePostal,Intervenant
-                corrected_line = fix_line_6_columns(parts, line_num)
+                corrected = fix_line_6_columns(parts, line_num, delimiter)
             elif expected_columns == 5:  # Client,Date,Durée,Adresse,Intervenant
-                corrected_line = fix_line_5_columns(parts, line_num)
+                corrected = fix_line_5_columns(parts, line_num, delimiter)
             else:
                 # Garder les premières colonnes et fusionner le reste
-                corrected_parts = parts[:expected_columns-1]
-                corrected_parts.append(','.join(parts[expected_columns-1:]))
-                corrected_line = ','.join(corrected_parts)
-            
-            logger.info(f"Ligne {line_num} corrigée: {line} -> {corrected_line}")
-            return corrected_line
-        
-        elif len(parts) < expected_columns:
-            # Pas assez de colonnes, ajouter des valeurs vides
-            while len(parts) < expected_columns:
-                parts.append('')
-            logger.warning(f"Ligne {line_num}: Colonnes manquantes ajoutées")
-            return ','.join(parts)
-        
-        return line
-        
+                corrected = parts[:expected_columns-1]
+                corrected.append(delimiter.join(parts[expected_columns-1:]))
+
+            logger.info(f"Ligne {line_num} corrigée: {delimiter.join(parts)} -> {corrected}")
+            return corrected
+
+        # Pas assez de colonnes, ajouter des valeurs vides
+        logger.warning(f"Ligne {line_num}: Colonnes manquantes ajoutées")
+        return parts + [''] * (expected_columns - len(parts))
+
     except Exception as e:
         logger.error(f"Erreur ligne {line_num}: {str(e)}")
-        return line
+        return parts
 
-def fix_line_6_columns(parts: list, line_num: int) -> str:
+def fix_line_6_columns(parts: List[str], line_num: int, delimiter: str = ',') -> List[str]:
     """Corrige une ligne pour 6 colonnes: Client,Date,Durée,Adresse,CodePostal,Intervenant"""
     try:
         # Les 3 premières colonnes sont fixes
         client = parts[0].strip()
         date = parts[1].strip()
         duree = parts[2].strip()
-        
+
         # L'intervenant est la dernière colonne (peut être vide)
         intervenant = parts[-1].strip() if parts[-1].strip() else ""
-        
+
         # Chercher le code postal (probablement numérique)
         code_postal = ""
         code_postal_index = -1
-        
+
         # Chercher de la fin vers le début (en excluant l'intervenant)
         for i in range(len(parts) - 2, 2, -1):
             if parts[i].strip().isdigit() and len(parts[i].strip()) == 5:
                 code_postal = parts[i].strip()
                 code_postal_index = i
                 break
-        
+
         # L'adresse est entre durée et code postal (ou intervenant si pas de code postal)
         if code_postal_index > 0:
             adresse_parts = parts[3:code_postal_index]
         else:
             adresse_parts = parts[3:-1]
-            
-        adresse = ','.join(adresse_parts).strip()
-        
-        return f"{client},{date},{duree},{adresse},{code_postal},{intervenant}"
-        
+
+        adresse = delimiter.join(adresse_parts).strip()
+
+        return [client, date, duree, adresse, code_postal, intervenant]
+
     except Exception as e:
         logger.error(f"Erreur correction ligne {line_num}: {str(e)}")
-        return ','.join(parts)
+        return parts
 
-def fix_line_5_columns(parts: list, line_num: int) -> str:
+def fix_line_5_columns(parts: List[str], line_num: int, delimiter: str = ',') -> List[str]:
     """Corrige une ligne pour 5 colonnes: Client,Date,Durée,Adresse,Intervenant"""
     try:
         # Les 3 premières colonnes sont fixes
         client = parts[0].strip()
         date = parts[1].strip()
         duree = parts[2].strip()
-        
+
         # L'intervenant est la dernière colonne
         intervenant = parts[-1].strip() if parts[-1].strip() else ""
-        
+
         # L'adresse est tout ce qui est entre durée et intervenant
         adresse_parts = parts[3:-1]
-        adresse = ','.join(adresse_parts).strip()
-        
-        return f"{client},{date},{duree},{adresse},{intervenant}"
-        
+        adresse = delimiter.join(adresse_parts).strip()
+
+        return [client, date, duree, adresse, intervenant]
+
     except Exception as e:
         logger.error(f"Erreur correction ligne {line_num}: {str(e)}")
-        return ','.join(parts)
+        return parts
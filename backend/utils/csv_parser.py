@@ -1,14 +1,30 @@
 import pandas as pd
-import io
+import numpy as np
+import codecs
+import csv
+import itertools
 import re
-from typing import List, Tuple
+from datetime import datetime, time, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Set, Tuple, Union
 from models import Intervention, Intervenant
 import logging
 import chardet
-from utils.csv_cleaner import clean_csv_file
+from utils.csv_cleaner import CsvRepairStream, iter_decoded_chunks, read_sample
+from utils.time_utils import EPOCH
+from utils.column_schema import ColumnPlan, INTERVENTIONS_SCHEMA, INTERVENANTS_SCHEMA
+from utils.input_readers import (
+    ARROW_FILE_MAGIC, detect_input_format, read_parquet_chunks, read_arrow_chunks, read_xlsx_chunks
+)
 
 logger = logging.getLogger(__name__)
 
+SNIFF_SAMPLE_BYTES = 64 * 1024  # Échantillon utilisé pour détecter l'encodage
+SNIFF_SAMPLE_LINES = 20  # Premières lignes utilisées pour détecter le séparateur
+SNIFF_DELIMITERS = ',;\t|'
+CSV_CHUNK_ROWS = 20000  # Lignes chargées en DataFrame à la fois
+DUPLICATE_INTERVENANT = "intervenant déjà présent (doublon détecté)"
+INPUT_DATE_FORMAT = "%d/%m/%Y %H:%M"
+
 def extract_city_from_address(address: str) -> str:
     """Extrait la ville depuis une adresse pour définir le secteur"""
     try:
@@ -67,481 +83,372 @@ def detect_special_intervenants(nom_prenom: str) -> Tuple[List[str], str]:
     
     return specialites, plage_horaire
 
-def calculate_weekend_roulement(heure_hebdomaire: str) -> str:
-    """Calcule le roulement week-end selon les heures hebdomadaires"""
+def calculate_weekend_roulement(heures_hebdomadaires: pd.Series) -> pd.Series:
+    """Calcule le roulement week-end selon les heures hebdomadaires ("35h", "24h"...), pour une colonne entière
+
+    Les temps pleins (35h et plus) sont en roulement A/B: "A" par défaut, l'IA décidera du roulement;
+    les temps partiels et les valeurs illisibles sont exemptés.
+    """
+    heures = pd.to_numeric(heures_hebdomadaires.str.extract(r'(\d+)', expand=False), errors='coerce')
+    return pd.Series(np.where(heures >= 35, "A", "exempt"), index=heures_hebdomadaires.index)
+
+def _clean_text_column(series: pd.Series) -> pd.Series:
+    """Nettoie une colonne texte: valeurs manquantes et "nan" remplacées par "", espaces supprimés
+
+    Les colonnes typées (XLSX, Parquet, Arrow) sont mises au format texte attendu par les modèles:
+    dates en "29/06/2025 08:00", durées en "01:30".
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(INPUT_DATE_FORMAT).fillna("")
+    if pd.api.types.is_timedelta64_dtype(series):
+        minutes = series.dt.total_seconds() // 60
+        hours = (minutes // 60).astype('Int64').astype(str).str.zfill(2)
+        text = hours + ":" + (minutes % 60).astype('Int64').astype(str).str.zfill(2)
+        return text.where(series.notna(), "")
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+        # Colonne XLSX mêlant cellules typées et texte: conversion cellule par cellule
+        series = series.map(_format_typed_cell, na_action='ignore')
+    text = series.astype(str).str.strip()
+    return text.where(series.notna() & (text.str.lower() != 'nan'), "")
+
+def _format_typed_cell(value):
+    """Met une date ou une durée typée au format texte des modèles, laisse les autres valeurs inchangées"""
+    if isinstance(value, datetime):  # pd.Timestamp compris
+        return value.strftime(INPUT_DATE_FORMAT)
+    if isinstance(value, timedelta):  # pd.Timedelta compris
+        minutes = int(value.total_seconds() // 60)
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    if isinstance(value, time):
+        return f"{value.hour:02d}:{value.minute:02d}"
+    return value
+
+def _optional_text_column(df: pd.DataFrame, plan: ColumnPlan, name: str) -> pd.Series:
+    """Colonne optionnelle nettoyée, ou colonne vide si le fichier ne la contient pas"""
+    column = plan.get(name)
+    return _clean_text_column(df[column]) if column else pd.Series("", index=df.index)
+
+def _date_minutes(raw: pd.Series, text: pd.Series) -> np.ndarray:
+    """Dates d'intervention en minutes depuis l'epoch (colonne typée ou texte "29/06/2025 08:00")"""
+    if pd.api.types.is_datetime64_any_dtype(raw):
+        parsed = raw.dt.tz_localize(None) if raw.dt.tz is not None else raw
+    else:
+        parsed = pd.to_datetime(text, format=INPUT_DATE_FORMAT, errors='coerce')
+    minutes = (parsed - pd.Timestamp(EPOCH)) // pd.Timedelta(minutes=1)
+    return minutes.astype('Int64').to_numpy(dtype=object, na_value=None)
+
+def _duree_minutes(raw: pd.Series, text: pd.Series) -> np.ndarray:
+    """Durées en minutes (colonne typée ou texte "01:30")"""
+    if pd.api.types.is_timedelta64_dtype(raw):
+        minutes = raw.dt.total_seconds() // 60
+    else:
+        parts = text.str.extract(r'^(\d+):(\d+)').apply(pd.to_numeric, errors='coerce')
+        minutes = parts[0] * 60 + parts[1]
+    return minutes.astype('Int64').to_numpy(dtype=object, na_value=None)
+
+def _parse_coordinate_column(series: pd.Series) -> pd.Series:
+    """Convertit une colonne de coordonnées en float (virgules décimales françaises acceptées)"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    return pd.to_numeric(series.astype(str).str.strip().str.replace(',', '.', regex=False), errors='coerce')
+
+def _parse_coordinates(latitude: pd.Series, longitude: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series, pd.Series]:
+    """Retourne latitudes, longitudes, masque des valeurs numériques et masque des coordonnées valides"""
+    lat = _parse_coordinate_column(latitude)
+    lon = _parse_coordinate_column(longitude)
+    parsed = lat.notna() & lon.notna()
+    valid = parsed & lat.between(-90, 90) & lon.between(-180, 180)
+    return lat, lon, parsed, valid
+
+def _skip_rows(skipped: Dict[str, List[int]], index: pd.Index, raison: str) -> None:
+    """Mémorise les lignes ignorées d'un bloc, journalisées en une fois en fin de parsing"""
+    if len(index):
+        skipped.setdefault(raison, []).extend(index.tolist())
+
+def _log_skipped_rows(index: List[int], raison: str, max_listed: int = 10) -> None:
+    """Journalise en une ligne les lignes ignorées (numéros de ligne du fichier, en-tête compris)"""
+    if len(index) == 0:
+        return
+    lines = ", ".join(str(i + 2) for i in index[:max_listed])
+    suffix = "..." if len(index) > max_listed else ""
+    logger.warning(f"   ⚠️ {len(index)} ligne(s) ignorée(s) : {raison} (lignes {lines}{suffix})")
+
+class CsvDialect:
+    """Encodage et format détectés pour un fichier CSV"""
+
+    def __init__(self, encoding: str, delimiter: str = ',', quotechar: str = '"',
+                 skipinitialspace: bool = False):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.skipinitialspace = skipinitialspace
+
+    def __repr__(self) -> str:
+        return f"encodage={self.encoding}, séparateur={self.delimiter!r}, guillemets={self.quotechar!r}"
+
+def detect_encoding(sample: bytes, complete: bool = True) -> str:
+    """Détecte l'encodage du fichier CSV sur un échantillon borné (complete: l'échantillon est le fichier entier)"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
     try:
-        # Extraire le nombre d'heures
-        heures = int(re.findall(r'\d+', heure_hebdomaire)[0])
-        
-        if heures >= 35:
-            # Les temps pleins sont en roulement A/B (à attribuer automatiquement)
-            return "A"  # Par défaut, l'IA décidera du roulement
-        else:
-            return "exempt"
-    except:
-        return "exempt"
-
-def detect_encoding(file_content: bytes) -> str:
-    """Détecte l'encodage du fichier CSV"""
+        # Décodage incrémental: un caractère multi-octets coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
     try:
-        # Essayer de détecter l'encodage automatiquement
-        detected = chardet.detect(file_content)
-        encoding = detected.get('encoding', 'utf-8')
+        detected = chardet.detect(sample)
+        encoding = detected.get('encoding') or 'cp1252'
+        codecs.lookup(encoding)
         logger.info(f"Encodage détecté: {encoding} (confiance: {detected.get('confidence', 0):.2f})")
         return encoding
     except Exception as e:
         logger.warning(f"Impossible de détecter l'encodage: {str(e)}")
-        return 'utf-8'
+        return 'cp1252'
 
-def try_multiple_encodings(file_content: bytes) -> pd.DataFrame:
-    """Essaie plusieurs encodings et options pour lire le fichier CSV"""
-    # D'abord, essayer de nettoyer le fichier
+def sniff_dialect(content: str, encoding: str) -> CsvDialect:
+    """Détecte séparateur et guillemets sur les premières lignes du fichier"""
+    sample = '\n'.join(content.split('\n', SNIFF_SAMPLE_LINES)[:SNIFF_SAMPLE_LINES])
     try:
-        logger.info("Tentative de nettoyage du fichier CSV")
-        cleaned_content = clean_csv_file(file_content)
+        sniffed = csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS)
+        return CsvDialect(encoding, sniffed.delimiter, sniffed.quotechar or '"', sniffed.skipinitialspace)
+    except csv.Error:
+        # Échantillon ambigu: séparateur le plus fréquent dans l'en-tête
+        header = sample.split('\n', 1)[0]
+        delimiter = max(SNIFF_DELIMITERS, key=header.count)
+        return CsvDialect(encoding, delimiter if header.count(delimiter) else ',')
+
+def read_csv_chunks(source: Union[bytes, BinaryIO], chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Détecte encodage et format sur un échantillon puis lit le fichier CSV en une seule passe, par blocs de lignes
+
+    La source (contenu ou fichier binaire ouvert) est décodée, réparée et parsée au fil de l'eau: seul le bloc
+    de lignes courant est chargé en DataFrame.
+    """
+    sample_bytes = read_sample(source, SNIFF_SAMPLE_BYTES + 1)
+    if not sample_bytes.strip():
+        raise ValueError("❌ Fichier CSV vide")
+
+    encoding = detect_encoding(sample_bytes[:SNIFF_SAMPLE_BYTES], complete=len(sample_bytes) <= SNIFF_SAMPLE_BYTES)
+    sample = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample_bytes[:SNIFF_SAMPLE_BYTES])
+    dialect = sniff_dialect(sample.lstrip('\ufeff'), encoding)
+    logger.info(f"🔎 Format détecté: {dialect}")
+
+    # Décodage, découpage et réparation à la volée, au rythme des lectures de pandas
+    stream = CsvRepairStream(iter_decoded_chunks(source, encoding), dialect.delimiter, dialect.quotechar)
+
+    try:
+        reader = pd.read_csv(stream, sep=dialect.delimiter, quotechar=dialect.quotechar,
+                             skipinitialspace=dialect.skipinitialspace, on_bad_lines='skip', chunksize=chunk_rows)
+        first = next(reader, None)
     except Exception as e:
-        logger.warning(f"Échec du nettoyage: {str(e)}")
-        cleaned_content = file_content
-    
-    encodings_to_try = [
-        'utf-8',
-        'utf-8-sig',  # UTF-8 avec BOM
-        'iso-8859-1',  # Latin-1
-        'cp1252',  # Windows-1252
-        'ascii'
-    ]
-    
-    # Ajouter l'encodage détecté en premier
-    detected_encoding = detect_encoding(cleaned_content)
-    if detected_encoding and detected_encoding not in encodings_to_try:
-        encodings_to_try.insert(0, detected_encoding)
-    
-    # Options de lecture CSV pour gérer différents cas
-    csv_options_list = [
-        {},  # Options par défaut
-        {'sep': ';'},  # Séparateur point-virgule
-        {'quotechar': '"', 'quoting': 1},  # Gestion des guillemets
-        {'skipinitialspace': True},  # Ignorer les espaces initiaux
-        {'on_bad_lines': 'skip'},  # Ignorer les lignes malformées (pandas récent)
-    ]
+        logger.error(f"Erreur de lecture CSV ({dialect}): {str(e)}")
+        first = None
+
+    if first is None or first.empty or len(first.columns) < 3:
+        raise ValueError(
+            "❌ Impossible de lire le fichier CSV. Vérifiez que :\n"
+            "1. Le fichier est bien au format CSV\n"
+            "2. Les colonnes sont séparées par des virgules ou des points-virgules\n"
+            "3. Les valeurs contenant le séparateur sont entre guillemets\n"
+            "4. Toutes les lignes ont le même nombre de colonnes\n"
+            f"5. L'encodage est UTF-8 (format détecté: {dialect})"
+        )
+
+    rows = len(first)
+    first.attrs['dialect'] = dialect
+    yield first
+    for chunk in reader:
+        rows += len(chunk)
+        yield chunk
+
+    if stream.repaired_lines:
+        logger.warning(f"🔧 {stream.repaired_lines} ligne(s) réparée(s) (nombre de colonnes)")
+    logger.info(f"✅ Lecture réussie en une passe: {rows} lignes, {len(first.columns)} colonnes ({dialect})")
+
+def read_input_chunks(source: Union[bytes, BinaryIO], chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Lit un fichier d'entrée par blocs de lignes, quel que soit son format (CSV, XLSX, Parquet, Arrow)
+
+    Les formats typés sont lus directement en colonnes, sans détection d'encodage ni réparation.
+    """
+    input_format = detect_input_format(read_sample(source, len(ARROW_FILE_MAGIC)))
+    if input_format == 'csv':
+        yield from read_csv_chunks(source, chunk_rows)
+        return
+
+    logger.info(f"🔎 Format détecté: {input_format}")
+    if input_format == 'parquet':
+        chunks = read_parquet_chunks(source, chunk_rows)
+    elif input_format == 'xlsx':
+        chunks = read_xlsx_chunks(source, chunk_rows)
+    else:
+        chunks = read_arrow_chunks(source, chunk_rows, stream=input_format == 'arrow_stream')
+
+    first = next(chunks, None)
+    if first is None or first.empty or len(first.columns) < 3:
+        raise ValueError(f"❌ Fichier {input_format} vide ou avec moins de 3 colonnes")
+    rows = len(first)
+    yield first
+    for chunk in chunks:
+        rows += len(chunk)
+        yield chunk
+    logger.info(f"✅ Lecture réussie ({input_format}): {rows} lignes, {len(first.columns)} colonnes")
+
+def _build_interventions(df: pd.DataFrame, plan: ColumnPlan, skipped: Dict[str, List[int]]) -> List[Intervention]:
+    """Construit les interventions valides d'un bloc de lignes"""
+    # Nettoyage colonne par colonne
+    client = _clean_text_column(df[plan['Client']])
+    date = _clean_text_column(df[plan['Date']])
+    duree = _clean_text_column(df[plan['Duree']])
+    lat, lon, coords_parsed, coords_valid = _parse_coordinates(df[plan['Latitude']], df[plan['Longitude']])
     
-    # Pour les versions plus anciennes de pandas
-    try:
-        import pandas as pd
-        if hasattr(pd, '__version__') and int(pd.__version__.split('.')[0]) < 1:
-            csv_options_list.append({'error_bad_lines': False, 'warn_bad_lines': True})
-    except:
-        pass
+    # Ignorer les lignes avec des valeurs manquantes critiques
+    complete = (client != "") & (date != "") & (duree != "")
+    _skip_rows(skipped, df.index[~complete], "données manquantes critiques")
+    _skip_rows(skipped, df.index[complete & ~coords_parsed], "coordonnées non numériques")
+    _skip_rows(skipped, df.index[complete & coords_parsed & ~coords_valid], "coordonnées invalides")
+    valid = (complete & coords_valid).to_numpy()
     
-    for encoding in encodings_to_try:
-        for options in csv_options_list:
-            try:
-                logger.info(f"Tentative avec encodage: {encoding}, options: {options}")
-                
-                df = pd.read_csv(io.BytesIO(cleaned_content), encoding=encoding, **options)
-                
-                # Vérifier que le DataFrame est valide
-                if not df.empty and len(df.columns) >= 3:
-                    logger.info(f"✅ Lecture réussie avec {encoding} et options {options}")
-                    return df
-                else:
-                    logger.warning(f"DataFrame invalide avec {encoding}")
-                    
-            except Exception as e:
-                logger.debug(f"Échec avec {encoding} et {options}: {str(e)}")
-                continue
+    # Colonnes optionnelles résolues par le plan: intervenant imposé, binôme, référent
+    intervenant = _optional_text_column(df, plan, 'Intervenant')
+    binome = _optional_text_column(df, plan, 'Binome').str.lower().isin(['true', '1', 'oui', 'yes'])
+    intervenant_referent = _optional_text_column(df, plan, 'Intervenant_referent')
     
-    # Dernière tentative avec nettoyage manuel ligne par ligne
-    try:
-        logger.info("Tentative de nettoyage manuel avancé")
-        content_str = cleaned_content.decode('utf-8', errors='ignore')
-        
-        lines = content_str.split('\n')
-        if not lines:
-            raise ValueError("Fichier vide")
-        
-        # Analyser l'en-tête
-        header = lines[0].strip()
-        if not header:
-            raise ValueError("En-tête manquant")
-        
-        expected_columns = len(header.split(','))
-        logger.info(f"En-tête: {header}, colonnes attendues: {expected_columns}")
-        
-        # Construire un CSV valide
-        valid_lines = [header]
-        for i, line in enumerate(lines[1:], start=2):
-            if line.strip():
-                # Essayer de corriger la ligne
-                parts = line.split(',')
-                if len(parts) != expected_columns:
-                    logger.warning(f"Ligne {i}: {len(parts)} champs au lieu de {expected_columns}")
-                    # Correction simple: prendre les premières colonnes et fusionner le reste
-                    if len(parts) > expected_columns:
-                        corrected_parts = parts[:expected_columns-1]
-                        corrected_parts.append(','.join(parts[expected_columns-1:]))
-                        line = ','.join(corrected_parts)
-                
-                valid_lines.append(line.strip())
-        
-        # Créer le DataFrame à partir du contenu corrigé
-        corrected_content = '\n'.join(valid_lines)
-        df = pd.read_csv(io.StringIO(corrected_content))
-        
-        if not df.empty:
-            logger.info("✅ Lecture réussie après correction manuelle")
-            return df
-            
-    except Exception as e:
-        logger.error(f"Erreur lors du nettoyage manuel: {str(e)}")
+    # Horaires en minutes depuis l'epoch, calculés pour tout le bloc (None si illisibles)
+    start_minutes = _date_minutes(df[plan['Date']][valid], date[valid])
+    duree_minutes = _duree_minutes(df[plan['Duree']][valid], duree[valid])
     
-    raise ValueError(
-        "❌ Impossible de lire le fichier CSV. Vérifiez que :\n"
-        "1. Le fichier est bien au format CSV\n"
-        "2. Les colonnes sont séparées par des virgules\n"
-        "3. Il n'y a pas de virgules dans les données (utilisez des guillemets si nécessaire)\n"
-        "4. Toutes les lignes ont le même nombre de colonnes\n"
-        "5. L'encodage est UTF-8"
-    )
-
-def parse_interventions_csv(file_content: bytes) -> List[Intervention]:
-    """Parse le fichier interventions.csv et retourne une liste d'Intervention"""
+    # Construction des modèles en une passe à partir des colonnes nettoyées
+    return [
+        Intervention(
+            client=c, date=d, duree=du, latitude=la, longitude=lo, intervenant=iv,
+            binome=bi, intervenant_referent=ref, secteur="", start_minutes=sm, duree_minutes=dm
+        )
+        for c, d, du, la, lo, iv, bi, ref, sm, dm in zip(
+            client[valid].tolist(), date[valid].tolist(), duree[valid].tolist(),
+            lat[valid].tolist(), lon[valid].tolist(), intervenant[valid].tolist(),
+            binome[valid].tolist(), intervenant_referent[valid].tolist(), start_minutes, duree_minutes
+        )
+    ]
+
+def parse_interventions_csv(file_content: Union[bytes, BinaryIO]) -> List[Intervention]:
+    """Parse le fichier des interventions (CSV, XLSX, Parquet ou Arrow; contenu ou fichier ouvert, lu par blocs)"""
     try:
-        # Lire le CSV avec détection d'encodage
-        df = try_multiple_encodings(file_content)
+        # Lire le fichier par blocs (détection du format, et de l'encodage pour un CSV)
+        chunks = read_input_chunks(file_content)
+        df = next(chunks)
         
         # Nettoyer les noms de colonnes (enlever les espaces et caractères invisibles)
-        df.columns = df.columns.str.strip()
+        columns = df.columns.str.strip()
         
-        # Supprimer les lignes complètement vides
-        df = df.dropna(how='all')
+        # Résoudre le schéma une fois pour tout le fichier (colonnes obligatoires et optionnelles)
+        plan = INTERVENTIONS_SCHEMA.resolve(columns)
         
-        # Vérifier les colonnes obligatoires (avec latitude/longitude)
-        required_columns = ['Client', 'Date', 'Duree', 'Latitude', 'Longitude']
-        available_columns = df.columns.tolist()
+        interventions: List[Intervention] = []
+        skipped: Dict[str, List[int]] = {}
+        total_rows = 0
+        for df in itertools.chain([df], chunks):
+            df.columns = columns
+            # Supprimer les lignes complètement vides
+            df = df.dropna(how='all')
+            total_rows += len(df)
+            interventions.extend(_build_interventions(df, plan, skipped))
         
-        # Mapping flexible des colonnes
-        column_mapping = {}
-        for req_col in required_columns:
-            found = False
-            for avail_col in available_columns:
-                # Comparaison flexible (sans accents et casse)
-                req_normalized = req_col.lower().replace('é', 'e').replace('è', 'e').replace('à', 'a').replace('ç', 'c')
-                avail_normalized = avail_col.lower().replace('é', 'e').replace('è', 'e').replace('à', 'a').replace('ç', 'c').replace('ã©', 'e').replace('ã¨', 'e')
-                
-                if req_normalized == avail_normalized:
-                    column_mapping[req_col] = avail_col
-                    found = True
-                    logger.info(f"Mapping flexible: {req_col} -> {avail_col}")
-                    break
-                    
-            if not found:
-                # Recherche partielle pour certains termes spéciaux
-                for avail_col in available_columns:
-                    avail_lower = avail_col.lower().replace('é', 'e').replace('ã©', 'e')
-                    req_lower = req_col.lower().replace('é', 'e')
-                    
-                    if (req_lower == 'duree' and ('duree' in avail_lower or 'duree' in avail_lower or 'duration' in avail_lower)) or \
-                       (req_lower in avail_lower):
-                        column_mapping[req_col] = avail_col
-                        found = True
-                        logger.info(f"Mapping partiel: {req_col} -> {avail_col}")
-                        break
-            if not found:
-                raise ValueError(f"Colonne manquante dans interventions.csv: '{req_col}'. Colonnes disponibles: {available_columns}")
-        
-        # Rechercher la colonne Intervenant
-        intervenant_col = None
-        for col in available_columns:
-            if 'intervenant' in col.lower():
-                intervenant_col = col
-                break
-        
-        logger.info(f"Colonnes mappées: {column_mapping}")
-        if intervenant_col:
-            logger.info(f"Colonne intervenant trouvée: {intervenant_col}")
-        
-        logger.info(f"📊 PARSING INTERVENTIONS - {len(df)} lignes détectées")
-        
-        interventions = []
-        for index, row in df.iterrows():
-            try:
-                if (index + 1) % 5 == 0:  # Log tous les 5 lignes
-                    logger.info(f"   🔄 Traitement ligne {index + 1}/{len(df)}")
-                
-                logger.debug(f"Traitement ligne {index + 2}: {dict(row)}")
-                
-                # Vérifier que les colonnes critiques ne sont pas vides
-                client = str(row[column_mapping['Client']]).strip()
-                date = str(row[column_mapping['Date']]).strip()
-                duree = str(row[column_mapping['Duree']]).strip()
-                latitude = row[column_mapping['Latitude']]
-                longitude = row[column_mapping['Longitude']]
-                
-                logger.debug(f"Ligne {index + 2}: Valeurs extraites - client='{client}', date='{date}', duree='{duree}', lat='{latitude}', lon='{longitude}'")
-                
-                # Ignorer les lignes avec des valeurs manquantes critiques
-                if (pd.isna(row[column_mapping['Client']]) or 
-                    pd.isna(row[column_mapping['Date']]) or 
-                    pd.isna(row[column_mapping['Duree']]) or
-                    pd.isna(row[column_mapping['Latitude']]) or
-                    pd.isna(row[column_mapping['Longitude']]) or
-                    client.lower() in ['nan', ''] or 
-                    date.lower() in ['nan', ''] or
-                    duree.lower() in ['nan', '']):
-                    logger.warning(f"   ⚠️ Ligne {index + 2} ignorée : données manquantes critiques")
-                    continue
-                
-                # Valider les coordonnées
-                try:
-                    # Gérer les virgules françaises comme séparateurs décimaux
-                    lat_str = str(latitude).replace(',', '.')
-                    lon_str = str(longitude).replace(',', '.')
-                    
-                    lat = float(lat_str)
-                    lon = float(lon_str)
-                    
-                    logger.debug(f"   ✅ Ligne {index + 2}: Coordonnées validées - lat={lat}, lon={lon}")
-                    
-                    # Vérifier que les coordonnées sont valides
-                    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                        logger.warning(f"   ❌ Ligne {index + 2} ignorée : coordonnées invalides ({lat}, {lon})")
-                        continue
-                        
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"   ❌ Ligne {index + 2} ignorée : coordonnées non numériques - latitude='{latitude}', longitude='{longitude}', error={str(e)}")
-                    continue
-                
-                # Récupérer l'intervenant (peut être vide)
-                intervenant = ""
-                if intervenant_col and pd.notna(row.get(intervenant_col)):
-                    intervenant = str(row[intervenant_col]).strip()
-                    if intervenant.lower() == 'nan':
-                        intervenant = ""
-                
-                # Déterminer le secteur (optionnel, peut être dérivé des coordonnées si nécessaire)
-                secteur = ""  # Peut être ajouté plus tard via géocodage inverse si nécessaire
-                
-                # Détecter si c'est une intervention binôme (colonne optionnelle)
-                binome = False
-                if 'Binome' in df.columns or 'Binôme' in df.columns:
-                    binome_col = 'Binome' if 'Binome' in df.columns else 'Binôme'
-                    if pd.notna(row.get(binome_col)):
-                        binome_val = str(row[binome_col]).strip().lower()
-                        binome = binome_val in ['true', '1', 'oui', 'yes']
-                
-                # Détecter l'intervenant référent (colonne optionnelle)
-                intervenant_referent = ""
-                if 'Intervenant_referent' in df.columns or 'Référent' in df.columns:
-                    ref_col = 'Intervenant_referent' if 'Intervenant_referent' in df.columns else 'Référent'
-                    if pd.notna(row.get(ref_col)):
-                        intervenant_referent = str(row[ref_col]).strip()
-                        if intervenant_referent.lower() == 'nan':
-                            intervenant_referent = ""
-
-                intervention = Intervention(
-                    client=client,
-                    date=date,
-                    duree=duree,
-                    latitude=lat,
-                    longitude=lon,
-                    intervenant=intervenant,
-                    binome=binome,
-                    intervenant_referent=intervenant_referent,
-                    secteur=secteur
-                )
-                interventions.append(intervention)
-                
-                logger.debug(f"Intervention créée: {intervention.client} le {intervention.date} à ({lat:.4f},{lon:.4f})")
-                
-            except Exception as e:
-                logger.warning(f"Erreur ligne {index + 2}: {str(e)} - Ligne ignorée")
-                continue
+        logger.info(f"📊 PARSING INTERVENTIONS - {total_rows} lignes détectées")
+        for raison, rows in skipped.items():
+            _log_skipped_rows(rows, raison)
         
         if not interventions:
             raise ValueError("Aucune intervention valide trouvée dans le fichier")
         
         logger.info(f"✅ PARSING INTERVENTIONS TERMINÉ")
-        logger.info(f"   • Lignes traitées: {len(df)}")
+        logger.info(f"   • Lignes traitées: {total_rows}")
         logger.info(f"   • Interventions valides: {len(interventions)}")
-        logger.info(f"   • Taux de succès: {len(interventions)/len(df)*100:.1f}%")
+        logger.info(f"   • Taux de succès: {len(interventions)/total_rows*100:.1f}%")
         return interventions
         
     except Exception as e:
         logger.error(f"Erreur parsing interventions.csv: {str(e)}")
         raise ValueError(f"Erreur lors du parsing des interventions: {str(e)}")
 
-def parse_intervenants_csv(file_content: bytes) -> List[Intervenant]:
-    """Parse le fichier intervenants.csv et retourne une liste d'Intervenant"""
+def _build_intervenants(df: pd.DataFrame, plan: ColumnPlan, seen: Set[str],
+                        skipped: Dict[str, List[int]]) -> List[Intervenant]:
+    """Construit les intervenants valides d'un bloc de lignes (seen: noms déjà retenus, en minuscules)"""
+    # Nettoyage colonne par colonne
+    nom = _clean_text_column(df[plan['Nom_Prenom']])
+    temps_mensuel = _clean_text_column(df[plan['Heure_Mensuel']])
+    temps_hebdo = _clean_text_column(df[plan['Heure_hebdomadaire']])
+    lat, lon, coords_parsed, coords_valid = _parse_coordinates(df[plan['Latitude']], df[plan['Longitude']])
+    
+    # Ignorer les lignes avec des valeurs manquantes critiques
+    complete = (nom != "") & (temps_mensuel != "") & (temps_hebdo != "")
+    _skip_rows(skipped, df.index[~complete], "données manquantes critiques")
+    _skip_rows(skipped, df.index[complete & ~coords_parsed], "coordonnées non numériques")
+    _skip_rows(skipped, df.index[complete & coords_parsed & ~coords_valid], "coordonnées invalides")
+    valid = complete & coords_valid
+    
+    # Doublons par nom (insensible à la casse, y compris avec les blocs précédents), la première occurrence est conservée
+    lower = nom.str.lower()
+    duplicated = valid & (lower.where(valid).duplicated() | lower.isin(seen))
+    _skip_rows(skipped, df.index[duplicated], DUPLICATE_INTERVENANT)
+    valid = valid & ~duplicated
+    seen.update(lower[valid].tolist())
+    valid = valid.to_numpy()
+    
+    # Roulement week-end selon les heures hebdomadaires (temps plein: roulement A/B)
+    roulement_weekend = calculate_weekend_roulement(temps_hebdo)
+    
+    # Construction des modèles en une passe à partir des colonnes nettoyées
+    intervenants = []
+    for n, la, lo, hebdo, mensuel, roulement in zip(
+        nom[valid].tolist(), lat[valid].tolist(), lon[valid].tolist(),
+        temps_hebdo[valid].tolist(), temps_mensuel[valid].tolist(), roulement_weekend[valid].tolist()
+    ):
+        # Détecter les spécialités et plages horaires spéciales
+        specialites, plage_horaire_autorisee = detect_special_intervenants(n)
+        intervenants.append(Intervenant(
+            nom_prenom=n, latitude=la, longitude=lo, heure_hebdomaire=hebdo, heure_mensuel=mensuel,
+            plage_horaire_autorisee=plage_horaire_autorisee, specialites=specialites,
+            roulement_weekend=roulement
+        ))
+    return intervenants
+
+def parse_intervenants_csv(file_content: Union[bytes, BinaryIO]) -> List[Intervenant]:
+    """Parse le fichier des intervenants (CSV, XLSX, Parquet ou Arrow; contenu ou fichier ouvert, lu par blocs)"""
     try:
-        # Lire le CSV avec détection d'encodage
-        df = try_multiple_encodings(file_content)
+        # Lire le fichier par blocs (détection du format, et de l'encodage pour un CSV)
+        chunks = read_input_chunks(file_content)
+        df = next(chunks)
         
         # Nettoyer les noms de colonnes
-        df.columns = df.columns.str.strip()
-        
-        # Supprimer les lignes complètement vides
-        df = df.dropna(how='all')
-        
-        # Vérifier les colonnes obligatoires (avec latitude/longitude)
-        required_columns = ['Nom_Prenom', 'Latitude', 'Longitude', 'Heure_Mensuel', 'Heure_hebdomadaire']
-        available_columns = df.columns.tolist()
-        
-        logger.info(f"Colonnes requises: {required_columns}")
-        logger.info(f"Colonnes disponibles: {available_columns}")
-        
-        # Mapping flexible des colonnes (insensible à la casse)
-        column_mapping = {}
-        for req_col in required_columns:
-            found = False
-            for avail_col in available_columns:
-                # Comparaison directe d'abord
-                if req_col == avail_col:
-                    column_mapping[req_col] = avail_col
-                    found = True
-                    logger.info(f"Mapping direct: {req_col} -> {avail_col}")
-                    break
-                # Comparaison insensible à la casse
-                elif req_col.lower() == avail_col.lower():
-                    column_mapping[req_col] = avail_col
-                    found = True
-                    logger.info(f"Mapping insensible à la casse: {req_col} -> {avail_col}")
-                    break
-                # Comparaison flexible (sans espaces, underscores, accents)
-                req_normalized = req_col.lower().replace('é', 'e').replace('è', 'e').replace('_', '').replace(' ', '')
-                avail_normalized = avail_col.lower().replace('é', 'e').replace('è', 'e').replace('_', '').replace(' ', '')
-                if req_normalized == avail_normalized:
-                    column_mapping[req_col] = avail_col
-                    found = True
-                    logger.info(f"Mapping flexible: {req_col} -> {avail_col}")
-                    break
-            if not found:
-                # Recherche partielle pour compatibilité
-                for avail_col in available_columns:
-                    avail_lower = avail_col.lower().replace('é', 'e').replace(' ', '').replace('_', '')
-                    req_lower = req_col.lower().replace('é', 'e').replace('_', '').replace(' ', '')
-                    
-                    # Mapping spécial pour compatibilité
-                    if 'nom' in req_lower and ('nom' in avail_lower or 'prenom' in avail_lower):
-                        column_mapping[req_col] = avail_col
-                        found = True
-                        logger.info(f"Mapping nom: {req_col} -> {avail_col}")
-                        break
-                    elif 'latitude' in req_lower and 'latitude' in avail_lower:
-                        column_mapping[req_col] = avail_col
-                        found = True
-                        logger.info(f"Mapping latitude: {req_col} -> {avail_col}")
-                        break
-                    elif 'longitude' in req_lower and 'longitude' in avail_lower:
-                        column_mapping[req_col] = avail_col
-                        found = True
-                        logger.info(f"Mapping longitude: {req_col} -> {avail_col}")
-                        break
-                    elif 'heure' in req_lower and 'heure' in avail_lower:
-                        if ('mensuel' in req_lower and 'mensuel' in avail_lower) or ('hebdomaire' in req_lower and 'hebdomaire' in avail_lower):
-                            column_mapping[req_col] = avail_col
-                            found = True
-                            logger.info(f"Mapping heure: {req_col} -> {avail_col}")
-                            break
-                    elif req_lower in avail_lower:
-                        column_mapping[req_col] = avail_col
-                        found = True
-                        logger.info(f"Mapping partiel: {req_col} -> {avail_col}")
-                        break
-            if not found:
-                logger.error(f"Colonne '{req_col}' non trouvée parmi {available_columns}")
-                raise ValueError(f"Colonne manquante dans intervenants.csv: '{req_col}'. Colonnes disponibles: {available_columns}")
-        
-        logger.info(f"Colonnes mappées: {column_mapping}")
-        
-        logger.info(f"📊 PARSING INTERVENANTS - {len(df)} lignes détectées")
-        
-        intervenants = []
-        noms_vus = set()  # Pour détecter les doublons
-        
-        for index, row in df.iterrows():
-            try:
-                if (index + 1) % 3 == 0:  # Log tous les 3 lignes
-                    logger.info(f"   🔄 Traitement ligne {index + 1}/{len(df)}")
-                    
-                # Vérifier que les colonnes critiques ne sont pas vides
-                nom = str(row[column_mapping['Nom_Prenom']]).strip()
-                latitude = row[column_mapping['Latitude']]
-                longitude = row[column_mapping['Longitude']]
-                temps_mensuel = str(row[column_mapping['Heure_Mensuel']]).strip()
-                temps_hebdo = str(row[column_mapping['Heure_hebdomadaire']]).strip()
-                
-                # Ignorer les lignes avec des valeurs manquantes critiques
-                if (pd.isna(row[column_mapping['Nom_Prenom']]) or 
-                    pd.isna(row[column_mapping['Latitude']]) or
-                    pd.isna(row[column_mapping['Longitude']]) or 
-                    pd.isna(row[column_mapping['Heure_Mensuel']]) or
-                    pd.isna(row[column_mapping['Heure_hebdomadaire']]) or
-                    nom.lower() in ['nan', ''] or 
-                    temps_mensuel.lower() in ['nan', ''] or
-                    temps_hebdo.lower() in ['nan', '']):
-                    logger.warning(f"   ⚠️ Ligne {index + 2} ignorée : données manquantes critiques")
-                    continue
-                
-                # Valider les coordonnées
-                try:
-                    # Gérer les virgules françaises comme séparateurs décimaux
-                    lat_str = str(latitude).replace(',', '.')
-                    lon_str = str(longitude).replace(',', '.')
-                    
-                    lat = float(lat_str)
-                    lon = float(lon_str)
-                    
-                    logger.debug(f"   ✅ Ligne {index + 2}: Coordonnées validées - lat={lat}, lon={lon}")
-                    
-                    # Vérifier que les coordonnées sont valides
-                    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                        logger.warning(f"   ❌ Ligne {index + 2} ignorée : coordonnées invalides ({lat}, {lon})")
-                        continue
-                        
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"   ❌ Ligne {index + 2} ignorée : coordonnées non numériques - latitude='{latitude}', longitude='{longitude}', error={str(e)}")
-                    continue
-                
-                # Vérifier les doublons par nom (insensible à la casse)
-                nom_lower = nom.lower()
-                if nom_lower in noms_vus:
-                    logger.warning(f"   🔄 Ligne {index + 2} ignorée : intervenant '{nom}' déjà présent (doublon détecté)")
-                    continue
-                
-                # Détecter les spécialités et plages horaires spéciales
-                specialites, plage_horaire_autorisee = detect_special_intervenants(nom)
-                
-                # Calculer le roulement week-end selon les heures
-                roulement_weekend = calculate_weekend_roulement(temps_hebdo)
-                
-                intervenant = Intervenant(
-                    nom_prenom=nom,
-                    latitude=lat,
-                    longitude=lon,
-                    heure_hebdomaire=temps_hebdo,
-                    heure_mensuel=temps_mensuel,
-                    plage_horaire_autorisee=plage_horaire_autorisee,
-                    specialites=specialites,
-                    roulement_weekend=roulement_weekend
-                )
-                intervenants.append(intervenant)
-                noms_vus.add(nom_lower)
-                
-                logger.debug(f"Intervenant créé: {intervenant.nom_prenom} à ({lat:.4f},{lon:.4f})")
-                
-            except Exception as e:
-                logger.warning(f"Erreur ligne {index + 2}: {str(e)} - Ligne ignorée")
-                continue
+        columns = df.columns.str.strip()
+        
+        # Résoudre le schéma une fois pour tout le fichier
+        plan = INTERVENANTS_SCHEMA.resolve(columns)
+        
+        intervenants: List[Intervenant] = []
+        skipped: Dict[str, List[int]] = {}
+        seen: Set[str] = set()
+        total_rows = 0
+        for df in itertools.chain([df], chunks):
+            df.columns = columns
+            # Supprimer les lignes complètement vides
+            df = df.dropna(how='all')
+            total_rows += len(df)
+            intervenants.extend(_build_intervenants(df, plan, seen, skipped))
+        
+        logger.info(f"📊 PARSING INTERVENANTS - {total_rows} lignes détectées")
+        for raison, rows in skipped.items():
+            _log_skipped_rows(rows, raison)
         
         if not intervenants:
             raise ValueError("Aucun intervenant valide trouvé dans le fichier")
         
         logger.info(f"✅ PARSING INTERVENANTS TERMINÉ")
-        logger.info(f"   • Lignes traitées: {len(df)}")
+        logger.info(f"   • Lignes traitées: {total_rows}")
         logger.info(f"   • Intervenants valides: {len(intervenants)}")
-        logger.info(f"   • Doublons détectés: {len(df) - len(intervenants) - (len(df) - sum(1 for _, row in df.iterrows() if not pd.isna(row[column_mapping['Nom_Prenom']])))} ")
-        logger.info(f"   • Taux de succès: {len(intervenants)/len(df)*100:.1f}%")
+        logger.info(f"   • Doublons détectés: {len(skipped.get(DUPLICATE_INTERVENANT, []))}")
+        logger.info(f"   • Taux de succès: {len(intervenants)/total_rows*100:.1f}%")
         return intervenants
         
     except Exception as e:
@@ -572,14 +479,10 @@ def validate_csv_data(interventions: List[Intervention], intervenants: List[Inte
             if intervention.intervenant and intervention.intervenant not in intervenant_names:
                 logger.warning(f"Intervenant '{intervention.intervenant}' non trouvé dans la liste des intervenants")
         
-        # Vérifier les formats de date
+        # Vérifier les formats de date "29/06/2025 08:00" (déjà convertis en minutes à l'import)
         for intervention in interventions:
-            try:
-                # Vérifier le format de date "29/06/2025 08:00"
-                if not intervention.date or len(intervention.date.split()) != 2:
-                    return False, f"Format de date invalide pour {intervention.client}: {intervention.date}"
-            except:
-                return False, f"Erreur dans la date pour {intervention.client}"
+            if intervention.start_minutes is None:
+                return False, f"Format de date invalide pour {intervention.client}: {intervention.date}"
         
         logger.info("Validation CSV réussie")
         return True, "Données CSV valides"
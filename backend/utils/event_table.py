@@ -0,0 +1,210 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from models import PlanningEvent
+from utils.time_utils import iso_to_minutes, minutes_to_iso
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+UNASSIGNED = "Non assigné"
+
+class StringTable:
+    """Colonne de chaînes codée: un code entier par ligne, chaque valeur distincte stockée une seule fois"""
+    __slots__ = ('codes', 'values', '_index')
+
+    def __init__(self, values: Iterable[Optional[str]]):
+        self.values: List[Optional[str]] = []
+        self._index: Dict[Optional[str], int] = {}
+        self.codes = np.fromiter((self.intern(value) for value in values), dtype=np.int64)
+
+    @classmethod
+    def from_codes(cls, values: List[Optional[str]], codes: np.ndarray) -> 'StringTable':
+        """Colonne reconstruite depuis ses valeurs distinctes et ses codes (forme sérialisée)"""
+        table = cls.__new__(cls)
+        table.values = list(values)
+        table._index = {value: code for code, value in enumerate(table.values)}
+        table.codes = np.asarray(codes, dtype=np.int64)
+        return table
+
+    def compact(self) -> 'StringTable':
+        """Copie sans les valeurs qui ne sont plus référencées par aucune ligne"""
+        used, codes = np.unique(self.codes, return_inverse=True)
+        return StringTable.from_codes([self.values[code] for code in used.tolist()], codes)
+
+    def intern(self, value: Optional[str]) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+
+    def __setitem__(self, row: int, value: Optional[str]) -> None:
+        self.codes[row] = self.intern(value)
+
+    def tolist(self, rows: Optional[np.ndarray] = None) -> List[Optional[str]]:
+        values = self.values
+        codes = self.codes if rows is None else self.codes[rows]
+        return [values[code] for code in codes.tolist()]
+
+    def code_of(self, value: Optional[str]) -> int:
+        """Code d'une valeur (-1 si elle n'apparaît pas dans la colonne)"""
+        return self._index.get(value, -1)
+
+    def take(self, rows: np.ndarray) -> 'StringTable':
+        subset = StringTable.__new__(StringTable)
+        subset.values, subset._index = list(self.values), dict(self._index)
+        subset.codes = self.codes[rows]
+        return subset
+
+class EventTable:
+    """Planning interne en tableaux parallèles (une ligne par événement)
+
+    Horaires en minutes depuis l'epoch, intervenants, clients, couleurs, binômes et raisons codés par
+    des tables de chaînes: la validation et les statistiques travaillent sur des tableaux NumPy, les
+    objets PlanningEvent ne sont reconstruits qu'à la sortie (to_events).
+    """
+    __slots__ = ('ids', 'clients', 'intervenants', 'start_labels', 'end_labels', 'starts', 'ends', 'valid',
+                 'latitudes', 'longitudes', 'locations', 'non_planifiable', 'colors', 'trajets', 'raisons',
+                 'binomes')
+
+    def __init__(self, ids: List[str], clients: StringTable, intervenants: StringTable, start_labels: StringTable,
+                 end_labels: StringTable, starts: np.ndarray, ends: np.ndarray, valid: np.ndarray,
+                 latitudes: np.ndarray, longitudes: np.ndarray, locations: np.ndarray, non_planifiable: np.ndarray,
+                 colors: StringTable, trajets: StringTable, raisons: StringTable, binomes: StringTable):
+        self.ids = ids
+        self.clients = clients
+        self.intervenants = intervenants
+        self.start_labels = start_labels  # Horaires ISO d'origine, restitués tels quels s'ils ne changent pas
+        self.end_labels = end_labels
+        self.starts = starts
+        self.ends = ends
+        self.valid = valid  # Horaires lisibles
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.locations = locations  # Index dans la matrice de trajets (-1 si inconnu ou non localisé)
+        self.non_planifiable = non_planifiable
+        self.colors = colors
+        self.trajets = trajets
+        self.raisons = raisons
+        self.binomes = binomes
+
+    @classmethod
+    def from_events(cls, events: Sequence[PlanningEvent]) -> 'EventTable':
+        """Convertit une liste de PlanningEvent (une seule lecture de chaque champ)"""
+        count = len(events)
+        start_labels = StringTable(event.start for event in events)
+        end_labels = StringTable(event.end for event in events)
+        starts, start_ok = cls._label_minutes(start_labels)
+        ends, end_ok = cls._label_minutes(end_labels)
+        return cls(
+            ids=[event.id for event in events],
+            clients=StringTable(event.client for event in events),
+            intervenants=StringTable(event.intervenant for event in events),
+            start_labels=start_labels,
+            end_labels=end_labels,
+            starts=starts,
+            ends=ends,
+            valid=start_ok & end_ok,
+            latitudes=np.fromiter((event.latitude for event in events), dtype=np.float64, count=count),
+            longitudes=np.fromiter((event.longitude for event in events), dtype=np.float64, count=count),
+            locations=np.full(count, -1, dtype=np.int64),
+            non_planifiable=np.fromiter((event.non_planifiable for event in events), dtype=bool, count=count),
+            colors=StringTable(event.color for event in events),
+            trajets=StringTable(event.trajet_precedent for event in events),
+            raisons=StringTable(event.raison for event in events),
+            binomes=StringTable(event.binome_id for event in events),
+        )
+
+    @classmethod
+    def of(cls, events: Union['EventTable', Sequence[PlanningEvent]]) -> 'EventTable':
+        return events if isinstance(events, EventTable) else cls.from_events(events)
+
+    @staticmethod
+    def _label_minutes(labels: StringTable):
+        # Chaque horaire distinct n'est converti qu'une fois
+        minutes = np.zeros(len(labels.values), dtype=np.int64)
+        ok = np.zeros(len(labels.values), dtype=bool)
+        for code, value in enumerate(labels.values):
+            try:
+                minutes[code] = iso_to_minutes(value)
+                ok[code] = True
+            except (ValueError, TypeError, AttributeError):
+                logger.error(f"Horaire illisible: {value}")
+        return minutes[labels.codes], ok[labels.codes]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def assigned(self) -> np.ndarray:
+        """Événements attribués à un intervenant nommé"""
+        unassigned = [code for code, name in enumerate(self.intervenants.values) if not name or name == UNASSIGNED]
+        return ~np.isin(self.intervenants.codes, unassigned)
+
+    @property
+    def planned(self) -> np.ndarray:
+        """Événements planifiés, attribués et aux horaires lisibles"""
+        return ~self.non_planifiable & self.assigned & self.valid
+
+    def coordinates(self, rows: Optional[np.ndarray] = None) -> List[tuple]:
+        rows = np.arange(len(self)) if rows is None else rows
+        return list(zip(self.latitudes[rows].tolist(), self.longitudes[rows].tolist()))
+
+    def locate(self, matrix: TravelMatrix) -> None:
+        """Renseigne l'index de chaque événement dans la matrice de trajets"""
+        self.locations = np.array([matrix.index_of(lat, lon) for lat, lon in self.coordinates()], dtype=np.int64)
+
+    def set_times(self, row: int, start: int, end: int) -> None:
+        self.starts[row], self.ends[row] = start, end
+        self.start_labels[row] = minutes_to_iso(start)
+        self.end_labels[row] = minutes_to_iso(end)
+        self.valid[row] = True
+
+    def flag(self, row: int, raison: str, color: str) -> None:
+        """Marque un événement non planifiable"""
+        self.non_planifiable[row] = True
+        self.colors[row] = color
+        self.raisons[row] = raison
+
+    def take(self, rows: np.ndarray) -> 'EventTable':
+        """Sous-planning restreint aux lignes données (dans cet ordre)"""
+        return EventTable(
+            ids=[self.ids[row] for row in rows.tolist()],
+            clients=self.clients.take(rows),
+            intervenants=self.intervenants.take(rows),
+            start_labels=self.start_labels.take(rows),
+            end_labels=self.end_labels.take(rows),
+            starts=self.starts[rows],
+            ends=self.ends[rows],
+            valid=self.valid[rows],
+            latitudes=self.latitudes[rows],
+            longitudes=self.longitudes[rows],
+            locations=self.locations[rows],
+            non_planifiable=self.non_planifiable[rows],
+            colors=self.colors.take(rows),
+            trajets=self.trajets.take(rows),
+            raisons=self.raisons.take(rows),
+            binomes=self.binomes.take(rows),
+        )
+
+    def to_events(self, rows: Optional[np.ndarray] = None) -> List[PlanningEvent]:
+        """Reconstruit les PlanningEvent (sortie HTTP), de tout le planning ou des lignes données"""
+        rows = np.arange(len(self)) if rows is None else rows
+        columns = zip([self.ids[row] for row in rows.tolist()], self.clients.tolist(rows),
+                      self.intervenants.tolist(rows), self.start_labels.tolist(rows), self.end_labels.tolist(rows),
+                      self.colors.tolist(rows), self.non_planifiable[rows].tolist(), self.trajets.tolist(rows),
+                      self.latitudes[rows].tolist(), self.longitudes[rows].tolist(), self.raisons.tolist(rows),
+                      self.binomes.tolist(rows))
+        return [
+            PlanningEvent(id=event_id, client=client, intervenant=intervenant, start=start, end=end, color=color,
+                          non_planifiable=non_planifiable, trajet_precedent=trajet, latitude=latitude,
+                          longitude=longitude, raison=raison, binome_id=binome_id)
+            for event_id, client, intervenant, start, end, color, non_planifiable, trajet, latitude, longitude,
+                raison, binome_id in columns
+        ]
@@ -1,65 +1,219 @@
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+import asyncio
 import csv
+import hashlib
 import io
 import json
-from typing import List
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
 from models import PlanningEvent, PlanningStats
 import logging
 from datetime import datetime
+from utils.event_table import EventTable
+from utils.time_utils import minutes_to_datetime, parse_trajet_minutes, MINUTES_PER_DAY
 
 logger = logging.getLogger(__name__)
 
+CSV_CHUNK_ROWS = 1000  # Lignes écrites par bloc envoyé au client
+CSV_HEADERS = [
+    'Date', 'Heure_debut', 'Heure_fin', 'Client',
+    'Intervenant', 'Adresse', 'Duree', 'Trajet_precedent',
+    'Non_planifiable', 'Raison', 'Couleur'
+]
+
+# Feuilles de route: (intervenant, visites triées), visite = (début, fin, client, trajet en minutes, latitude, longitude)
+RouteVisit = Tuple[int, int, str, int, float, float]
+RouteSheet = Tuple[str, Tuple[RouteVisit, ...]]
+
+ROUTE_SHEET_VERSION = 1  # À incrémenter si la mise en page change (invalide le cache)
+ROUTE_SHEET_CACHE_SIZE = 512  # Feuilles PDF gardées en mémoire
+JOURS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+def _pdf_text(value) -> str:
+    # Polices standard PDF: Latin-1 uniquement (les autres caractères deviennent "?")
+    return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+def _format_duration(minutes: int) -> str:
+    return f"{minutes // 60}h{minutes % 60:02d}" if minutes >= 60 else f"{minutes}min"
+
+ROUTE_SHEET_COLUMNS = (("Début", 20), ("Fin", 20), ("Durée", 20), ("Client", 70), ("Trajet", 20), ("Coordonnées", 40))
+ROUTE_SHEET_LINE_HEIGHT = 5
+ROUTE_SHEET_CLIENT_COLUMN = 3
+
+def _route_sheet_headings(pdf: FPDF) -> None:
+    pdf.set_font('Helvetica', 'B', 9)
+    for label, width in ROUTE_SHEET_COLUMNS:
+        pdf.cell(width, 6, _pdf_text(label), border=1, align='C')
+    pdf.ln()
+    pdf.set_font('Helvetica', '', 9)
+
+def _route_sheet_row(pdf: FPDF, values: List[str]) -> None:
+    """Ligne du tableau; seul le nom du client est renvoyé à la ligne s'il dépasse sa colonne"""
+    client_width = ROUTE_SHEET_COLUMNS[ROUTE_SHEET_CLIENT_COLUMN][1]
+    client = values[ROUTE_SHEET_CLIENT_COLUMN]
+    lines = [client]
+    if pdf.get_string_width(client) > client_width - 2:
+        lines = pdf.multi_cell(client_width, ROUTE_SHEET_LINE_HEIGHT, client, dry_run=True, output="LINES")
+    height = ROUTE_SHEET_LINE_HEIGHT * len(lines)
+
+    if pdf.get_y() + height > pdf.page_break_trigger:
+        pdf.add_page()
+        _route_sheet_headings(pdf)
+
+    x, y = pdf.get_x(), pdf.get_y()
+    for k, ((_, width), value) in enumerate(zip(ROUTE_SHEET_COLUMNS, values)):
+        if k == ROUTE_SHEET_CLIENT_COLUMN and len(lines) > 1:
+            pdf.rect(pdf.get_x(), y, width, height)
+            pdf.multi_cell(width, ROUTE_SHEET_LINE_HEIGHT, value, align='L')
+            pdf.set_xy(x + width, y)
+        else:
+            pdf.cell(width, height, value, border=1, align='L')
+        x += width
+    pdf.ln(height)
+
+def render_route_sheet(sheet: RouteSheet) -> bytes:
+    """Rend la feuille de route PDF d'un intervenant, une section par jour (exécuté dans un processus du pool)"""
+    name, visits = sheet
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    pdf.add_page()
+
+    first, last = minutes_to_datetime(visits[0][0]), minutes_to_datetime(visits[-1][0])
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, _pdf_text(f"Feuille de route - {name}"), align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font('Helvetica', '', 9)
+    pdf.cell(0, 6, _pdf_text(f"Du {first:%d/%m/%Y} au {last:%d/%m/%Y} - {len(visits)} visite(s)"),
+             align='C', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    days: Dict[int, List[RouteVisit]] = {}
+    for visit in visits:
+        days.setdefault(visit[0] // MINUTES_PER_DAY, []).append(visit)
+
+    for day_visits in days.values():
+        day = minutes_to_datetime(day_visits[0][0])
+        work = sum(end - start for start, end, *_ in day_visits)
+        travel = sum(visit[3] for visit in day_visits)
+        # Titre du jour et en-têtes gardés sur la même page que la première visite
+        if pdf.get_y() + 20 > pdf.page_break_trigger:
+            pdf.add_page()
+        pdf.ln(4)
+        pdf.set_font('Helvetica', 'B', 11)
+        pdf.cell(0, 8, _pdf_text(f"{JOURS[day.weekday()]} {day:%d/%m/%Y} - {len(day_visits)} visite(s), "
+                                 f"travail {_format_duration(work)}, trajets {_format_duration(travel)}"),
+                 new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        _route_sheet_headings(pdf)
+        for start, end, client, trajet, latitude, longitude in day_visits:
+            _route_sheet_row(pdf, [
+                f"{minutes_to_datetime(start):%H:%M}",
+                f"{minutes_to_datetime(end):%H:%M}",
+                _format_duration(end - start),
+                _pdf_text(client),
+                f"{trajet} min",
+                f"{latitude:.5f}, {longitude:.5f}",
+            ])
+
+    return bytes(pdf.output())
+
+class _ZipSink:
+    """Flux d'écriture non positionnable: zipfile y écrit, les octets sont envoyés au fur et à mesure"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.offset = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
 class ExportService:
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._sheet_cache: "OrderedDict[str, bytes]" = OrderedDict()
     
+    def iter_csv(self, planning_events: Union[EventTable, List[PlanningEvent]],
+                 chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+        """Génère le CSV du planning par blocs encodés en UTF-8 (mémoire constante, une ligne par événement)"""
+        try:
+            table = EventTable.of(planning_events)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_HEADERS)
+
+            for offset in range(0, len(table), chunk_rows):
+                rows = np.arange(offset, min(offset + chunk_rows, len(table)))
+                writer.writerows(self._csv_rows(table, rows))
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+            if buffer.tell():
+                yield buffer.getvalue().encode('utf-8')
+            logger.info(f"CSV généré avec {len(table)} lignes")
+        except Exception as e:
+            # Réponse déjà commencée: l'erreur ne peut plus devenir un code HTTP, seulement être journalisée
+            logger.error(f"Erreur export CSV en cours d'envoi: {str(e)}")
+            raise
+
+    def _csv_rows(self, table: EventTable, rows: np.ndarray) -> Iterator[List[str]]:
+        """Lignes CSV d'un bloc d'événements, dates et heures formatées en une passe vectorisée"""
+        starts = np.datetime_as_string((table.starts[rows] * 60).astype('datetime64[s]'), unit='m').tolist()
+        ends = np.datetime_as_string((table.ends[rows] * 60).astype('datetime64[s]'), unit='m').tolist()
+        durations = (table.ends[rows] - table.starts[rows]).tolist()
+        locations = [f"{lat:.6f}, {lon:.6f}" for lat, lon in table.coordinates(rows)]
+        columns = zip(starts, ends, durations, table.valid[rows].tolist(), table.clients.tolist(rows),
+                      table.intervenants.tolist(rows), locations, table.trajets.tolist(rows),
+                      table.non_planifiable[rows].tolist(), table.raisons.tolist(rows), table.colors.tolist(rows),
+                      table.start_labels.tolist(rows), table.end_labels.tolist(rows))
+
+        for start, end, duration, valid, client, intervenant, location, trajet, non_planifiable, raison, color, \
+                start_label, end_label in columns:
+            if valid:
+                date, heure_debut, heure_fin = start[:10], start[11:16], end[11:16]
+                duration_str = f"{duration // 60}h{duration % 60:02d}" if duration >= 60 else f"{duration}min"
+            else:
+                # Horaires illisibles: l'événement est exporté avec ses valeurs brutes
+                logger.warning(f"Horaires illisibles exportés tels quels pour {client}")
+                date, heure_debut, heure_fin, duration_str = '', start_label, end_label, ''
+
+            yield [
+                date,
+                heure_debut,
+                heure_fin,
+                client,
+                intervenant,
+                location,
+                duration_str,
+                trajet or '0 min',
+                'Oui' if non_planifiable else 'Non',
+                raison or '',
+                color
+            ]
+
     def generate_csv(self, planning_events: List[PlanningEvent]) -> str:
         """Génère un CSV du planning"""
         try:
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # En-têtes
-            headers = [
-                'Date', 'Heure_debut', 'Heure_fin', 'Client', 
-                'Intervenant', 'Adresse', 'Duree', 'Trajet_precedent',
-                'Non_planifiable', 'Raison', 'Couleur'
-            ]
-            writer.writerow(headers)
-            
-            # Données
-            for event in planning_events:
-                try:
-                    # Extraire date et heures
-                    start_dt = datetime.fromisoformat(event.start.replace('Z', '+00:00'))
-                    end_dt = datetime.fromisoformat(event.end.replace('Z', '+00:00'))
-                    
-                    # Calculer la durée
-                    duration_minutes = int((end_dt - start_dt).total_seconds() / 60)
-                    duration_str = f"{duration_minutes // 60}h{duration_minutes % 60:02d}" if duration_minutes >= 60 else f"{duration_minutes}min"
-                    
-                    row = [
-                        start_dt.strftime('%Y-%m-%d'),
-                        start_dt.strftime('%H:%M'),
-                        end_dt.strftime('%H:%M'),
-                        event.client,
-                        event.intervenant,
-                        event.adresse,
-                        duration_str,
-                        event.trajet_precedent or '0 min',
-                        'Oui' if event.non_planifiable else 'Non',
-                        event.raison or '',
-                        event.color
-                    ]
-                    writer.writerow(row)
-                except Exception as e:
-                    logger.error(f"Erreur traitement événement CSV: {str(e)}")
-                    continue
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            logger.info(f"CSV généré avec {len(planning_events)} lignes")
-            return csv_content
-            
+            return b''.join(self.iter_csv(planning_events)).decode('utf-8')
         except Exception as e:
             logger.error(f"Erreur génération CSV: {str(e)}")
             raise ValueError(f"Erreur génération CSV: {str(e)}")
@@ -111,13 +265,13 @@ class ExportService:
             pdf.set_font('Arial', '', 7)
             for event in planning_events:
                 try:
-                    start_dt = datetime.fromisoformat(event.start.replace('Z', '+00:00'))
-                    end_dt = datetime.fromisoformat(event.end.replace('Z', '+00:00'))
+                    start_dt = minutes_to_datetime(event.start_minutes)
+                    end_dt = minutes_to_datetime(event.end_minutes)
                     
                     # Limiter la longueur du texte
                     client = event.client[:15] + '...' if len(event.client) > 15 else event.client
                     intervenant = event.intervenant[:15] + '...' if len(event.intervenant) > 15 else event.intervenant
-                    adresse = event.adresse[:30] + '...' if len(event.adresse) > 30 else event.adresse
+                    adresse = f"{event.latitude:.5f}, {event.longitude:.5f}"  # Pas d'adresse postale sur l'événement
                     statut = 'NON PLAN.' if event.non_planifiable else 'OK'
                     
                     row_data = [
@@ -156,5 +310,95 @@ class ExportService:
             logger.error(f"Erreur génération PDF: {str(e)}")
             raise ValueError(f"Erreur génération PDF: {str(e)}")
 
+    def build_route_sheets(self, planning_events: Union[EventTable, List[PlanningEvent]]) -> List[RouteSheet]:
+        """Visites planifiées de chaque intervenant, triées par début (intervenants par ordre alphabétique)"""
+        table = EventTable.of(planning_events)
+        rows = np.flatnonzero(table.planned)
+        if not len(rows):
+            return []
+        rows = rows[np.lexsort((table.starts[rows], table.intervenants.codes[rows]))]
+        trajets = np.array([parse_trajet_minutes(label) for label in table.trajets.values], dtype=np.int64)
+
+        sheets = []
+        for block in np.split(rows, np.flatnonzero(np.diff(table.intervenants.codes[rows])) + 1):
+            visits = tuple(zip(table.starts[block].tolist(), table.ends[block].tolist(), table.clients.tolist(block),
+                               trajets[table.trajets.codes[block]].tolist(), table.latitudes[block].tolist(),
+                               table.longitudes[block].tolist()))
+            sheets.append((table.intervenants[block[0]], visits))
+        sheets.sort(key=lambda sheet: sheet[0])
+        return sheets
+
+    async def render_route_sheets(self, planning_events: Union[EventTable, List[PlanningEvent]]) -> List[Tuple[str, bytes]]:
+        """Feuilles de route PDF (nom de fichier, contenu), rendues en parallèle hors de la boucle d'événements"""
+        sheets, keys = await asyncio.to_thread(self._keyed_route_sheets, planning_events)
+        loop = asyncio.get_running_loop()
+
+        contents: Dict[str, bytes] = {}
+        pending: Dict[str, RouteSheet] = {}
+        for key, sheet in zip(keys, sheets):
+            cached = self._sheet_cache.get(key)
+            if cached is not None:
+                self._sheet_cache.move_to_end(key)
+                contents[key] = cached
+            else:
+                pending[key] = sheet
+
+        if pending:
+            pool = self._get_pool()
+            rendered = await asyncio.gather(*(loop.run_in_executor(pool, render_route_sheet, sheet)
+                                              for sheet in pending.values()))
+            for key, content in zip(pending, rendered):
+                contents[key] = content
+                self._sheet_cache[key] = content
+            while len(self._sheet_cache) > ROUTE_SHEET_CACHE_SIZE:
+                self._sheet_cache.popitem(last=False)
+
+        logger.info(f"Feuilles de route: {len(sheets)} intervenant(s), {len(pending)} rendue(s), "
+                    f"{len(sheets) - len(pending)} depuis le cache")
+        files, used = [], set()
+        for key, sheet in zip(keys, sheets):
+            files.append((self._sheet_filename(sheet[0], used), contents[key]))
+        return files
+
+    def iter_zip(self, files: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+        """Archive ZIP produite fichier par fichier (PDF déjà compressés: stockés sans recompression)"""
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for filename, content in files:
+                archive.writestr(filename, content)
+                yield sink.drain()
+        yield sink.drain()
+
+    def shutdown(self) -> None:
+        """Arrête les processus de rendu PDF"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Processus démarrés à la demande et réutilisés; "spawn" évite de dupliquer les threads du serveur
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _keyed_route_sheets(self, planning_events: Union[EventTable, List[PlanningEvent]]) -> Tuple[List[RouteSheet], List[str]]:
+        sheets = self.build_route_sheets(planning_events)
+        return sheets, [self._sheet_key(sheet) for sheet in sheets]
+
+    def _sheet_key(self, sheet: RouteSheet) -> str:
+        return hashlib.blake2b(repr((ROUTE_SHEET_VERSION, sheet)).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _sheet_filename(self, name: str, used: set) -> str:
+        base = re.sub(r'[^\w\-]+', '_', name, flags=re.UNICODE).strip('_') or 'intervenant'
+        filename, occurrence = f"feuille_de_route_{base}.pdf", 1
+        while filename in used:
+            occurrence += 1
+            filename = f"feuille_de_route_{base}_{occurrence}.pdf"
+        used.add(filename)
+        return filename
+
 # Instance globale du service d'export
 export_service = ExportService()
\ No newline at end of file
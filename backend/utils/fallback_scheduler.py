@@ -0,0 +1,140 @@
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import Intervention, Intervenant, INTERVENANT_COLORS, NON_PLANIFIABLE_COLOR
+from utils.time_utils import minutes_to_iso, day_of, MINUTES_PER_DAY, START_TOLERANCE_MINUTES, MAX_DAILY_MINUTES
+from utils.travel_matrix import TravelMatrix
+from utils.feasibility_graph import feasibility_graph_builder
+
+logger = logging.getLogger(__name__)
+
+class FallbackScheduler:
+    """Planificateur déterministe de repli: plus proche intervenant disponible, par ordre chronologique"""
+
+    def schedule(self, interventions: List[Intervention], intervenants: List[Intervenant],
+                 travel_times: Optional[Dict[str, Dict[str, int]]] = None) -> List[dict]:
+        """Affecte chaque intervention au plus proche intervenant libre et retourne les événements au format IA"""
+        start_time = time.time()
+
+        # Ordre déterministe des intervenants
+        staff = sorted(intervenants, key=lambda i: i.nom_prenom)
+        names = [i.nom_prenom for i in staff]
+        colors = {name: INTERVENANT_COLORS[k % len(INTERVENANT_COLORS)] for k, name in enumerate(names)}
+
+        visits = []
+        for intervention in interventions:
+            if intervention.end_minutes is None:
+                logger.error(f"Erreur lecture horaire fallback pour {intervention.client}: "
+                             f"date '{intervention.date}', durée '{intervention.duree}'")
+                continue
+            visits.append((intervention.start_minutes, intervention.client, intervention.duree_minutes, intervention))
+        visits.sort(key=lambda v: (v[0], v[1]))
+
+        coordinates = [(i.latitude, i.longitude) for i in staff] + [(v[3].latitude, v[3].longitude) for v in visits]
+        matrix = TravelMatrix(coordinates, travel_times=travel_times)
+
+        # Plages horaires, intervenants imposés et départs du domicile précalculés une fois
+        graph = feasibility_graph_builder.build([v[3] for v in visits], staff, travel_matrix=matrix)
+
+        # Chronologie de disponibilité par intervenant (réinitialisée chaque jour)
+        count = len(staff)
+        home_loc = np.array([matrix.index_of(i.latitude, i.longitude) for i in staff], dtype=np.int64)
+
+        # Réservations: créneaux des visites à intervenant imposé, par jour (k, intervenant, début, fin, lieu)
+        position_of = {name: j for j, name in enumerate(names)}
+        reserved: Dict[int, List[Tuple[int, int, int, int, int]]] = {}
+        for k, (start, _, duration, intervention) in enumerate(visits):
+            j = position_of.get(intervention.intervenant) if intervention.intervenant else None
+            if j is not None:
+                reserved.setdefault(day_of(start), []).append(
+                    (k, j, start, start + duration, matrix.index_of(intervention.latitude, intervention.longitude)))
+
+        free_at = np.zeros(count, dtype=np.int64)
+        current_loc = home_loc.copy()
+        worked = np.zeros(count, dtype=np.int64)
+        first_of_day = np.ones(count, dtype=bool)
+        current_day = None
+
+        planning = []
+        for k, (start, client, duration, intervention) in enumerate(visits):
+            day = day_of(start)
+            if day != current_day:
+                current_day = day
+                free_at[:] = day * MINUTES_PER_DAY
+                current_loc[:] = home_loc
+                worked[:] = 0
+                first_of_day[:] = True
+
+            visit_loc = matrix.index_of(intervention.latitude, intervention.longitude)
+            travel = matrix.minutes[current_loc, visit_loc].astype(np.int64)
+            # Le premier trajet de la journée part du domicile et n'impose pas d'attente
+            earliest = np.where(first_of_day, start, np.maximum(start, free_at + travel))
+            # Graphe: plage horaire et intervenant imposé (priorité 10/10), domicile pour la 1ère visite
+            eligible = np.where(first_of_day, graph.first_visit_mask(k), graph.eligible_mask(k))
+            feasible = (
+                eligible
+                & (earliest <= start + START_TOLERANCE_MINUTES)
+                & (worked + duration <= MAX_DAILY_MINUTES)
+            )
+            if not intervention.intervenant:
+                # Une visite libre ne prend pas le créneau réservé d'une visite imposée encore à placer
+                for other, j, reserved_start, reserved_end, reserved_loc in reserved.get(day, ()):
+                    if other > k and feasible[j] and earliest[j] < reserved_end \
+                            and earliest[j] + duration + matrix.minutes[visit_loc, reserved_loc] > reserved_start:
+                        feasible[j] = False
+
+            raison = None
+            if not feasible.any():
+                if intervention.intervenant:
+                    raison = f"Intervenant imposé {intervention.intervenant} indisponible (conflit horaire)"
+                else:
+                    raison = "Aucun intervenant disponible sans conflit horaire"
+
+            if raison is not None:
+                planning.append({
+                    "client": client,
+                    "intervenant": intervention.intervenant or "Non assigné",
+                    "start": minutes_to_iso(start),
+                    "end": minutes_to_iso(start + duration),
+                    "color": NON_PLANIFIABLE_COLOR,
+                    "non_planifiable": True,
+                    "trajet_precedent": "0 min",
+                    "latitude": intervention.latitude,
+                    "longitude": intervention.longitude,
+                    "raison": raison
+                })
+                continue
+
+            # Plus proche intervenant faisable (à égalité, ordre alphabétique)
+            chosen = int(np.argmin(np.where(feasible, travel, np.iinfo(np.int64).max)))
+            actual_start = int(earliest[chosen])
+            trajet = 0 if first_of_day[chosen] else int(travel[chosen])
+
+            free_at[chosen] = actual_start + duration
+            current_loc[chosen] = visit_loc
+            worked[chosen] += duration
+            first_of_day[chosen] = False
+
+            planning.append({
+                "client": client,
+                "intervenant": names[chosen],
+                "start": minutes_to_iso(actual_start),
+                "end": minutes_to_iso(actual_start + duration),
+                "color": colors[names[chosen]],
+                "non_planifiable": False,
+                "trajet_precedent": f"{trajet} min",
+                "latitude": intervention.latitude,
+                "longitude": intervention.longitude
+            })
+
+        duration_ms = (time.time() - start_time) * 1000
+        non_planifiables = sum(1 for event in planning if event["non_planifiable"])
+        logger.info(f"🛟 Planning de repli: {len(planning) - non_planifiables} planifiées, "
+                    f"{non_planifiables} non planifiables en {duration_ms:.1f}ms")
+        return planning
+
+# Instance globale du planificateur de repli
+fallback_scheduler = FallbackScheduler()
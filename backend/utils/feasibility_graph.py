@@ -0,0 +1,174 @@
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import Intervention, Intervenant
+from utils.time_utils import parse_plage_horaire, MINUTES_PER_DAY, START_TOLERANCE_MINUTES
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+class DayFeasibility:
+    """Graphe de faisabilité d'une journée: successeurs possibles de chaque visite et éligibilité des intervenants"""
+
+    def __init__(self, day: int, visits: np.ndarray, successors: np.ndarray, eligible: np.ndarray,
+                 first_visit: np.ndarray):
+        self.day = day
+        self.visits = visits  # Index des interventions de la journée (ordre chronologique)
+        self.successors = successors  # (n, n): la visite j peut suivre la visite i
+        self.eligible = eligible  # (m, n): l'intervenant peut réaliser la visite (plage horaire, imposé)
+        self.first_visit = first_visit  # (m, n): éligible et joignable depuis le domicile en début de plage
+
+    @property
+    def edges(self) -> int:
+        return int(self.successors.sum())
+
+class FeasibilityGraph:
+    """Graphes de faisabilité par jour, interrogeables par index d'intervention"""
+
+    def __init__(self, intervenant_names: List[str], days: Dict[int, DayFeasibility], positions: np.ndarray,
+                 visit_days: np.ndarray):
+        self.intervenant_names = intervenant_names
+        self.intervenant_index = {name: k for k, name in enumerate(intervenant_names)}
+        self.days = days
+        self.positions = positions  # Position de chaque intervention dans le graphe de sa journée (-1 si illisible)
+        self.visit_days = visit_days
+
+    def can_follow(self, i: int, j: int) -> bool:
+        """La visite j peut-elle suivre la visite i chez le même intervenant ?"""
+        if self.positions[i] < 0 or self.positions[j] < 0 or self.visit_days[i] != self.visit_days[j]:
+            return False
+        return bool(self.days[int(self.visit_days[i])].successors[self.positions[i], self.positions[j]])
+
+    def successors(self, i: int) -> np.ndarray:
+        """Index des interventions pouvant suivre la visite i"""
+        if self.positions[i] < 0:
+            return np.empty(0, dtype=np.int64)
+        day = self.days[int(self.visit_days[i])]
+        return day.visits[np.flatnonzero(day.successors[self.positions[i]])]
+
+    def eligible_mask(self, i: int) -> np.ndarray:
+        """Masque (par intervenant) des intervenants pouvant réaliser la visite i"""
+        if self.positions[i] < 0:
+            return np.zeros(len(self.intervenant_names), dtype=bool)
+        return self.days[int(self.visit_days[i])].eligible[:, self.positions[i]]
+
+    def first_visit_mask(self, i: int) -> np.ndarray:
+        """Masque des intervenants pouvant commencer leur journée par la visite i"""
+        if self.positions[i] < 0:
+            return np.zeros(len(self.intervenant_names), dtype=bool)
+        return self.days[int(self.visit_days[i])].first_visit[:, self.positions[i]]
+
+    def eligible_intervenants(self, i: int) -> List[str]:
+        """Noms des intervenants pouvant réaliser la visite i"""
+        return [self.intervenant_names[k] for k in np.flatnonzero(self.eligible_mask(i))]
+
+    def density(self) -> float:
+        """Part des enchaînements possibles parmi toutes les paires d'une même journée"""
+        pairs = sum(len(d.visits) * (len(d.visits) - 1) for d in self.days.values())
+        return sum(d.edges for d in self.days.values()) / pairs if pairs else 0.0
+
+class FeasibilityGraphBuilder:
+    """Précalcule, par diffusion NumPy, les enchaînements de visites possibles pour chaque journée"""
+
+    def build(self, interventions: List[Intervention], intervenants: List[Intervenant],
+              travel_times: Optional[Dict[str, Dict[str, int]]] = None,
+              travel_matrix: Optional[TravelMatrix] = None,
+              tolerance: int = START_TOLERANCE_MINUTES) -> FeasibilityGraph:
+        """Construit le graphe de faisabilité (les index suivent l'ordre des listes fournies)"""
+        start_time = time.time()
+        count = len(interventions)
+        names = [i.nom_prenom for i in intervenants]
+        name_index = {name: k for k, name in enumerate(names)}
+
+        starts = np.full(count, -1, dtype=np.int64)
+        durations = np.zeros(count, dtype=np.int64)
+        for k, intervention in enumerate(interventions):
+            if intervention.end_minutes is None:
+                logger.warning(f"⚠️ Horaire illisible pour {intervention.client}, visite exclue du graphe")
+                continue
+            starts[k] = intervention.start_minutes
+            durations[k] = intervention.duree_minutes
+        valid = starts >= 0
+
+        matrix = travel_matrix
+        if matrix is None:
+            coordinates = [(i.latitude, i.longitude) for i in interventions]
+            coordinates += [(i.latitude, i.longitude) for i in intervenants]
+            matrix = TravelMatrix(coordinates, travel_times=travel_times)
+
+        locs = self._locations(matrix, [(i.latitude, i.longitude) for i in interventions])
+        home_locs = self._locations(matrix, [(i.latitude, i.longitude) for i in intervenants])
+        window_start = np.zeros(len(names), dtype=np.int64)
+        window_end = np.full(len(names), MINUTES_PER_DAY, dtype=np.int64)
+        has_window = np.zeros(len(names), dtype=bool)
+        for k, intervenant in enumerate(intervenants):
+            window = parse_plage_horaire(intervenant.plage_horaire_autorisee)
+            if window:
+                window_start[k], window_end[k] = window
+                has_window[k] = True
+
+        # Intervenant imposé: seule ligne éligible pour la visite (-1 si libre, -2 si imposé inconnu)
+        imposed = np.array([name_index.get(i.intervenant, -2) if i.intervenant else -1 for i in interventions],
+                           dtype=np.int64)
+
+        visit_days = np.where(valid, starts // MINUTES_PER_DAY, -1)
+        positions = np.full(count, -1, dtype=np.int64)
+        days: Dict[int, DayFeasibility] = {}
+        for day in np.unique(visit_days[valid]):
+            visits = np.flatnonzero(visit_days == day)
+            visits = visits[np.argsort(starts[visits], kind='stable')]
+            positions[visits] = np.arange(len(visits))
+            days[int(day)] = self._build_day(int(day), visits, starts, durations, locs, matrix, home_locs,
+                                             window_start, window_end, has_window, imposed, tolerance)
+
+        graph = FeasibilityGraph(names, days, positions, visit_days)
+        logger.info(f"🕸️ Graphe de faisabilité: {len(days)} jours, {sum(d.edges for d in days.values())} "
+                    f"enchaînements possibles (densité {graph.density() * 100:.1f}%) en "
+                    f"{(time.time() - start_time) * 1000:.1f}ms")
+        return graph
+
+    def _build_day(self, day: int, visits: np.ndarray, starts: np.ndarray, durations: np.ndarray,
+                   locs: np.ndarray, matrix: TravelMatrix, home_locs: np.ndarray, window_start: np.ndarray,
+                   window_end: np.ndarray, has_window: np.ndarray, imposed: np.ndarray,
+                   tolerance: int) -> DayFeasibility:
+        day_starts = starts[visits]
+        day_ends = day_starts + durations[visits]
+        day_locs = locs[visits]
+
+        # Successeurs: fin de i + trajet(i, j) <= début de j (+ tolérance)
+        travel = self._travel(matrix, day_locs, day_locs)
+        successors = day_ends[:, None] + travel <= day_starts[None, :] + tolerance
+        np.fill_diagonal(successors, False)
+
+        # Éligibilité: visite entièrement dans la plage horaire de l'intervenant
+        minute_of_day = day_starts - day * MINUTES_PER_DAY
+        eligible = (minute_of_day[None, :] >= window_start[:, None]) & \
+                   (minute_of_day[None, :] + durations[visits][None, :] <= window_end[:, None])
+
+        day_imposed = imposed[visits]
+        constrained = day_imposed != -1
+        if constrained.any():
+            rows = np.arange(len(window_start))[:, None]
+            eligible[:, constrained] &= rows == day_imposed[constrained][None, :]
+
+        # Première visite: joignable depuis le domicile en partant au début de la plage horaire
+        home_travel = self._travel(matrix, home_locs, day_locs)
+        reachable = ~has_window[:, None] | (window_start[:, None] + home_travel <= minute_of_day[None, :] + tolerance)
+        return DayFeasibility(day, visits, successors, eligible, eligible & reachable)
+
+    def _locations(self, matrix: TravelMatrix, coordinates: List[Tuple[float, float]]) -> np.ndarray:
+        return np.array([matrix.index_of(lat, lon) for lat, lon in coordinates], dtype=np.int64)
+
+    def _travel(self, matrix: TravelMatrix, origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+        """Sous-matrice des trajets (trajet par défaut pour une coordonnée absente de la matrice)"""
+        travel = np.full((len(origins), len(destinations)), matrix.default_minutes, dtype=np.int64)
+        known_rows, known_cols = origins >= 0, destinations >= 0
+        if len(matrix) and known_rows.any() and known_cols.any():
+            travel[np.ix_(known_rows, known_cols)] = matrix.minutes[np.ix_(origins[known_rows], destinations[known_cols])]
+        return travel
+
+# Instance globale du constructeur de graphes de faisabilité
+feasibility_graph_builder = FeasibilityGraphBuilder()
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from models import PlanningEvent
+from utils.event_table import EventTable
+
+logger = logging.getLogger(__name__)
+
+ICS_CHUNK_EVENTS = 500  # Événements écrits par bloc envoyé au client
+ICS_VERSION = 1  # À incrémenter si le format produit change (invalide les ETag)
+ICS_TIMEZONE = "Europe/Paris"
+ICS_PRODID = "-//Planning Tournees//Planning IA//FR"
+ICS_REFRESH_INTERVAL = "PT15M"  # Fréquence de rafraîchissement suggérée aux applications d'agenda
+ICS_UID_DOMAIN = "planning-tournees"
+
+# Fuseau des horaires du planning (heure légale française, règles européennes depuis 1996)
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{ICS_TIMEZONE}",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "TZNAME:CEST",
+    "DTSTART:19700329T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "TZNAME:CET",
+    "DTSTART:19701025T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+def escape_text(value: Optional[str]) -> str:
+    """Échappe une valeur TEXT (RFC 5545 §3.3.11)"""
+    return (str(value or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def fold_line(line: str) -> str:
+    """Replie une ligne de contenu à 75 octets (RFC 5545 §3.1), sans couper un caractère UTF-8"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74  # Les lignes suivantes commencent par une espace
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+class IcsExportService:
+    """Flux iCalendar (RFC 5545) du planning, par intervenant ou combiné"""
+
+    def select(self, planning_events: Union[EventTable, List[PlanningEvent]],
+               intervenant: Optional[str] = None) -> Tuple[EventTable, np.ndarray]:
+        """Table du planning et lignes exportées (visites planifiées, triées par début)"""
+        table = EventTable.of(planning_events)
+        mask = table.planned
+        if intervenant is not None:
+            code = table.intervenants.code_of(intervenant)
+            if code < 0:
+                raise ValueError(f"Intervenant inconnu dans le planning: {intervenant}")
+            mask &= table.intervenants.codes == code
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(table.starts[rows], kind='stable')]
+        return table, rows
+
+    def etag(self, table: EventTable, rows: np.ndarray, intervenant: Optional[str] = None) -> str:
+        """Empreinte du contenu exporté, calculée sans générer le flux"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{ICS_VERSION}\x1f{intervenant or ''}".encode('utf-8'))
+        for column in (table.starts, table.ends, table.latitudes, table.longitudes):
+            digest.update(np.ascontiguousarray(column[rows]).tobytes())
+        for labels in (table.clients, table.intervenants, table.trajets, table.binomes):
+            digest.update('\x1f'.join(str(value) for value in labels.tolist(rows)).encode('utf-8'))
+        digest.update('\x1f'.join(table.ids[row] for row in rows.tolist()).encode('utf-8'))
+        # ETag faible: DTSTAMP varie d'une génération à l'autre pour un contenu identique
+        return f'W/"{digest.hexdigest()}"'
+
+    def iter_ics(self, table: EventTable, rows: np.ndarray, intervenant: Optional[str] = None,
+                 chunk_events: int = ICS_CHUNK_EVENTS) -> Iterator[bytes]:
+        """Génère le calendrier par blocs encodés en UTF-8"""
+        name = f"Planning {intervenant}" if intervenant else "Planning des tournées"
+        header = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{ICS_PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"NAME:{escape_text(name)}",
+            f"X-WR-CALNAME:{escape_text(name)}",
+            f"X-WR-TIMEZONE:{ICS_TIMEZONE}",
+            f"REFRESH-INTERVAL;VALUE=DURATION:{ICS_REFRESH_INTERVAL}",
+            f"X-PUBLISHED-TTL:{ICS_REFRESH_INTERVAL}",
+            *VTIMEZONE,
+        ]
+        yield ''.join(fold_line(line) for line in header).encode('utf-8')
+
+        dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        for offset in range(0, len(rows), chunk_events):
+            block = rows[offset:offset + chunk_events]
+            yield ''.join(self._vevents(table, block, dtstamp, combined=intervenant is None)).encode('utf-8')
+
+        yield fold_line("END:VCALENDAR").encode('utf-8')
+        logger.info(f"📅 Calendrier généré: {name}, {len(rows)} événement(s)")
+
+    def _vevents(self, table: EventTable, rows: np.ndarray, dtstamp: str, combined: bool) -> Iterator[str]:
+        starts = np.datetime_as_string((table.starts[rows] * 60).astype('datetime64[s]'), unit='s').tolist()
+        ends = np.datetime_as_string((table.ends[rows] * 60).astype('datetime64[s]'), unit='s').tolist()
+        columns = zip([table.ids[row] for row in rows.tolist()], starts, ends, table.clients.tolist(rows),
+                      table.intervenants.tolist(rows), table.trajets.tolist(rows), table.binomes.tolist(rows),
+                      table.latitudes[rows].tolist(), table.longitudes[rows].tolist())
+
+        for event_id, start, end, client, intervenant, trajet, binome_id, latitude, longitude in columns:
+            summary = f"{client} - {intervenant}" if combined else client
+            if binome_id:
+                summary += " (binôme)"
+            description = f"Intervenant: {intervenant}\nTrajet précédent: {trajet or '0 min'}"
+            lines = [
+                "BEGIN:VEVENT",
+                f"UID:{event_id}@{ICS_UID_DOMAIN}",
+                f"DTSTAMP:{dtstamp}",
+                f"DTSTART;TZID={ICS_TIMEZONE}:{self._ics_datetime(start)}",
+                f"DTEND;TZID={ICS_TIMEZONE}:{self._ics_datetime(end)}",
+                f"SUMMARY:{escape_text(summary)}",
+                f"LOCATION:{escape_text(f'{latitude:.6f}, {longitude:.6f}')}",
+                f"GEO:{latitude:.6f};{longitude:.6f}",
+                f"DESCRIPTION:{escape_text(description)}",
+                "STATUS:CONFIRMED",
+                "TRANSP:OPAQUE",
+                "END:VEVENT",
+            ]
+            yield ''.join(fold_line(line) for line in lines)
+
+    def _ics_datetime(self, iso: str) -> str:
+        # "2025-06-29T08:00:00" -> "20250629T080000"
+        return iso.replace('-', '').replace(':', '')
+
+# Instance globale du service d'export iCalendar
+ics_export_service = IcsExportService()
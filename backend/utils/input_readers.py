@@ -0,0 +1,106 @@
+import importlib
+import io
+import itertools
+import logging
+from datetime import time, timedelta
+from typing import Any, BinaryIO, Iterator, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Signatures (premiers octets) des formats d'entrée typés
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+XLSX_MAGIC = b'PK\x03\x04'
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.parquet', '.arrow', '.feather', '.ipc')
+
+def detect_input_format(sample: bytes) -> str:
+    """Détermine le format d'un fichier d'après ses premiers octets (csv par défaut)"""
+    if sample.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if sample.startswith(ARROW_FILE_MAGIC):
+        return 'arrow'
+    if sample.startswith(ARROW_STREAM_MAGIC):
+        return 'arrow_stream'
+    if sample.startswith(XLSX_MAGIC):
+        return 'xlsx'
+    return 'csv'
+
+def _require(module: str, package: str, label: str) -> Any:
+    """Importe une dépendance optionnelle, avec un message explicite si elle est absente"""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ValueError(f"La lecture des fichiers {label} nécessite le paquet '{package}' (pip install {package})")
+
+def _arrow_source(source: Union[bytes, BinaryIO]) -> Any:
+    """Source pyarrow sans copie pour un contenu en mémoire, lecture au fil de l'eau pour un fichier ouvert"""
+    pa = _require('pyarrow', 'pyarrow', 'Parquet/Arrow')
+    if isinstance(source, (bytes, bytearray)):
+        return pa.BufferReader(pa.py_buffer(source))
+    return pa.PythonFile(source, mode='r')
+
+def _with_offset(frames: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Numérote les lignes en continu d'un bloc à l'autre (comme pandas.read_csv par blocs)"""
+    offset = 0
+    for frame in frames:
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        offset += len(frame)
+        yield frame
+
+def read_parquet_chunks(source: Union[bytes, BinaryIO], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Lit un fichier Parquet par groupes de lignes (colonnes typées: coordonnées, dates, durées)"""
+    pq = _require('pyarrow.parquet', 'pyarrow', 'Parquet')
+    parquet_file = pq.ParquetFile(_arrow_source(source))
+    logger.info(f"🧱 Parquet: {parquet_file.metadata.num_rows} lignes, {parquet_file.metadata.num_row_groups} groupe(s)")
+    return _with_offset(batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunk_rows))
+
+def read_arrow_chunks(source: Union[bytes, BinaryIO], chunk_rows: int, stream: bool = False) -> Iterator[pd.DataFrame]:
+    """Lit un fichier Arrow IPC (format fichier/Feather v2 ou flux), lot par lot"""
+    pa = _require('pyarrow', 'pyarrow', 'Arrow')
+    reader = pa.ipc.open_stream(_arrow_source(source)) if stream else pa.ipc.open_file(_arrow_source(source))
+    batches = reader if stream else (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    def frames() -> Iterator[pd.DataFrame]:
+        for batch in batches:
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield batch.slice(offset, chunk_rows).to_pandas()
+    return _with_offset(frames())
+
+def _xlsx_value(value: Any) -> Any:
+    # Une heure seule (durée saisie "01:30") devient une durée pour être typée par pandas
+    if isinstance(value, time):
+        return timedelta(hours=value.hour, minutes=value.minute, seconds=value.second)
+    return value
+
+def read_xlsx_chunks(source: Union[bytes, BinaryIO], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Lit la première feuille d'un classeur XLSX en mode lecture seule (lignes lues au fil de l'eau)"""
+    openpyxl = _require('openpyxl', 'openpyxl', 'XLSX')
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {k}" for k, name in enumerate(header)]
+        width = len(columns)
+        logger.info(f"📗 XLSX: feuille '{sheet.title}', {width} colonnes")
+
+        offset = 0
+        while True:
+            block = [tuple(_xlsx_value(v) for v in row[:width]) + (None,) * (width - len(row))
+                     for row in itertools.islice(rows, chunk_rows)]
+            if not block:
+                return
+            frame = pd.DataFrame.from_records(block, columns=columns)
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            offset += len(frame)
+            yield frame
+    finally:
+        workbook.close()
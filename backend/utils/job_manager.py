@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from models import JobStatus, PlanningResponse
+
+logger = logging.getLogger(__name__)
+
+TOTAL_STAGES = 5
+
+# Progression (en %) atteinte au début de chaque étape du pipeline
+STAGE_PERCENT = {
+    1: 5,    # PARSING CSV
+    2: 20,   # VALIDATION DES DONNÉES
+    3: 25,   # GÉNÉRATION PLANNING IA (sous-étapes ci-dessous)
+    4: 90,   # CALCUL DES STATISTIQUES
+    5: 95    # FINALISATION
+}
+
+# Progression atteinte au début de chaque sous-étape de la génération (étape 3)
+SUBSTAGE_PERCENT = {
+    "TRAJETS OSRM": 25,
+    "APPEL IA": 40,
+    "OPTIMISATION DES TOURNÉES": 70,
+    "VALIDATION": 80
+}
+
+# L'état est conservé sans le résultat: le planning final est relu depuis le stockage des plannings
+JOB_SCHEMA = """
+DROP TABLE IF EXISTS planning_jobs;
+CREATE TABLE IF NOT EXISTS planning_job_states (
+    job_id TEXT PRIMARY KEY,
+    updated_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    state TEXT NOT NULL,
+    planning_id TEXT
+);
+"""
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+PipelineFactory = Callable[[Callable[[int, str], None]], Awaitable[PlanningResponse]]
+
+class JobManager:
+    """Exécute les générations de planning en tâche de fond avec une concurrence bornée
+
+    Un job s'exécute dans le processus qui l'a reçu; son état est recopié dans SQLite à chaque étape pour que
+    le suivi réponde quel que soit le worker interrogé (la file d'attente et la concurrence restent par processus).
+    """
+
+    def __init__(self):
+        self.max_concurrent_jobs = int(os.getenv('PLANNING_MAX_CONCURRENT_JOBS', '2'))
+        self.max_queued_jobs = int(os.getenv('PLANNING_MAX_QUEUED_JOBS', '20'))
+        self.job_ttl = timedelta(minutes=int(os.getenv('PLANNING_JOB_TTL_MINUTES', '60')))
+        self.db_path = os.getenv('PLANNING_JOB_STORE_PATH',
+                                 os.getenv('PLANNING_STORE_PATH', '/app/data/plannings.sqlite3'))
+        self._db_initialized = False
+        self.jobs: Dict[str, JobStatus] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()  # Références fortes sur les tâches en cours
+        # Écritures SQLite hors de la boucle d'événements, dans l'ordre où les états ont été produits
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planning-jobs")
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Créé paresseusement pour être lié à la boucle d'événements du serveur
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        return self._semaphore
+
+    def submit(self, pipeline_factory: PipelineFactory) -> JobStatus:
+        """Enregistre un job et lance son exécution en arrière-plan"""
+        self.purge_expired()
+
+        queued = sum(1 for job in self.jobs.values() if job.status == "pending")
+        if queued >= self.max_queued_jobs:
+            raise ValueError(f"Trop de plannings en attente ({queued}). Réessayez dans quelques instants.")
+
+        now = datetime.now().isoformat()
+        job = JobStatus(
+            job_id=str(uuid.uuid4()),
+            status="pending",
+            stage_label="EN FILE D'ATTENTE",
+            created_at=now,
+            updated_at=now
+        )
+        self.jobs[job.job_id] = job
+        self._persist_soon(job)
+
+        task = asyncio.create_task(self._run(job, pipeline_factory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        logger.info(f"📥 Job {job.job_id} soumis ({queued} en attente, {self.max_concurrent_jobs} simultanés max)")
+        return job
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        """Retourne l'état d'un job (lancé par ce processus ou par un autre worker)
+
+        Un job lu depuis SQLite n'a pas de résultat: seul planning_id est conservé, le planning se relit
+        depuis le stockage des plannings. Lecture bloquante pour un job d'un autre worker.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        try:
+            with closing(self._connect()) as connection:
+                row = connection.execute("SELECT state, planning_id FROM planning_job_states WHERE job_id = ?",
+                                         (job_id,)).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Erreur lecture job {job_id}: {str(e)}")
+            return None
+        if row is None:
+            return None
+        job = JobStatus.model_validate_json(row[0])
+        job.planning_id = row[1]
+        return job
+
+    def update_stage(self, job: JobStatus, stage: int, label: str) -> None:
+        """Met à jour l'étape (ou la sous-étape) courante d'un job"""
+        job.stage = stage
+        job.stage_label = f"ÉTAPE {stage}/{TOTAL_STAGES} - {label}"
+        job.percent = SUBSTAGE_PERCENT.get(label, STAGE_PERCENT.get(stage, job.percent))
+        job.updated_at = datetime.now().isoformat()
+        self._persist_soon(job)
+        logger.info(f"🔄 Job {job.job_id}: {job.stage_label} ({job.percent}%)")
+
+    async def _run(self, job: JobStatus, pipeline_factory: PipelineFactory) -> None:
+        """Exécute le pipeline dès qu'une place se libère dans le pool"""
+        async with self.semaphore:
+            job.status = "running"
+            job.updated_at = datetime.now().isoformat()
+            await self._persist_soon(job)
+            logger.info(f"🚀 Job {job.job_id} démarré")
+            try:
+                result = await pipeline_factory(lambda stage, label: self.update_stage(job, stage, label))
+                job.result = result
+                job.planning_id = result.planning_id
+                job.status = "succeeded"
+                job.percent = 100
+                job.stage_label = "TERMINÉ"
+                logger.info(f"🎉 Job {job.job_id} terminé avec succès")
+            except Exception as e:
+                # HTTPException porte son message dans .detail
+                job.error = str(getattr(e, 'detail', None) or e)
+                job.status = "failed"
+                logger.error(f"❌ Job {job.job_id} en échec: {job.error}")
+            finally:
+                job.updated_at = datetime.now().isoformat()
+                await self._persist_soon(job)
+
+    def purge_expired(self) -> None:
+        """Supprime les jobs terminés depuis plus longtemps que la durée de rétention"""
+        limit = datetime.now() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in FINISHED_STATUSES and datetime.fromisoformat(job.updated_at) < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        self._writer.submit(self._delete_expired, limit.isoformat())
+        if expired:
+            logger.info(f"🗑️ {len(expired)} jobs expirés supprimés")
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_initialized:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(JOB_SCHEMA)
+            self._db_initialized = True
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _persist_soon(self, job: JobStatus) -> asyncio.Future:
+        """Recopie l'état d'un job dans le stockage partagé entre workers, sans bloquer la boucle d'événements"""
+        # État figé maintenant (sans le résultat, relu depuis le stockage des plannings), écrit par le thread dédié
+        row = (job.job_id, job.updated_at, job.status, job.model_dump_json(exclude={'result'}), job.planning_id)
+        return asyncio.get_running_loop().run_in_executor(self._writer, self._write, row)
+
+    def _write(self, row: Tuple[str, str, str, str, Optional[str]]) -> None:
+        # Un échec d'écriture n'interrompt pas le job
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO planning_job_states (job_id, updated_at, status, state, planning_id) "
+                    "VALUES (?, ?, ?, ?, ?)", row
+                )
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Erreur enregistrement job {row[0]}: {str(e)}")
+
+    def _delete_expired(self, limit: str) -> None:
+        # Seuls les jobs terminés expirent: un job long encore en cours dans un autre worker reste consultable
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    f"DELETE FROM planning_job_states WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) "
+                    "AND updated_at < ?", (*FINISHED_STATUSES, limit)
+                )
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Erreur purge des jobs: {str(e)}")
+
+# Instance globale du gestionnaire de jobs
+job_manager = JobManager()
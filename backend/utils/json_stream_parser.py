@@ -0,0 +1,83 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class IncrementalJSONArrayParser:
+    """Parse un tableau JSON reçu par morceaux et restitue chaque objet dès sa fermeture"""
+
+    def __init__(self):
+        self.array_started = False  # '[' racine rencontré
+        self.array_finished = False  # ']' racine rencontré
+        self.objects_parsed = 0
+        self.objects_failed = 0
+        self._buffer: List[str] = []
+        self._depth = 0  # Profondeur d'imbrication dans l'objet courant
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Ajoute un morceau de texte et retourne les objets complets détectés"""
+        completed = []
+        if self.array_finished or not chunk:
+            return completed
+
+        for char in chunk:
+            if not self.array_started:
+                # Ignorer tout ce qui précède le tableau (texte libre, balises markdown)
+                if char == '[':
+                    self.array_started = True
+                continue
+
+            if self._depth == 0:
+                # Entre deux objets du tableau racine
+                if char == '{':
+                    self._buffer = [char]
+                    self._depth = 1
+                elif char == ']':
+                    self.array_finished = True
+                    break
+                continue
+
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode_buffer()
+                    if obj is not None:
+                        completed.append(obj)
+
+        return completed
+
+    def _decode_buffer(self):
+        """Décode l'objet accumulé dans le buffer"""
+        raw = ''.join(self._buffer)
+        self._buffer = []
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.objects_failed += 1
+            logger.warning(f"⚠️ Objet JSON invalide ignoré dans le flux: {str(e)}")
+            return None
+
+        if not isinstance(obj, dict):
+            self.objects_failed += 1
+            return None
+
+        self.objects_parsed += 1
+        return obj
@@ -3,10 +3,18 @@ import json
 import logging
 import os
 import asyncio
-from typing import List, Dict, Any
-from models import Intervention, Intervenant, PlanningEvent
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Set, Tuple, Union
+from models import Intervention, Intervenant, PlanningEvent, INTERVENANT_COLORS
 from utils.planning_validator import planning_validator
 from utils.travel_cache_service import travel_cache_service
+from utils.json_stream_parser import IncrementalJSONArrayParser
+from utils.route_optimizer import route_optimizer
+from utils.binome_planner import binome_planner
+from utils.fallback_scheduler import fallback_scheduler
+from utils.travel_matrix import TravelMatrix
+from utils.event_table import EventTable
+from utils.stable_ids import unique_id
+from utils.workload_ledger import workload_ledger
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -23,6 +31,8 @@ class OpenAIClient:
             raise ValueError("OPENAI_API_KEY non trouvée dans l'environnement")
             
         self.client = openai.OpenAI(api_key=api_key)
+        # Client asynchrone pour les appels à l'IA (ne bloque pas la boucle d'événements)
+        self.async_client = openai.AsyncOpenAI(api_key=api_key)
         
         # Prompt système pour l'IA de planification avec votre nouveau prompt
         self.system_prompt = """Tu es un expert en planification de tournées d'intervenants à domicile.
@@ -168,12 +178,135 @@ RÈGLES CRITIQUES:
         logger.info(f"   • Temps total: {total_time:.2f}s")
         return travel_times
         
-    async def generate_planning(self, interventions: List[Intervention], intervenants: List[Intervenant]) -> List[PlanningEvent]:
-        """Génère un planning optimisé via OpenAI avec calcul automatique des trajets"""
+    def _build_intervenant_colors(self, intervenants: List[Intervenant]) -> Dict[str, str]:
+        """Crée un mapping couleur pour chaque intervenant (en évitant les doublons)"""
+        intervenant_colors = {}
+        noms_uniques = list(dict.fromkeys(intervenant.nom_prenom for intervenant in intervenants))
+        for i, nom in enumerate(noms_uniques):
+            intervenant_colors[nom] = INTERVENANT_COLORS[i % len(INTERVENANT_COLORS)]
+        return intervenant_colors
+
+    def _build_user_message(self, interventions: List[Intervention], intervenants: List[Intervenant],
+                            travel_times: Dict[str, Dict[str, int]], intervenant_colors: Dict[str, str]) -> Tuple[str, list, list]:
+        """Prépare les données en format compact et construit le message utilisateur pour l'IA"""
+        interventions_data = []
+        for i, intervention in enumerate(interventions, 1):
+            logger.debug(f"   Préparation intervention {i}/{len(interventions)}: {intervention.client}")
+            data = {
+                "client": intervention.client,
+                "date": intervention.date,
+                "duree": intervention.duree,
+                "latitude": intervention.latitude,
+                "longitude": intervention.longitude,
+                "secteur": intervention.secteur
+            }
+            # N'ajouter l'intervenant que s'il est spécifié (PRIORITÉ 10/10)
+            if intervention.intervenant:
+                data["intervenant_impose"] = intervention.intervenant
+            # Ajouter les champs spéciaux
+            if intervention.binome:
+                data["binome"] = True
+            if intervention.intervenant_referent:
+                data["intervenant_referent"] = intervention.intervenant_referent
+            interventions_data.append(data)
+
+        intervenants_data = []
+        for i, intervenant in enumerate(intervenants, 1):
+            logger.debug(f"   Préparation intervenant {i}/{len(intervenants)}: {intervenant.nom_prenom}")
+            data = {
+                "nom_prenom": intervenant.nom_prenom,
+                "latitude": intervenant.latitude,
+                "longitude": intervenant.longitude,
+                "heure_hebdomaire": intervenant.heure_hebdomaire,
+                "heure_mensuel": intervenant.heure_mensuel,
+                "roulement_weekend": intervenant.roulement_weekend,
+                "couleur_assignee": intervenant_colors[intervenant.nom_prenom]
+            }
+            # Ajouter les champs optionnels
+            if intervenant.plage_horaire_autorisee:
+                data["plage_horaire_autorisee"] = intervenant.plage_horaire_autorisee
+            if intervenant.specialites:
+                data["specialites"] = intervenant.specialites
+            intervenants_data.append(data)
+
+        # Construire un message utilisateur compact avec temps de trajet
+        user_message = f"""INTERVENTIONS ({len(interventions_data)} total - traiter CHAQUE une EXACTEMENT UNE fois):
+{json.dumps(interventions_data, ensure_ascii=False)}
+
+INTERVENANTS ({len(intervenants_data)} total):
+{json.dumps(intervenants_data, ensure_ascii=False)}
+
+TEMPS DE TRAJET CALCULÉS (travel_times_cache.csv - en minutes) - Format: "latitude,longitude" -> temps:
+{json.dumps(travel_times, ensure_ascii=False)}
+
+RÈGLES CRITIQUES D'EXÉCUTION:
+- UTILISER EXCLUSIVEMENT les temps de trajet réels fournis ci-dessus (format latitude,longitude)
+- RESPECTER l'ordre de priorité: Intervenant imposé (10/10) > Conflits (9/10) > Équilibrage (8/10) > Légal (7/10)
+- APPLIQUER l'algorithme d'optimisation: 1ère intervention = plus proche du domicile, suivantes = plus proche de position actuelle
+- FORMAT DE SORTIE: dates ISO complètes "YYYY-MM-DDTHH:MM:SS"
+- Temps entre interventions = temps de trajet réel + 5 min minimum
+- Si conflit ou impossible: marquer non_planifiable avec raison détaillée
+
+OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOUBLONS ni CONFLITS."""
+
+        return user_message, interventions_data, intervenants_data
+
+    def _build_intervention_ids(self, interventions: List[Intervention]) -> Dict[Tuple[str, Optional[int]], str]:
+        """Identifiants des interventions par (client, début), reportés sur les événements de l'IA"""
+        intervention_ids = {}
+        for intervention in interventions:
+            intervention_ids.setdefault((intervention.client, intervention.start_minutes), intervention.id)
+        return intervention_ids
+
+    def _build_planning_event(self, event_data: Dict[str, Any], intervenant_colors: Dict[str, str],
+                              intervention_ids: Dict[Tuple[str, Optional[int]], str], taken_ids: Set[str]) -> PlanningEvent:
+        """Convertit un objet JSON de l'IA en PlanningEvent (identifiant de l'intervention correspondante)"""
+        # Vérifier/corriger la couleur selon l'intervenant
+        intervenant_name = event_data.get('intervenant', '')
+        assigned_color = event_data.get('color', '#64748b')
+
+        # Si l'intervenant a une couleur assignée, l'utiliser
+        if intervenant_name in intervenant_colors:
+            assigned_color = intervenant_colors[intervenant_name]
+
+        event = PlanningEvent(
+            client=event_data.get('client', ''),
+            intervenant=intervenant_name,
+            start=event_data.get('start', ''),
+            end=event_data.get('end', ''),
+            color=assigned_color,
+            non_planifiable=event_data.get('non_planifiable', False),
+            trajet_precedent=self._format_trajet_precedent(event_data.get('trajet_precedent', '0 min')),
+            latitude=event_data.get('latitude', 0.0),
+            longitude=event_data.get('longitude', 0.0),
+            raison=event_data.get('raison', None)
+        )
+
+        try:
+            key = (event.client, event.start_minutes)
+        except ValueError:
+            key = None
+        # Un même créneau rendu deux fois (binôme, doublon) reçoit un identifiant dérivé, stable d'un appel à l'autre
+        event.id = unique_id(intervention_ids.get(key, event.id), taken_ids)
+        taken_ids.add(event.id)
+        return event
+
+    async def generate_planning(self, interventions: List[Intervention], intervenants: List[Intervenant],
+                                on_step: Optional[Callable[[str], None]] = None) -> List[PlanningEvent]:
+        """Génère un planning optimisé via OpenAI avec calcul automatique des trajets
+
+        on_step est notifié au début de chaque sous-étape (trajets OSRM, appel IA, optimisation, validation);
+        les sous-étapes de calcul s'exécutent dans le pool de threads pour ne pas bloquer la boucle d'événements.
+        """
         import time
         total_start_time = time.time()
         
+        def step(label: str):
+            if on_step:
+                on_step(label)
+        
         try:
+            step("TRAJETS OSRM")
             logger.info("🚀 === DÉBUT GÉNÉRATION PLANNING IA ===")
             
             # RÉCUPÉRER LES TEMPS DE TRAJET AVEC CALCUL AUTOMATIQUE
@@ -187,80 +320,13 @@ RÈGLES CRITIQUES:
             logger.info("🔧 Phase 2/4 - Préparation des données pour l'IA")
             prep_start = time.time()
             
-            # Générer la palette de couleurs pour les intervenants
-            color_palette = [
-                "#32a852", "#3b82f6", "#f59e0b", "#8b5cf6", "#ef4444", 
-                "#06b6d4", "#84cc16", "#f97316", "#ec4899", "#6366f1"
-            ]
-            
-            # Créer un mapping couleur pour chaque intervenant (en évitant les doublons)
-            intervenant_colors = {}
-            noms_uniques = list(set(intervenant.nom_prenom for intervenant in intervenants))
-            for i, nom in enumerate(noms_uniques):
-                intervenant_colors[nom] = color_palette[i % len(color_palette)]
-            
+            intervenant_colors = self._build_intervenant_colors(intervenants)
+            intervention_ids = self._build_intervention_ids(interventions)
             logger.info(f"🎨 Couleurs assignées: {len(intervenant_colors)} intervenants")
             
-            # Préparer les données en format compact pour l'IA
-            interventions_data = []
-            for i, intervention in enumerate(interventions, 1):
-                logger.debug(f"   Préparation intervention {i}/{len(interventions)}: {intervention.client}")
-                data = {
-                    "client": intervention.client,
-                    "date": intervention.date,
-                    "duree": intervention.duree,
-                    "latitude": intervention.latitude,
-                    "longitude": intervention.longitude,
-                    "secteur": intervention.secteur
-                }
-                # N'ajouter l'intervenant que s'il est spécifié (PRIORITÉ 10/10)
-                if intervention.intervenant:
-                    data["intervenant_impose"] = intervention.intervenant
-                # Ajouter les champs spéciaux
-                if intervention.binome:
-                    data["binome"] = True
-                if intervention.intervenant_referent:
-                    data["intervenant_referent"] = intervention.intervenant_referent
-                interventions_data.append(data)
-            
-            intervenants_data = []
-            for i, intervenant in enumerate(intervenants, 1):
-                logger.debug(f"   Préparation intervenant {i}/{len(intervenants)}: {intervenant.nom_prenom}")
-                data = {
-                    "nom_prenom": intervenant.nom_prenom,
-                    "latitude": intervenant.latitude,
-                    "longitude": intervenant.longitude,
-                    "heure_hebdomaire": intervenant.heure_hebdomaire,
-                    "heure_mensuel": intervenant.heure_mensuel,
-                    "roulement_weekend": intervenant.roulement_weekend,
-                    "couleur_assignee": intervenant_colors[intervenant.nom_prenom]
-                }
-                # Ajouter les champs optionnels
-                if intervenant.plage_horaire_autorisee:
-                    data["plage_horaire_autorisee"] = intervenant.plage_horaire_autorisee
-                if intervenant.specialites:
-                    data["specialites"] = intervenant.specialites
-                intervenants_data.append(data)
-            
-            # Construire un message utilisateur compact avec temps de trajet
-            user_message = f"""INTERVENTIONS ({len(interventions_data)} total - traiter CHAQUE une EXACTEMENT UNE fois):
-{json.dumps(interventions_data, ensure_ascii=False)}
-
-INTERVENANTS ({len(intervenants_data)} total):
-{json.dumps(intervenants_data, ensure_ascii=False)}
-
-TEMPS DE TRAJET CALCULÉS (travel_times_cache.csv - en minutes) - Format: "latitude,longitude" -> temps:
-{json.dumps(travel_times, ensure_ascii=False)}
-
-RÈGLES CRITIQUES D'EXÉCUTION:
-- UTILISER EXCLUSIVEMENT les temps de trajet réels fournis ci-dessus (format latitude,longitude)
-- RESPECTER l'ordre de priorité: Intervenant imposé (10/10) > Conflits (9/10) > Équilibrage (8/10) > Légal (7/10)
-- APPLIQUER l'algorithme d'optimisation: 1ère intervention = plus proche du domicile, suivantes = plus proche de position actuelle
-- FORMAT DE SORTIE: dates ISO complètes "YYYY-MM-DDTHH:MM:SS"
-- Temps entre interventions = temps de trajet réel + 5 min minimum
-- Si conflit ou impossible: marquer non_planifiable avec raison détaillée
-
-OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOUBLONS ni CONFLITS."""
+            user_message, interventions_data, intervenants_data = self._build_user_message(
+                interventions, intervenants, travel_times, intervenant_colors
+            )
             
             prep_duration = time.time() - prep_start
             logger.info(f"✅ Phase 2/4 terminée en {prep_duration:.2f}s")
@@ -273,9 +339,11 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             logger.info(f"   • {len(intervenants_data)} intervenants") 
             logger.info(f"   • {sum(len(routes) for routes in travel_times.values())} temps de trajet")
             
+            step("APPEL IA")
             ai_start = time.time()
             # Utiliser GPT-4o-mini qui a des limites plus élevées
-            response = self.client.chat.completions.create(
+            # (client asynchrone: l'attente de l'IA ne bloque pas les autres requêtes, ex. suivi des jobs)
+            response = await self.async_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": self.system_prompt},
@@ -356,29 +424,11 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             
             # Convertir en objets PlanningEvent
             planning_events = []
+            taken_ids = set()
             for i, event_data in enumerate(planning_data, 1):
                 try:
                     logger.debug(f"   Traitement événement {i}/{len(planning_data)}: {event_data.get('client', 'N/A')}")
-                    # Vérifier/corriger la couleur selon l'intervenant
-                    intervenant_name = event_data.get('intervenant', '')
-                    assigned_color = event_data.get('color', '#64748b')
-                    
-                    # Si l'intervenant a une couleur assignée, l'utiliser
-                    if intervenant_name in intervenant_colors:
-                        assigned_color = intervenant_colors[intervenant_name]
-                    
-                    event = PlanningEvent(
-                        client=event_data.get('client', ''),
-                        intervenant=intervenant_name,
-                        start=event_data.get('start', ''),
-                        end=event_data.get('end', ''),
-                        color=assigned_color,
-                        non_planifiable=event_data.get('non_planifiable', False),
-                        trajet_precedent=self._format_trajet_precedent(event_data.get('trajet_precedent', '0 min')),
-                        latitude=event_data.get('latitude', 0.0),
-                        longitude=event_data.get('longitude', 0.0),
-                        raison=event_data.get('raison', None)
-                    )
+                    event = self._build_planning_event(event_data, intervenant_colors, intervention_ids, taken_ids)
                     planning_events.append(event)
                 except Exception as e:
                     logger.error(f"❌ Erreur création PlanningEvent {i}: {str(e)}")
@@ -388,10 +438,27 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             logger.info(f"✅ Phase 4/4 terminée en {processing_duration:.2f}s")
             logger.info(f"📋 Planning brut généré: {len(planning_events)} événements")
             
+            # OPTIMISATION LOCALE DES TOURNÉES (IA ou fallback)
+            logger.info("🧭 Optimisation locale des tournées...")
+            step("OPTIMISATION DES TOURNÉES")
+            optimization_start = time.time()
+            planning_events, optimization_summary = await asyncio.to_thread(
+                route_optimizer.optimize, planning_events, interventions, intervenants, travel_times
+            )
+            
+            # BINÔMES: deux événements alignés par visite à deux intervenants
+            planning_events, _ = await asyncio.to_thread(
+                binome_planner.ensure_pairs, planning_events, interventions, intervenants, travel_times
+            )
+            optimization_duration = time.time() - optimization_start
+            
             # VALIDATION ET CORRECTION DES CONFLITS
             logger.info("🔍 Validation finale et correction des conflits...")
+            step("VALIDATION")
             validation_start = time.time()
-            validated_planning = planning_validator.validate_and_fix_planning(planning_events)
+            validated_planning = await asyncio.to_thread(
+                self._validate_generated, planning_events, interventions, intervenants, travel_times
+            )
             validation_duration = time.time() - validation_start
             
             total_duration = time.time() - total_start_time
@@ -402,6 +469,7 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             logger.info(f"   • Préparation IA: {prep_duration:.2f}s") 
             logger.info(f"   • Appel OpenAI: {ai_duration:.2f}s")
             logger.info(f"   • Traitement: {processing_duration:.2f}s")
+            logger.info(f"   • Optimisation: {optimization_duration:.2f}s ({optimization_summary['saved_minutes']} min de trajet économisées)")
             logger.info(f"   • Validation: {validation_duration:.2f}s")
             logger.info(f"   • TEMPS TOTAL: {total_duration:.2f}s")
             logger.info(f"   • Événements finaux: {len(validated_planning)}")
@@ -418,74 +486,140 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             logger.error(f"Erreur génération planning: {str(e)}")
             raise ValueError(f"Erreur interne: {str(e)}")
     
+    async def stream_planning(self, interventions: List[Intervention], intervenants: List[Intervenant]) -> AsyncIterator[Tuple[str, Any]]:
+        """Génère le planning en streaming: chaque événement est restitué dès que l'IA a fini de l'écrire.
+
+        Produit des tuples ("event", PlanningEvent) au fil de la réponse, puis
+        ("complete", List[PlanningEvent]) avec le planning validé final.
+        """
+        import time
+        total_start_time = time.time()
+
+        try:
+            logger.info("🚀 === DÉBUT GÉNÉRATION PLANNING IA (STREAMING) ===")
+
+            logger.info("📍 Phase 1/4 - Récupération des temps de trajet")
+            travel_times = await self.get_travel_times_with_cache(interventions, intervenants)
+
+            logger.info("🔧 Phase 2/4 - Préparation des données pour l'IA")
+            intervenant_colors = self._build_intervenant_colors(intervenants)
+            intervention_ids = self._build_intervention_ids(interventions)
+            user_message, interventions_data, _ = self._build_user_message(
+                interventions, intervenants, travel_times, intervenant_colors
+            )
+            logger.info(f"📏 Taille du message: {len(user_message):,} caractères")
+
+            logger.info("🤖 Phase 3/4 - Appel à l'IA OpenAI (streaming)")
+            ai_start = time.time()
+            stream = await self.async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                temperature=0.05,
+                max_tokens=12000,
+                stream=True
+            )
+
+            parser = IncrementalJSONArrayParser()
+            planning_events = []
+            taken_ids = set()
+            received_chars = 0
+            first_event_time = None
+
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                received_chars += len(delta)
+
+                for event_data in parser.feed(delta):
+                    try:
+                        event = self._build_planning_event(event_data, intervenant_colors, intervention_ids, taken_ids)
+                    except Exception as e:
+                        logger.error(f"❌ Erreur création PlanningEvent {len(planning_events) + 1}: {str(e)}")
+                        continue
+                    if first_event_time is None:
+                        first_event_time = time.time() - ai_start
+                        logger.info(f"⚡ Premier événement reçu en {first_event_time:.2f}s")
+                    planning_events.append(event)
+                    yield "event", event
+
+            ai_duration = time.time() - ai_start
+            logger.info(f"✅ Phase 3/4 terminée en {ai_duration:.2f}s")
+            logger.info(f"📥 Réponse reçue: {received_chars:,} caractères, {parser.objects_parsed} objets ({parser.objects_failed} invalides)")
+
+            logger.info("🔍 Phase 4/4 - Finalisation du flux")
+            if not planning_events:
+                if received_chars == 0:
+                    raise ValueError("L'IA n'a pas retourné de réponse. Réessayez avec moins d'interventions ou vérifiez votre clé OpenAI.")
+
+                # Aucun objet exploitable dans le flux: même repli que le mode non streaming
+                logger.warning("🔄 Génération d'un planning de base en cas d'échec de l'IA")
+                fallback_data = await self.generate_fallback_planning(interventions, intervenants, travel_times)
+                for event_data in fallback_data:
+                    try:
+                        event = self._build_planning_event(event_data, intervenant_colors, intervention_ids, taken_ids)
+                    except Exception as e:
+                        logger.error(f"❌ Erreur création PlanningEvent de fallback: {str(e)}")
+                        continue
+                    planning_events.append(event)
+                    yield "event", event
+
+            if not planning_events:
+                raise ValueError("L'IA n'a retourné aucune intervention planifiée")
+
+            if len(planning_events) != len(interventions_data):
+                logger.warning(f"⚠️ Nombre d'interventions différent: attendu {len(interventions_data)}, reçu {len(planning_events)}")
+
+            logger.info("🧭 Optimisation locale des tournées...")
+            planning_events, _ = await asyncio.to_thread(
+                route_optimizer.optimize, planning_events, interventions, intervenants, travel_times
+            )
+            planning_events, _ = await asyncio.to_thread(
+                binome_planner.ensure_pairs, planning_events, interventions, intervenants, travel_times
+            )
+
+            logger.info("🔍 Validation finale et correction des conflits...")
+            validated_planning = await asyncio.to_thread(
+                self._validate_generated, planning_events, interventions, intervenants, travel_times
+            )
+
+            total_duration = time.time() - total_start_time
+            logger.info(f"✅ === GÉNÉRATION PLANNING STREAMING TERMINÉE en {total_duration:.2f}s ===")
+
+            yield "complete", validated_planning
+
+        except openai.APIError as e:
+            logger.error(f"Erreur API OpenAI: {str(e)}")
+            if "rate_limit_exceeded" in str(e):
+                raise ValueError("Limite de tokens OpenAI dépassée. Réessayez dans 1 minute ou contactez votre administrateur pour augmenter les limites.")
+            else:
+                raise ValueError(f"Erreur OpenAI: {str(e)}")
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur génération planning streaming: {str(e)}")
+            raise ValueError(f"Erreur interne: {str(e)}")
+
+    def _validate_generated(self, planning_events: List[PlanningEvent], interventions: List[Intervention],
+                            intervenants: List[Intervenant], travel_times: Dict[str, Dict[str, int]]) -> List[PlanningEvent]:
+        """Validation finale d'un planning généré (visites à intervenant imposé et binômes verrouillées)"""
+        # Domiciles inclus: la réparation peut confier une visite à un intervenant sans autre visite ce jour-là
+        travel_matrix = TravelMatrix([(e.latitude, e.longitude) for e in planning_events]
+                                     + [(i.latitude, i.longitude) for i in intervenants], travel_times=travel_times)
+        locked_ids = {event.id for event, locked in zip(planning_events, route_optimizer.locked_mask(planning_events, interventions)) if locked}
+        return planning_validator.validate_and_fix_planning(planning_events, travel_matrix, locked_ids, intervenants)
+
     async def generate_fallback_planning(self, interventions: List[Intervention], intervenants: List[Intervenant], travel_times: Dict[str, Dict[str, int]]) -> list:
         """Génère un planning de base en cas d'échec de l'IA"""
         try:
             logger.info("Génération d'un planning de fallback")
-            fallback_planning = []
-            
-            # Couleurs de base
-            colors = ["#32a852", "#3b82f6", "#f59e0b", "#8b5cf6", "#ef4444"]
-            
-            for i, intervention in enumerate(interventions):
-                try:
-                    # Assigner un intervenant de base
-                    intervenant_assigned = intervention.intervenant if intervention.intervenant else (
-                        intervenants[i % len(intervenants)].nom_prenom if intervenants else "Non assigné"
-                    )
-                    
-                    # Calculer l'heure de fin (ajouter la durée à l'heure de début)
-                    start_time = intervention.date  # Format: "29/06/2025 08:00"
-                    duration = intervention.duree   # Format: "01:00"
-                    
-                    # Convertir au format ISO
-                    date_part, time_part = start_time.split(" ")
-                    day, month, year = date_part.split("/")
-                    start_iso = f"{year}-{month}-{day}T{time_part}:00"
-                    
-                    # Calculer l'heure de fin
-                    from datetime import datetime, timedelta
-                    start_dt = datetime.fromisoformat(start_iso)
-                    duration_parts = duration.split(":")
-                    duration_td = timedelta(hours=int(duration_parts[0]), minutes=int(duration_parts[1]))
-                    end_dt = start_dt + duration_td
-                    end_iso = end_dt.isoformat()
-                    
-                    # Calculer le temps de trajet pour ce fallback
-                    trajet_temps = "0 min"
-                    if i > 0 and len(fallback_planning) > 0:
-                        # Prendre les coordonnées de la dernière intervention
-                        prev_lat = fallback_planning[-1]["latitude"]
-                        prev_lon = fallback_planning[-1]["longitude"]
-                        current_lat = intervention.latitude
-                        current_lon = intervention.longitude
-                        
-                        # Chercher dans le cache des temps de trajet
-                        prev_key = f"{prev_lat:.6f},{prev_lon:.6f}"
-                        current_key = f"{current_lat:.6f},{current_lon:.6f}"
-                        
-                        if prev_key in travel_times and current_key in travel_times[prev_key]:
-                            trajet_minutes = travel_times[prev_key][current_key]
-                            trajet_temps = f"{trajet_minutes} min"
-                    
-                    fallback_event = {
-                        "client": intervention.client,
-                        "intervenant": intervenant_assigned,
-                        "start": start_iso,
-                        "end": end_iso,
-                        "color": colors[i % len(colors)],
-                        "non_planifiable": False,
-                        "trajet_precedent": trajet_temps,
-                        "latitude": intervention.latitude,
-                        "longitude": intervention.longitude
-                    }
-                    
-                    fallback_planning.append(fallback_event)
-                    
-                except Exception as e:
-                    logger.error(f"Erreur création fallback pour intervention {i}: {str(e)}")
-                    continue
-            
+            fallback_planning = await asyncio.to_thread(fallback_scheduler.schedule, interventions, intervenants,
+                                                        travel_times)
             logger.info(f"Planning de fallback généré avec {len(fallback_planning)} interventions")
             return fallback_planning
             
@@ -493,20 +627,27 @@ OBJECTIF: RETOURNER {len(interventions_data)} interventions planifiées SANS DOU
             logger.error(f"Erreur génération fallback: {str(e)}")
             return []
     
-    def calculate_stats(self, planning_events: List[PlanningEvent], total_interventions: int, total_intervenants: int) -> Dict[str, Any]:
+    def calculate_stats(self, planning_events: Union[EventTable, List[PlanningEvent]], total_interventions: int,
+                        total_intervenants: int, intervenants: Optional[List[Intervenant]] = None) -> Dict[str, Any]:
         """Calcule las statistiques du planning"""
         try:
-            planifiees = sum(1 for event in planning_events if not event.non_planifiable)
-            non_planifiables = sum(1 for event in planning_events if event.non_planifiable)
+            table = EventTable.of(planning_events)
+            non_planifiables = int(table.non_planifiable.sum())
+            planifiees = len(table) - non_planifiables
             
             taux_planification = (planifiees / total_interventions * 100) if total_interventions > 0 else 0
             
+            # Charge horaire par intervenant (semaines ISO et mois)
+            workloads = workload_ledger.compute(table, intervenants)
+            
             return {
                 "total_interventions": total_interventions,
                 "interventions_planifiees": planifiees,
                 "interventions_non_planifiables": non_planifiables,
                 "intervenants": total_intervenants,
-                "taux_planification": round(taux_planification, 1)
+                "taux_planification": round(taux_planification, 1),
+                "depassements_horaires": workload_ledger.count_overruns(workloads),
+                "charge_intervenants": workloads
             }
         except Exception as e:
             logger.error(f"Erreur calcul statistiques: {str(e)}")
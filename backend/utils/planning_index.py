@@ -0,0 +1,51 @@
+from typing import Optional
+
+import numpy as np
+
+from utils.event_table import EventTable
+
+class PlanningIndex:
+    """Index de requête d'un planning: ordre chronologique global et plages par intervenant
+
+    Une fenêtre de dates se résout par recherche dichotomique sur les débuts triés; les événements d'un
+    intervenant occupent une plage contiguë [offsets[code], offsets[code + 1]) de l'ordre par intervenant.
+    """
+
+    def __init__(self, table: EventTable):
+        self.table = table
+        # Horaires illisibles rangés en tête: exclus de toute fenêtre de dates
+        starts = np.where(table.valid, table.starts, np.iinfo(np.int64).min)
+        self.order = np.argsort(starts, kind='stable')
+        self.order_starts = starts[self.order]
+        self.by_intervenant = np.lexsort((starts, table.intervenants.codes))
+        self.intervenant_starts = starts[self.by_intervenant]
+        self.offsets = np.searchsorted(table.intervenants.codes[self.by_intervenant],
+                                       np.arange(len(table.intervenants.values) + 1))
+        # Durée maximale: borne la recherche des événements commencés avant la fenêtre
+        durations = (table.ends - table.starts)[table.valid]
+        self.max_duration = int(durations.max()) if len(durations) else 0
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None, intervenant: Optional[str] = None,
+              non_planifiable: Optional[bool] = None) -> np.ndarray:
+        """Lignes (ordre chronologique) des événements chevauchant [start, end), filtrées par intervenant et statut"""
+        if intervenant is not None:
+            code = self.table.intervenants.code_of(intervenant)
+            if code < 0:
+                return np.empty(0, dtype=np.int64)
+            low, high = self.offsets[code], self.offsets[code + 1]
+            rows, starts = self.by_intervenant[low:high], self.intervenant_starts[low:high]
+        else:
+            rows, starts = self.order, self.order_starts
+
+        if start is not None or end is not None:
+            low = 0 if start is None else np.searchsorted(starts, start - self.max_duration, side='left')
+            high = len(starts) if end is None else np.searchsorted(starts, end, side='left')
+            rows = rows[low:high]
+            mask = self.table.valid[rows]
+            if start is not None:
+                mask &= self.table.ends[rows] > start
+            rows = rows[mask]
+
+        if non_planifiable is not None:
+            rows = rows[self.table.non_planifiable[rows] == non_planifiable]
+        return rows
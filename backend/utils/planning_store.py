@@ -0,0 +1,213 @@
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Union
+
+import numpy as np
+
+from models import Intervenant, PlanningEvent, PlanningStats
+from utils.event_table import EventTable, StringTable
+from utils.planning_index import PlanningIndex
+
+logger = logging.getLogger(__name__)
+
+PLANNING_FORMAT = 1  # À incrémenter si la forme sérialisée change
+STRING_COLUMNS = ('clients', 'intervenants', 'start_labels', 'end_labels', 'colors', 'trajets', 'raisons', 'binomes')
+ARRAY_COLUMNS = ('starts', 'ends', 'valid', 'latitudes', 'longitudes', 'non_planifiable')
+PLANNING_INDEX_CACHE_SIZE = 16  # Index de requête gardés en mémoire (plannings consultés récemment)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plannings (
+    planning_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    events_count INTEGER NOT NULL,
+    format INTEGER NOT NULL,
+    stats TEXT,
+    payload BLOB NOT NULL,
+    context TEXT
+);
+CREATE INDEX IF NOT EXISTS plannings_updated_at ON plannings (updated_at);
+"""
+
+def encode_context(locked_ids: Optional[Iterable[str]], intervenants: Optional[List[Intervenant]]) -> Optional[str]:
+    """Contexte de re-validation: visites verrouillées (intervenant imposé, binôme) et contrats des intervenants"""
+    if not locked_ids and not intervenants:
+        return None
+    return json.dumps({
+        'locked_ids': sorted(locked_ids or ()),
+        'intervenants': [intervenant.model_dump() for intervenant in intervenants or []]
+    }, ensure_ascii=False, separators=(',', ':'))
+
+def encode_table(table: EventTable) -> bytes:
+    """Forme compacte d'un planning: colonnes NumPy et codes des chaînes dans une archive npz compressée
+
+    Les valeurs distinctes des colonnes de chaînes (et les identifiants) sont stockées une seule fois dans un
+    en-tête JSON; les horaires déjà convertis en minutes sont conservés pour ne pas les relire au chargement.
+    """
+    header = {'ids': table.ids}
+    arrays = {name: getattr(table, name) for name in ARRAY_COLUMNS}
+    for name in STRING_COLUMNS:
+        column = getattr(table, name).compact()
+        header[name] = column.values
+        arrays[f"{name}_codes"] = column.codes.astype(np.int32)
+    arrays['header'] = np.frombuffer(json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                                     dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+def decode_table(payload: bytes) -> EventTable:
+    """Reconstruit la table d'un planning stocké (sans passer par les objets PlanningEvent)"""
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        header = json.loads(data['header'].tobytes().decode('utf-8'))
+        columns = {name: StringTable.from_codes(header[name], data[f"{name}_codes"]) for name in STRING_COLUMNS}
+        columns.update({name: data[name] for name in ARRAY_COLUMNS})
+    return EventTable(ids=header['ids'], locations=np.full(len(header['ids']), -1, dtype=np.int64), **columns)
+
+class StoredPlanning:
+    """Planning chargé depuis le stockage"""
+
+    def __init__(self, planning_id: str, table: EventTable, stats: Optional[PlanningStats], created_at: str,
+                 updated_at: str, context: Optional[str] = None):
+        self.planning_id = planning_id
+        self.table = table
+        self.stats = stats
+        self.created_at = created_at
+        self.updated_at = updated_at
+        context = json.loads(context) if context else {}
+        self.locked_ids: Set[str] = set(context.get('locked_ids', ()))
+        self.intervenants: List[Intervenant] = [Intervenant.model_validate(item)
+                                                for item in context.get('intervenants', ())]
+
+class PlanningStore:
+    """Plannings générés conservés côté serveur dans SQLite, référencés par un identifiant"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv('PLANNING_STORE_PATH', '/app/data/plannings.sqlite3')
+        self.retention = timedelta(days=int(os.getenv('PLANNING_STORE_RETENTION_DAYS', '30')))
+        self._initialized = False
+        self._index_lock = threading.Lock()
+        self._indexes: "OrderedDict[str, tuple]" = OrderedDict()  # planning_id -> (updated_at, PlanningIndex)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Une connexion par opération: les routes appellent le stockage depuis le pool de threads
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                # Bases créées avant l'ajout du contexte de re-validation
+                columns = {row[1] for row in connection.execute("PRAGMA table_info(plannings)")}
+                if 'context' not in columns:
+                    connection.execute("ALTER TABLE plannings ADD COLUMN context TEXT")
+            self._initialized = True
+            logger.info(f"🗄️ Stockage des plannings: {self.db_path}")
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def save(self, planning_events: Union[EventTable, List[PlanningEvent]], stats: Optional[PlanningStats] = None,
+             locked_ids: Optional[Iterable[str]] = None, intervenants: Optional[List[Intervenant]] = None) -> str:
+        """Enregistre un planning et retourne son identifiant (avec les visites verrouillées et les contrats des
+        intervenants, repris lors d'une re-validation)"""
+        self.purge_expired()
+        table = EventTable.of(planning_events)
+        planning_id = str(uuid.uuid4())
+        payload = encode_table(table)
+        now = datetime.now().isoformat()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO plannings (planning_id, created_at, updated_at, events_count, format, stats, payload, "
+                "context) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (planning_id, now, now, len(table), PLANNING_FORMAT, self._dump_stats(stats), payload,
+                 encode_context(locked_ids, intervenants))
+            )
+        logger.info(f"💾 Planning {planning_id} enregistré ({len(table)} événements, {len(payload) / 1024:.1f} Ko)")
+        return planning_id
+
+    def load(self, planning_id: str) -> Optional[StoredPlanning]:
+        """Charge un planning (None s'il n'existe pas ou a expiré)"""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT format, stats, payload, created_at, updated_at, context FROM plannings WHERE planning_id = ?",
+                (planning_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        planning_format, stats, payload, created_at, updated_at, context = row
+        if planning_format != PLANNING_FORMAT:
+            raise ValueError(f"Format de planning stocké non supporté: {planning_format}")
+        stats = PlanningStats.model_validate_json(stats) if stats else None
+        return StoredPlanning(planning_id, decode_table(payload), stats, created_at, updated_at, context)
+
+    def update(self, planning_id: str, planning_events: Union[EventTable, List[PlanningEvent]],
+               stats: Optional[PlanningStats] = None) -> Optional[str]:
+        """Remplace le contenu d'un planning (contexte conservé); retourne la date de mise à jour (None si
+        introuvable)"""
+        table = EventTable.of(planning_events)
+        now = datetime.now().isoformat()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "UPDATE plannings SET updated_at = ?, events_count = ?, format = ?, stats = ?, payload = ? "
+                "WHERE planning_id = ?",
+                (now, len(table), PLANNING_FORMAT, self._dump_stats(stats), encode_table(table), planning_id)
+            )
+        self._forget_index(planning_id)
+        return now if cursor.rowcount else None
+
+    def delete(self, planning_id: str) -> bool:
+        """Supprime un planning"""
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute("DELETE FROM plannings WHERE planning_id = ?", (planning_id,))
+        self._forget_index(planning_id)
+        return cursor.rowcount > 0
+
+    def index(self, planning_id: str) -> Optional[PlanningIndex]:
+        """Index de requête d'un planning, reconstruit uniquement si le planning a changé depuis sa mise en cache"""
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT updated_at FROM plannings WHERE planning_id = ?",
+                                     (planning_id,)).fetchone()
+        if row is None:
+            self._forget_index(planning_id)
+            return None
+
+        with self._index_lock:
+            cached = self._indexes.get(planning_id)
+            if cached is not None and cached[0] == row[0]:
+                self._indexes.move_to_end(planning_id)
+                return cached[1]
+
+        stored = self.load(planning_id)
+        if stored is None:
+            return None
+        index = PlanningIndex(stored.table)
+        with self._index_lock:
+            self._indexes[planning_id] = (stored.updated_at, index)
+            self._indexes.move_to_end(planning_id)
+            while len(self._indexes) > PLANNING_INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    def purge_expired(self) -> None:
+        """Supprime les plannings non modifiés depuis plus que la durée de conservation"""
+        limit = (datetime.now() - self.retention).isoformat()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute("DELETE FROM plannings WHERE updated_at < ?", (limit,))
+        if cursor.rowcount:
+            logger.info(f"🧹 {cursor.rowcount} planning(s) expiré(s) supprimé(s)")
+
+    def _forget_index(self, planning_id: str) -> None:
+        with self._index_lock:
+            self._indexes.pop(planning_id, None)
+
+    def _dump_stats(self, stats: Optional[PlanningStats]) -> Optional[str]:
+        return stats.model_dump_json() if stats is not None else None
+
+# Instance globale du stockage des plannings
+planning_store = PlanningStore()
@@ -1,174 +1,215 @@
-from typing import List, Dict, Set
-from datetime import datetime, timedelta
+from typing import Any, List, Dict, Optional, Set, Union
 import logging
-from models import PlanningEvent
+import numpy as np
+from models import Intervenant, PlanningEvent, INTERVENANT_COLORS, NON_PLANIFIABLE_COLOR
+from utils.event_table import EventTable
+from utils.schedule_repair import schedule_repairer
+from utils.travel_matrix import TravelMatrix
 
 logger = logging.getLogger(__name__)
 
 class PlanningValidator:
     """Valide et corrige les conflits dans un planning"""
     
-    def __init__(self):
-        self.color_palette = [
-            "#32a852", "#3b82f6", "#f59e0b", "#8b5cf6", "#ef4444", 
-            "#06b6d4", "#84cc16", "#f97316", "#ec4899", "#6366f1"
-        ]
-    
-    def validate_and_fix_planning(self, planning_events: List[PlanningEvent]) -> List[PlanningEvent]:
-        """Valide le planning et corrige les conflits d'horaires"""
+    def validate_and_fix_planning(self, planning_events: List[PlanningEvent],
+                                  travel_matrix: Optional[TravelMatrix] = None,
+                                  locked_ids: Optional[Set[str]] = None,
+                                  intervenants: Optional[List[Intervenant]] = None) -> List[PlanningEvent]:
+        """Valide le planning, corrige les conflits d'horaires (trajets compris) et contrôle la charge horaire"""
         try:
-            logger.info(f"Validation du planning avec {len(planning_events)} événements")
-            
-            # Étape 1: Supprimer les doublons exacts
-            unique_events = self.remove_duplicates(planning_events)
-            logger.info(f"Après suppression doublons: {len(unique_events)} événements")
-            
-            # Étape 2: Détecter et résoudre les conflits d'horaires
-            validated_events = self.resolve_scheduling_conflicts(unique_events)
-            logger.info(f"Après résolution conflits: {len(validated_events)} événements")
-            
-            # Étape 3: Vérifier et corriger les couleurs
-            final_events = self.fix_intervenant_colors(validated_events)
-            logger.info(f"Planning final validé: {len(final_events)} événements")
-            
-            # Étape 4: Logs de diagnostic
-            self.log_planning_summary(final_events)
-            
-            return final_events
-            
+            table = self.validate_table(EventTable.from_events(planning_events), travel_matrix, locked_ids,
+                                        intervenants)
+            return table.to_events()
+
         except Exception as e:
             logger.error(f"Erreur validation planning: {str(e)}")
             return planning_events  # Retourner le planning original en cas d'erreur
-    
-    def remove_duplicates(self, events: List[PlanningEvent]) -> List[PlanningEvent]:
+
+    def validate_table(self, table: EventTable, travel_matrix: Optional[TravelMatrix] = None,
+                       locked_ids: Optional[Set[str]] = None,
+                       intervenants: Optional[List[Intervenant]] = None) -> EventTable:
+        """Validation complète sur la représentation tabulaire (sans objets PlanningEvent)"""
+        logger.info(f"Validation du planning avec {len(table)} événements")
+
+        # Étape 1: Supprimer les doublons exacts
+        table = self.remove_duplicates(table)
+        logger.info(f"Après suppression doublons: {len(table)} événements")
+
+        # Étape 2: Détecter et résoudre les conflits d'horaires
+        table = self.resolve_scheduling_conflicts(table, travel_matrix, locked_ids, intervenants)
+        logger.info(f"Après résolution conflits: {len(table)} événements")
+
+        # Étape 3: Vérifier que les deux intervenants de chaque binôme sont présents sur le même créneau
+        table = self.check_binomes(table)
+
+        # Étape 4: Vérifier et corriger les couleurs
+        table = self.fix_intervenant_colors(table)
+        logger.info(f"Planning final validé: {len(table)} événements")
+
+        # Étape 5: Logs de diagnostic (heures hebdomadaires et mensuelles contrôlées par calculate_stats)
+        self.log_planning_summary(table)
+
+        return table
+
+    def remove_duplicates(self, table: EventTable) -> EventTable:
         """Supprime les doublons exacts"""
-        seen_clients = set()
-        unique_events = []
-        
-        for event in events:
-            # Critères de doublon: même client + même horaire de début
-            key = f"{event.client}_{event.start}"
-            if key not in seen_clients:
-                seen_clients.add(key)
-                unique_events.append(event)
-            else:
-                logger.warning(f"Doublon supprimé: {event.client} à {event.start}")
-        
-        return unique_events
-    
-    def resolve_scheduling_conflicts(self, events: List[PlanningEvent]) -> List[PlanningEvent]:
-        """Résout les conflits d'horaires pour chaque intervenant"""
-        # Grouper par intervenant
-        by_intervenant = {}
-        for event in events:
-            if event.intervenant not in by_intervenant:
-                by_intervenant[event.intervenant] = []
-            by_intervenant[event.intervenant].append(event)
-        
-        validated_events = []
-        
-        for intervenant, intervenant_events in by_intervenant.items():
-            if intervenant == "Non assigné" or not intervenant:
-                # Pas de validation pour les non assignés
-                validated_events.extend(intervenant_events)
-                continue
-            
-            # Trier par heure de début
-            sorted_events = sorted(intervenant_events, key=lambda x: x.start)
-            
-            # Valider et ajuster les horaires
-            conflict_free_events = self.fix_intervenant_schedule(intervenant, sorted_events)
-            validated_events.extend(conflict_free_events)
-        
-        return validated_events
-    
-    def fix_intervenant_schedule(self, intervenant: str, events: List[PlanningEvent]) -> List[PlanningEvent]:
-        """Corrige les conflits d'horaires pour un intervenant spécifique"""
-        if not events:
+        # Critères de doublon: même client + même horaire de début (par intervenant pour un binôme)
+        per_intervenant = np.where(table.binomes.codes != table.binomes.code_of(None), table.intervenants.codes, -1)
+        keys = np.stack([table.clients.codes, table.start_labels.codes, per_intervenant], axis=1)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        if len(first) == len(table):
+            return table
+
+        kept = np.zeros(len(table), dtype=bool)
+        kept[first] = True
+        for row in np.flatnonzero(~kept):
+            logger.warning(f"Doublon supprimé: {table.clients[row]} à {table.start_labels[row]}")
+        return table.take(np.flatnonzero(kept))
+
+    def detect_conflicts(self, events: Union[EventTable, List[PlanningEvent]],
+                         travel_matrix: Optional[TravelMatrix] = None) -> List[Dict[str, Any]]:
+        """Détecte en une passe tous les enchaînements impossibles (fin + trajet > début suivant)"""
+        table = EventTable.of(events)
+        timeline = self._build_timeline(table, travel_matrix)
+        if timeline is None:
             return []
+        return self._sweep_conflicts(table, timeline)
+
+    def _sweep_conflicts(self, table: EventTable, timeline) -> List[Dict[str, Any]]:
+        """Balayage des intervalles triés d'une chronologie construite par _build_timeline"""
+        positions, codes, names, starts, ends, locations, travel, _ = timeline
+
+        # Balayage vectorisé: chaque événement comparé à son prédécesseur chez le même intervenant
+        same_intervenant = codes[1:] == codes[:-1]
+        required_start = ends[:-1] + travel
+        violations = np.flatnonzero(same_intervenant & (required_start > starts[1:]))
+
+        conflicts = []
+        for k in violations:
+            previous, current = positions[k], positions[k + 1]
+            conflicts.append({
+                "intervenant": names[codes[k]],
+                "previous_client": table.clients[previous],
+                "current_client": table.clients[current],
+                "previous_end": table.end_labels[previous],
+                "current_start": table.start_labels[current],
+                "travel_minutes": int(travel[k]),
+                "missing_minutes": int(required_start[k] - starts[k + 1])
+            })
+        return conflicts
+
+    def resolve_scheduling_conflicts(self, table: EventTable, travel_matrix: Optional[TravelMatrix] = None,
+                                     locked_ids: Optional[Set[str]] = None,
+                                     intervenants: Optional[List[Intervenant]] = None) -> EventTable:
+        """Résout les conflits d'horaires (trajets compris) sans réattribuer les événements verrouillés"""
+        timeline = self._build_timeline(table, travel_matrix)
+        conflicts = self._sweep_conflicts(table, timeline) if timeline is not None else []
+        if not conflicts:
+            logger.info("Aucun conflit d'horaire détecté")
+            return table
+
+        logger.warning(f"{len(conflicts)} conflits d'horaires détectés")
+        for conflict in conflicts:
+            logger.warning(f"Conflit détecté pour {conflict['intervenant']}: {conflict['previous_client']} se termine à "
+                           f"{conflict['previous_end']}, {conflict['current_client']} commence à {conflict['current_start']} "
+                           f"(trajet {conflict['travel_minutes']} min, manque {conflict['missing_minutes']} min)")
+
+        # Réparation par mouvements locaux, limitée aux intervenants en conflit
+        positions, codes, names, starts, ends, locations, _, matrix = timeline
+        conflicting = {conflict["intervenant"] for conflict in conflicts}
+        summary = schedule_repairer.repair(table, names, codes, positions, starts, ends, locations, matrix,
+                                           conflicting, locked_ids, intervenants)
+        logger.info(f"Réparation: {summary['shifted']} décalées (tolérance), {summary['swapped']} inversées, "
+                    f"{summary['reassigned']} réattribuées, {summary['flagged']} non planifiables")
+
+        return table
+
+    def check_binomes(self, table: EventTable) -> EventTable:
+        """Marque non planifiables les binômes incomplets ou dont les deux événements ne sont pas alignés"""
+        in_binome = table.binomes.codes != table.binomes.code_of(None)
+        pairs: Dict[int, List[int]] = {}
+        for row in np.flatnonzero(in_binome & ~table.non_planifiable).tolist():
+            pairs.setdefault(int(table.binomes.codes[row]), []).append(row)
         
-        validated = [events[0]]  # Premier événement toujours valide
-        
-        for i in range(1, len(events)):
-            current = events[i]
-            previous = validated[-1]
+        invalid = 0
+        for planned in pairs.values():
+            first = planned[0]
+            raison = None
+            if len(planned) != 2:
+                raison = f"Binôme incomplet: {len(planned)} intervenant(s) au lieu de 2"
+            elif table.intervenants.codes[first] == table.intervenants.codes[planned[1]]:
+                raison = "Binôme incomplet: même intervenant sur les deux postes"
+            elif (table.start_labels.codes[first], table.end_labels.codes[first]) != \
+                    (table.start_labels.codes[planned[1]], table.end_labels.codes[planned[1]]):
+                raison = "Binôme désaligné: les deux intervenants ne sont pas présents sur le même créneau"
             
-            # Convertir en datetime pour comparaison
-            try:
-                prev_end = datetime.fromisoformat(previous.end.replace('Z', ''))
-                curr_start = datetime.fromisoformat(current.start.replace('Z', ''))
-                curr_end = datetime.fromisoformat(current.end.replace('Z', ''))
-                
-                # Vérifier le conflit
-                if curr_start < prev_end:
-                    logger.warning(f"Conflit détecté pour {intervenant}: {previous.client} se termine à {previous.end}, {current.client} commence à {current.start}")
-                    
-                    # Ajuster l'horaire de début (15 min après la fin de la précédente)
-                    new_start = prev_end + timedelta(minutes=15)
-                    duration = curr_end - curr_start
-                    new_end = new_start + duration
-                    
-                    # Vérifier que c'est dans les heures de travail (07h-22h)
-                    if new_end.hour >= 22:
-                        # Marquer comme non planifiable si dépasse 22h
-                        logger.warning(f"Intervention {current.client} marquée non planifiable: dépasserait 22h")
-                        current.non_planifiable = True
-                        current.color = "#ff6b6b"
-                    else:
-                        # Ajuster les horaires
-                        current.start = new_start.isoformat()
-                        current.end = new_end.isoformat()
-                        current.trajet_precedent = "15 min"
-                        logger.info(f"Horaire ajusté pour {current.client}: {current.start} - {current.end}")
-                
-                validated.append(current)
-                
-            except Exception as e:
-                logger.error(f"Erreur traitement horaires pour {intervenant}: {str(e)}")
-                # Garder l'événement original en cas d'erreur
-                validated.append(current)
+            if raison:
+                invalid += 1
+                logger.warning(f"Binôme {table.clients[first]} ({table.start_labels[first]}) invalide: {raison}")
+                for row in planned:
+                    table.flag(row, raison, NON_PLANIFIABLE_COLOR)
         
-        return validated
+        binome_count = len(np.unique(table.binomes.codes[in_binome]))
+        logger.info(f"Binômes vérifiés: {binome_count} binômes, {invalid} invalides")
+        return table
     
-    def fix_intervenant_colors(self, events: List[PlanningEvent]) -> List[PlanningEvent]:
+    def _build_timeline(self, table: EventTable, travel_matrix: Optional[TravelMatrix]):
+        """Sélectionne les événements planifiés, triés par (intervenant, début)"""
+        for row in np.flatnonzero(~table.non_planifiable & table.assigned & ~table.valid):
+            logger.error(f"Erreur traitement horaires pour {table.intervenants[row]}: "
+                         f"{table.start_labels[row]} - {table.end_labels[row]}")
+        positions = np.flatnonzero(table.planned)
+        if not len(positions):
+            return None
+
+        matrix = travel_matrix if travel_matrix is not None else TravelMatrix(table.coordinates(positions))
+        table.locate(matrix)
+
+        codes, starts, ends = table.intervenants.codes[positions], table.starts[positions], table.ends[positions]
+        order = np.lexsort((starts, codes))
+        positions, codes, starts, ends = positions[order], codes[order], starts[order], ends[order]
+        locations = table.locations[positions]
+
+        # Trajets entre événements consécutifs (coordonnée inconnue de la matrice: trajet par défaut)
+        origin, destination = locations[:-1], locations[1:]
+        travel = np.full(len(origin), matrix.default_minutes, dtype=np.int64)
+        known = (origin >= 0) & (destination >= 0)
+        travel[known] = matrix.minutes[origin[known], destination[known]]
+
+        return positions, codes, table.intervenants.values, starts, ends, locations, travel, matrix
+    
+    def fix_intervenant_colors(self, table: EventTable) -> EventTable:
         """Assure une couleur unique par intervenant"""
-        intervenant_colors = {}
-        color_index = 0
-        
-        for event in events:
-            if event.non_planifiable:
-                event.color = "#ff6b6b"  # Rouge pour non planifiable
-            elif event.intervenant not in intervenant_colors:
-                intervenant_colors[event.intervenant] = self.color_palette[color_index % len(self.color_palette)]
-                color_index += 1
-            
-            if not event.non_planifiable:
-                event.color = intervenant_colors[event.intervenant]
-        
+        planned = ~table.non_planifiable
+        codes = table.intervenants.codes
+
+        # Couleurs attribuées dans l'ordre de première apparition des intervenants planifiés
+        present, first = np.unique(codes[planned], return_index=True)
+        ordered = present[np.argsort(first)]
+        palette = np.array([table.colors.intern(color) for color in INTERVENANT_COLORS], dtype=np.int64)
+        color_of = np.zeros(len(table.intervenants.values), dtype=np.int64)
+        color_of[ordered] = palette[np.arange(len(ordered)) % len(palette)]
+
+        table.colors.codes = np.where(planned, color_of[codes], table.colors.intern(NON_PLANIFIABLE_COLOR))
+
+        intervenant_colors = {table.intervenants.values[code]: table.colors.values[color_of[code]] for code in ordered}
         logger.info(f"Couleurs assignées: {intervenant_colors}")
-        return events
+        return table
     
-    def log_planning_summary(self, events: List[PlanningEvent]) -> None:
+    def log_planning_summary(self, table: EventTable) -> None:
         """Log un résumé du planning pour diagnostic"""
         try:
-            by_intervenant = {}
-            non_planifiable_count = 0
-            
-            for event in events:
-                if event.non_planifiable:
-                    non_planifiable_count += 1
-                else:
-                    if event.intervenant not in by_intervenant:
-                        by_intervenant[event.intervenant] = 0
-                    by_intervenant[event.intervenant] += 1
+            planned = ~table.non_planifiable
+            counts = np.bincount(table.intervenants.codes[planned], minlength=len(table.intervenants.values))
+            non_planifiable_count = int((~planned).sum())
             
             logger.info("=== RÉSUMÉ DU PLANNING ===")
-            logger.info(f"Total interventions: {len(events)}")
-            logger.info(f"Interventions planifiées: {len(events) - non_planifiable_count}")
+            logger.info(f"Total interventions: {len(table)}")
+            logger.info(f"Interventions planifiées: {len(table) - non_planifiable_count}")
             logger.info(f"Interventions non planifiables: {non_planifiable_count}")
             
-            for intervenant, count in by_intervenant.items():
-                logger.info(f"  - {intervenant}: {count} interventions")
+            for code in np.flatnonzero(counts):
+                logger.info(f"  - {table.intervenants.values[code]}: {counts[code]} interventions")
             
             logger.info("=========================")
             
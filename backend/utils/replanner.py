@@ -0,0 +1,341 @@
+import bisect
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models import Intervention, Intervenant, PlanningEvent, PlanningDelta, INTERVENANT_COLORS, NON_PLANIFIABLE_COLOR
+from utils.route_optimizer import route_optimizer
+from utils.time_utils import (
+    minutes_to_iso, day_of, parse_plage_horaire, within_plage, ends_before_day_end,
+    MINUTES_PER_DAY, START_TOLERANCE_MINUTES, MAX_DAILY_MINUTES
+)
+from utils.stable_ids import derived_id, unique_id
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingVisit:
+    """Visite à (re)placer dans le planning"""
+    __slots__ = ('client', 'start', 'end', 'latitude', 'longitude', 'impose', 'event_id', 'binome_id')
+
+    def __init__(self, client: str, start: int, end: int, latitude: float, longitude: float,
+                 impose: str = "", event_id: Optional[str] = None, binome_id: Optional[str] = None):
+        self.client = client
+        self.start = start
+        self.end = end
+        self.latitude = latitude
+        self.longitude = longitude
+        self.impose = impose
+        self.event_id = event_id
+        self.binome_id = binome_id  # Poste de binôme: aligné sur l'autre intervenant du même binome_id
+
+    @classmethod
+    def from_intervention(cls, intervention: Intervention, event_id: Optional[str] = None) -> '_PendingVisit':
+        if intervention.end_minutes is None:
+            raise ValueError(f"Date ou durée illisible: '{intervention.date}', '{intervention.duree}'")
+        return cls(
+            client=intervention.client,
+            start=intervention.start_minutes,
+            end=intervention.end_minutes,
+            latitude=intervention.latitude,
+            longitude=intervention.longitude,
+            impose=intervention.intervenant or "",
+            event_id=event_id or intervention.id
+        )
+
+    @classmethod
+    def from_event(cls, event: PlanningEvent, impose: str = "") -> '_PendingVisit':
+        return cls(
+            client=event.client,
+            start=event.start_minutes,
+            end=event.end_minutes,
+            latitude=event.latitude,
+            longitude=event.longitude,
+            impose=impose,
+            event_id=event.id,
+            binome_id=event.binome_id
+        )
+
+    def second_leg(self, event_id: str) -> '_PendingVisit':
+        """Second poste d'un binôme (même visite, autre intervenant)"""
+        return _PendingVisit(self.client, self.start, self.end, self.latitude, self.longitude,
+                             event_id=event_id, binome_id=self.binome_id)
+
+class Replanner:
+    """Re-planification incrémentale: seules les journées intervenant impactées par un delta sont recalculées"""
+
+    def replan(self, planning: List[PlanningEvent], delta: PlanningDelta, intervenants: List[Intervenant],
+               interventions: Optional[List[Intervention]] = None) -> Tuple[List[PlanningEvent], Dict[str, Any]]:
+        """Applique un delta à un planning existant et retourne le planning mis à jour avec un résumé
+
+        Les interventions d'origine (facultatives) indiquent les intervenants imposés des visites déjà planifiées.
+        """
+        start_time = time.time()
+        logger.info(f"🔁 === RE-PLANIFICATION INCRÉMENTALE ({len(planning)} événements) ===")
+
+        unavailable = set(delta.unavailable_intervenants)
+        affected: Set[Tuple[str, int]] = set()
+        pending: List[_PendingVisit] = []
+
+        kept: Dict[str, PlanningEvent] = {event.id: event for event in planning}
+        imposed = {intervention.id: intervention.intervenant for intervention in interventions or []
+                   if intervention.intervenant}
+
+        # 1. Retraits
+        for event_id in delta.removed:
+            event = kept.pop(event_id, None)
+            if event is None:
+                logger.warning(f"⚠️ Événement à retirer introuvable: {event_id}")
+                continue
+            affected.add((event.intervenant, day_of(event.start_minutes)))
+
+        # 2. Modifications: l'ancien créneau est libéré, la nouvelle version est replacée
+        for modification in delta.modified:
+            event = kept.pop(modification.event_id, None)
+            if event is None:
+                logger.warning(f"⚠️ Événement modifié introuvable: {modification.event_id}")
+            else:
+                affected.add((event.intervenant, day_of(event.start_minutes)))
+            visit = _PendingVisit.from_intervention(modification.intervention, modification.event_id)
+            pending.append(visit)
+            # Les autres postes de l'ancien binôme sont retirés, puis replacés si la visite reste en binôme
+            partner_ids = []
+            if event is not None and event.binome_id:
+                partner_ids = [eid for eid, other in kept.items() if other.binome_id == event.binome_id]
+            for partner_id in partner_ids:
+                partner = kept.pop(partner_id)
+                affected.add((partner.intervenant, day_of(partner.start_minutes)))
+            if modification.intervention.binome:
+                visit.binome_id = (event.binome_id if event is not None and event.binome_id
+                                   else derived_id(visit.event_id, "binome"))
+                pending.append(visit.second_leg(partner_ids[0] if partner_ids
+                                                else derived_id(visit.event_id, "binome", "second")))
+
+        # 3. Intervenants indisponibles: leurs visites sont à réattribuer
+        if unavailable:
+            for event_id in [eid for eid, event in kept.items()
+                             if event.intervenant in unavailable and not event.non_planifiable]:
+                event = kept.pop(event_id)
+                affected.add((event.intervenant, day_of(event.start_minutes)))
+                pending.append(_PendingVisit.from_event(event, imposed.get(event.id, "")))
+
+        # 4. Ajouts
+        for intervention in delta.added:
+            visit = _PendingVisit.from_intervention(intervention)
+            pending.append(visit)
+            if intervention.binome:
+                visit.binome_id = derived_id(visit.event_id, "binome")
+                pending.append(visit.second_leg(derived_id(visit.event_id, "binome", "second")))
+
+        # Candidats, domiciles et plages horaires
+        homes = {i.nom_prenom: (i.latitude, i.longitude) for i in intervenants}
+        windows = {i.nom_prenom: parse_plage_horaire(i.plage_horaire_autorisee) for i in intervenants}
+        candidates = [i.nom_prenom for i in intervenants] if intervenants else sorted(
+            {event.intervenant for event in planning if event.intervenant and event.intervenant != "Non assigné"}
+        )
+        candidates = [name for name in candidates if name not in unavailable]
+
+        # Chronologies uniquement pour les jours concernés
+        pending_days = {day_of(visit.start) for visit in pending}
+        timelines: Dict[Tuple[str, int], List[Tuple[int, int, str]]] = {}
+        for event in kept.values():
+            if event.non_planifiable or not event.intervenant:
+                continue
+            day = day_of(event.start_minutes)
+            if day in pending_days or (event.intervenant, day) in affected:
+                timelines.setdefault((event.intervenant, day), []).append(
+                    (event.start_minutes, event.end_minutes, event.id)
+                )
+        for timeline in timelines.values():
+            timeline.sort()
+
+        # Matrice réduite aux coordonnées utiles
+        coordinates = [(v.latitude, v.longitude) for v in pending]
+        coordinates += [(e.latitude, e.longitude) for e in kept.values()
+                        if (e.intervenant, day_of(e.start_minutes)) in timelines]
+        coordinates += [homes[name] for name in candidates if name in homes]
+        matrix = TravelMatrix(coordinates)
+
+        colors = self._existing_colors(planning)
+
+        # Postes de binôme planifiés, par binome_id
+        binome_legs: Dict[str, List[str]] = {}
+        for event in kept.values():
+            if event.binome_id and not event.non_planifiable:
+                binome_legs.setdefault(event.binome_id, []).append(event.id)
+
+        # 5. Placement glouton par ordre chronologique
+        placed_count = 0
+        unplaced_count = 0
+        for visit in sorted(pending, key=lambda v: (v.start, v.client)):
+            visit_candidates = candidates
+            if visit.impose:
+                visit_candidates = [visit.impose] if visit.impose not in unavailable else []
+
+            # Binôme: même horaire exact que l'autre poste déjà planifié, sur un autre intervenant
+            partners = [kept[eid] for eid in binome_legs.get(visit.binome_id, ())] if visit.binome_id else []
+            if partners:
+                visit.start, visit.end = partners[0].start_minutes, partners[0].end_minutes
+                taken = {partner.intervenant for partner in partners}
+                visit_candidates = [name for name in visit_candidates if name not in taken]
+            day = day_of(visit.start)
+
+            best = None
+            for name in visit_candidates:
+                option = self._best_insertion(visit, timelines.get((name, day), []), kept, matrix, homes.get(name),
+                                              windows.get(name), aligned=bool(partners))
+                if option is not None and (best is None or (option[0], name) < (best[0], best[2])):
+                    best = (option[0], option[1], name)
+
+            if best is None:
+                if visit.impose and visit.impose in unavailable:
+                    raison = "Intervenant imposé indisponible"
+                elif partners:
+                    raison = "Binôme incomplet: aucun second intervenant disponible sur le créneau"
+                else:
+                    raison = "Aucun intervenant disponible sans conflit horaire"
+                event = PlanningEvent(
+                    client=visit.client,
+                    intervenant=visit.impose or "Non assigné",
+                    start=minutes_to_iso(visit.start),
+                    end=minutes_to_iso(visit.end),
+                    color=NON_PLANIFIABLE_COLOR,
+                    non_planifiable=True,
+                    latitude=visit.latitude,
+                    longitude=visit.longitude,
+                    raison=raison,
+                    binome_id=visit.binome_id
+                )
+                event.id = unique_id(visit.event_id, kept)
+                kept[event.id] = event
+                unplaced_count += 1
+                logger.warning(f"   ⚠️ {visit.client} non planifiable: {raison}")
+                continue
+
+            _, new_start, name = best
+            duration = visit.end - visit.start
+            event = PlanningEvent(
+                client=visit.client,
+                intervenant=name,
+                start=minutes_to_iso(new_start),
+                end=minutes_to_iso(new_start + duration),
+                color=self._color_for(name, colors),
+                latitude=visit.latitude,
+                longitude=visit.longitude,
+                binome_id=visit.binome_id
+            )
+            # Identifiant conservé (modification, réattribution) ou repris de l'intervention ajoutée
+            event.id = unique_id(visit.event_id, kept)
+            kept[event.id] = event
+            if visit.binome_id:
+                binome_legs.setdefault(visit.binome_id, []).append(event.id)
+            bisect.insort(timelines.setdefault((name, day), []), (new_start, new_start + duration, event.id))
+            affected.add((name, day))
+            placed_count += 1
+
+        # 6. Mise à jour des temps de trajet sur les seules journées impactées
+        for key in affected:
+            self._refresh_trajets(timelines.get(key, []), kept, matrix)
+
+        # 7. Optimisation des tournées limitée aux journées impactées (visites imposées et binômes fixes)
+        _, optimization = route_optimizer.optimize(list(kept.values()), interventions or [], intervenants,
+                                                   scope=affected)
+
+        # Conserver l'ordre d'origine, les nouveaux événements en fin de liste
+        original_ids = [event.id for event in planning]
+        result = [kept[eid] for eid in original_ids if eid in kept]
+        seen = set(original_ids)
+        result.extend(event for eid, event in kept.items() if eid not in seen)
+
+        duration = time.time() - start_time
+        summary = {
+            "affected_days": len(affected),
+            "placed": placed_count,
+            "unplaced": unplaced_count,
+            "removed": len(planning) - len([eid for eid in original_ids if eid in kept]),
+            "optimization_moves": optimization["moves"],
+            "duration_ms": round(duration * 1000, 1)
+        }
+        logger.info(f"✅ Re-planification terminée en {duration * 1000:.1f}ms: "
+                    f"{placed_count} placées, {unplaced_count} non planifiables, {len(affected)} journées impactées")
+        return result, summary
+
+    def _best_insertion(self, visit: _PendingVisit, timeline: List[Tuple[int, int, str]],
+                        events: Dict[str, PlanningEvent], matrix: TravelMatrix,
+                        home: Optional[Tuple[float, float]], window: Optional[Tuple[int, int]] = None,
+                        aligned: bool = False) -> Optional[Tuple[int, int]]:
+        """Retourne (surcoût de trajet, heure de début) de la meilleure insertion, ou None si impossible
+
+        aligned: l'horaire est celui de l'autre poste du binôme, aucun décalage n'est toléré.
+        """
+        duration = visit.end - visit.start
+        if sum(end - start for start, end, _ in timeline) + duration > MAX_DAILY_MINUTES:
+            return None
+        position = bisect.bisect_left(timeline, (visit.start,))
+        visit_idx = matrix.index_of(visit.latitude, visit.longitude)
+
+        prev_entry = timeline[position - 1] if position > 0 else None
+        next_entry = timeline[position] if position < len(timeline) else None
+
+        prev_idx = matrix.index_of(*home) if (prev_entry is None and home) else -1
+        if prev_entry is not None:
+            prev_event = events[prev_entry[2]]
+            prev_idx = matrix.index_of(prev_event.latitude, prev_event.longitude)
+
+        travel_in = matrix.between(prev_idx, visit_idx) if (prev_entry is not None or home) else 0
+        earliest = visit.start if prev_entry is None else max(visit.start, prev_entry[1] + travel_in)
+        if earliest > visit.start + (0 if aligned else START_TOLERANCE_MINUTES):
+            return None
+        if not within_plage(earliest, duration, window) or not ends_before_day_end(earliest + duration,
+                                                                                  day_of(earliest)):
+            return None
+        # Première visite: joignable depuis le domicile en partant au début de la plage horaire
+        if prev_entry is None and window and home \
+                and window[0] + travel_in > earliest % MINUTES_PER_DAY + START_TOLERANCE_MINUTES:
+            return None
+
+        travel_out = 0
+        travel_skipped = 0
+        if next_entry is not None:
+            next_event = events[next_entry[2]]
+            next_idx = matrix.index_of(next_event.latitude, next_event.longitude)
+            travel_out = matrix.between(visit_idx, next_idx)
+            if earliest + duration + travel_out > next_entry[0]:
+                return None
+            if prev_entry is not None or home:
+                travel_skipped = matrix.between(prev_idx, next_idx)
+
+        return travel_in + travel_out - travel_skipped, earliest
+
+    def _refresh_trajets(self, timeline: List[Tuple[int, int, str]], events: Dict[str, PlanningEvent],
+                         matrix: TravelMatrix) -> None:
+        """Recalcule le trajet depuis l'intervention précédente sur une journée"""
+        previous = None
+        for _, _, event_id in timeline:
+            event = events.get(event_id)
+            if event is None:
+                continue
+            if previous is None:
+                event.trajet_precedent = "0 min"
+            else:
+                minutes = matrix.travel(previous.latitude, previous.longitude, event.latitude, event.longitude)
+                event.trajet_precedent = f"{minutes} min"
+            previous = event
+
+    def _existing_colors(self, planning: List[PlanningEvent]) -> Dict[str, str]:
+        """Reprend la couleur déjà attribuée à chaque intervenant"""
+        colors = {}
+        for event in planning:
+            if not event.non_planifiable and event.intervenant and event.intervenant not in colors:
+                colors[event.intervenant] = event.color
+        return colors
+
+    def _color_for(self, name: str, colors: Dict[str, str]) -> str:
+        """Couleur de l'intervenant, ou prochaine couleur libre de la palette"""
+        if name not in colors:
+            colors[name] = INTERVENANT_COLORS[len(colors) % len(INTERVENANT_COLORS)]
+        return colors[name]
+
+# Instance globale du service de re-planification
+replanner = Replanner()
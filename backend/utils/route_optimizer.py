@@ -0,0 +1,338 @@
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from models import Intervention, Intervenant, PlanningEvent
+from utils.time_utils import (
+    minutes_to_iso, day_of, parse_plage_horaire, ends_before_day_end,
+    MINUTES_PER_DAY, START_TOLERANCE_MINUTES, MAX_DAILY_MINUTES
+)
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+MAX_SEGMENT_LENGTH = 3  # Longueur maximale des segments déplacés par or-opt
+
+class _TourSearch:
+    """État de la recherche locale pour un planning (matrice, visites, tournées)"""
+
+    def __init__(self, matrix: TravelMatrix, planned: np.ndarray, duration: np.ndarray, loc: np.ndarray,
+                 locked: np.ndarray, windows: Dict[str, Optional[Tuple[int, int]]], home_idx: Dict[str, int],
+                 pinned: Optional[np.ndarray] = None):
+        self.matrix = matrix
+        self.planned = planned
+        self.duration = duration
+        self.loc = loc
+        self.locked = locked
+        self.minute_of_day = planned % MINUTES_PER_DAY
+        self.windows = windows
+        self.home_idx = home_idx
+        # Postes de binôme: horaire fixe, aligné sur l'autre intervenant
+        self.pinned = pinned if pinned is not None else np.zeros(len(planned), dtype=bool)
+
+    def schedule(self, name: str, tour: List[int]) -> Optional[List[int]]:
+        """Calcule les heures de début effectives d'une tournée, None si la tolérance, la fin de journée (22h)
+        ou le maximum journalier (13h) sont dépassés"""
+        if int(self.duration[tour].sum()) > MAX_DAILY_MINUTES:
+            return None
+        starts = []
+        previous_end = None
+        previous_loc = None
+        for idx in tour:
+            start = int(self.planned[idx])
+            if previous_end is not None:
+                start = max(start, previous_end + self.matrix.between(previous_loc, int(self.loc[idx])))
+                if start > self.planned[idx] + (0 if self.pinned[idx] else START_TOLERANCE_MINUTES):
+                    return None
+            starts.append(start)
+            previous_end = start + int(self.duration[idx])
+            previous_loc = int(self.loc[idx])
+        if previous_end is not None and not ends_before_day_end(previous_end, day_of(self.planned[tour[0]])):
+            return None
+        return starts
+
+    def allowed(self, name: str, visits: List[int]) -> bool:
+        """Vérifie la plage horaire autorisée de l'intervenant"""
+        window = self.windows.get(name)
+        if not window:
+            return True
+        for idx in visits:
+            start = int(self.minute_of_day[idx])
+            if start < window[0] or start + int(self.duration[idx]) > window[1]:
+                return False
+        return True
+
+    def tour_cost(self, name: str, tour: List[int]) -> int:
+        """Temps de trajet total d'une tournée (domicile → visites → domicile)"""
+        if not tour:
+            return 0
+        sequence = self.loc[tour]
+        home = self.home_idx.get(name, -1)
+        if home >= 0 and np.all(sequence >= 0):
+            sequence = np.concatenate(([home], sequence, [home]))
+        if len(sequence) < 2:
+            return 0
+        if np.any(sequence < 0):
+            return int(sum(self.matrix.between(int(a), int(b)) for a, b in zip(sequence[:-1], sequence[1:])))
+        return int(self.matrix.minutes[sequence[:-1], sequence[1:]].sum())
+
+    def merge(self, tour: List[int], visits: List[int]) -> List[int]:
+        """Insère des visites dans une tournée en respectant l'ordre chronologique"""
+        return sorted(tour + visits, key=lambda idx: (self.planned[idx], idx))
+
+    def accept(self, tours, key_a, new_a, key_b, new_b) -> bool:
+        """Applique le mouvement s'il est réalisable et réduit le temps de trajet"""
+        name_a, name_b = key_a[0], key_b[0]
+        delta = (self.tour_cost(name_a, new_a) + self.tour_cost(name_b, new_b)
+                 - self.tour_cost(name_a, tours[key_a]) - self.tour_cost(name_b, tours[key_b]))
+        if delta >= 0:
+            return False
+        if self.schedule(name_a, new_a) is None or self.schedule(name_b, new_b) is None:
+            return False
+        tours[key_a] = new_a
+        tours[key_b] = new_b
+        return True
+
+    def try_or_opt(self, tours, names, day, deadline) -> List[Tuple[str, int]]:
+        """Déplace un segment de 1 à 3 visites consécutives vers une autre tournée (relocate / or-opt)"""
+        changed = []
+        for name_a in names:
+            key_a = (name_a, day)
+            length = 1
+            while length <= MAX_SEGMENT_LENGTH and time.time() < deadline:
+                tour_a = tours[key_a]
+                moved = False
+                for i in range(len(tour_a) - length + 1):
+                    segment = tour_a[i:i + length]
+                    if self.locked[segment].any():
+                        continue
+                    rest = tour_a[:i] + tour_a[i + length:]
+                    for name_b in names:
+                        key_b = (name_b, day)
+                        if name_b == name_a or not self.allowed(name_b, segment):
+                            continue
+                        if self.accept(tours, key_a, rest, key_b, self.merge(tours[key_b], segment)):
+                            changed += [key_a, key_b]
+                            moved = True
+                            break
+                    if moved:
+                        break
+                if not moved:
+                    length += 1
+        return changed
+
+    def try_swap(self, tours, names, day, deadline) -> List[Tuple[str, int]]:
+        """Échange deux visites entre deux tournées"""
+        changed = []
+        for a_pos, name_a in enumerate(names):
+            for name_b in names[a_pos + 1:]:
+                if time.time() >= deadline:
+                    return changed
+                key_a, key_b = (name_a, day), (name_b, day)
+                swapped = True
+                while swapped:
+                    swapped = False
+                    for va in tours[key_a]:
+                        if self.locked[va] or not self.allowed(name_b, [va]):
+                            continue
+                        for vb in tours[key_b]:
+                            if self.locked[vb] or not self.allowed(name_a, [vb]):
+                                continue
+                            new_a = self.merge([v for v in tours[key_a] if v != va], [vb])
+                            new_b = self.merge([v for v in tours[key_b] if v != vb], [va])
+                            if self.accept(tours, key_a, new_a, key_b, new_b):
+                                changed += [key_a, key_b]
+                                swapped = True
+                                break
+                        if swapped:
+                            break
+        return changed
+
+    def try_two_opt_star(self, tours, names, day, deadline) -> List[Tuple[str, int]]:
+        """Échange les fins de tournée de deux intervenants à partir d'une même heure de coupure (2-opt*)"""
+        changed = []
+        for a_pos, name_a in enumerate(names):
+            for name_b in names[a_pos + 1:]:
+                if time.time() >= deadline:
+                    return changed
+                key_a, key_b = (name_a, day), (name_b, day)
+                cuts = sorted({int(self.planned[v]) for v in tours[key_a] + tours[key_b]})
+                for cut in cuts[1:]:
+                    head_a = [v for v in tours[key_a] if self.planned[v] < cut]
+                    tail_a = [v for v in tours[key_a] if self.planned[v] >= cut]
+                    head_b = [v for v in tours[key_b] if self.planned[v] < cut]
+                    tail_b = [v for v in tours[key_b] if self.planned[v] >= cut]
+                    if not tail_a and not tail_b:
+                        continue
+                    if self.locked[tail_a + tail_b].any():
+                        continue
+                    if not self.allowed(name_a, tail_b) or not self.allowed(name_b, tail_a):
+                        continue
+                    if self.accept(tours, key_a, head_a + tail_b, key_b, head_b + tail_a):
+                        changed += [key_a, key_b]
+                        break
+        return changed
+
+class RouteOptimizer:
+    """Recherche locale sur les tournées générées (or-opt, échange, 2-opt* entre tournées d'une même journée)
+
+    Les heures de début étant imposées (à la tolérance près), l'ordre d'une tournée est fixé par
+    l'horaire: les mouvements portent donc sur la répartition des visites entre intervenants.
+    Les visites à intervenant imposé et les binômes ne sont jamais déplacés.
+    """
+
+    def __init__(self):
+        self.time_budget_seconds = float(os.getenv('ROUTE_OPTIMIZER_TIME_BUDGET', '2.0'))
+
+    def optimize(self, planning_events: List[PlanningEvent], interventions: List[Intervention],
+                 intervenants: List[Intervenant], travel_times: Optional[Dict[str, Dict[str, int]]] = None,
+                 scope: Optional[Set[Tuple[str, int]]] = None) -> Tuple[List[PlanningEvent], Dict[str, Any]]:
+        """Améliore les tournées et retourne le planning avec un résumé (minutes de trajet économisées)
+
+        scope restreint la recherche à certaines journées (intervenant, jour): les autres restent inchangées.
+        """
+        start_time = time.time()
+        summary = {"initial_travel": 0, "final_travel": 0, "saved_minutes": 0, "moves": 0, "duration_ms": 0.0}
+
+        try:
+            candidates, current_start, current_end = [], [], []
+            for event in planning_events:
+                if event.non_planifiable or not event.intervenant or event.intervenant == "Non assigné":
+                    continue
+                try:
+                    start, end = event.start_minutes, event.end_minutes
+                except ValueError:
+                    # Horaire illisible: la visite reste telle quelle, les autres sont optimisées
+                    logger.warning(f"Visite ignorée par l'optimisation (horaire illisible): {event.client}")
+                    continue
+                if scope is not None and (event.intervenant, day_of(start)) not in scope:
+                    continue
+                candidates.append(event)
+                current_start.append(start)
+                current_end.append(end)
+            if len(candidates) < 2:
+                return planning_events, summary
+
+            homes = {i.nom_prenom: (i.latitude, i.longitude) for i in intervenants}
+            windows = {i.nom_prenom: parse_plage_horaire(i.plage_horaire_autorisee) for i in intervenants}
+
+            coordinates = [(e.latitude, e.longitude) for e in candidates] + list(homes.values())
+            matrix = TravelMatrix(coordinates, travel_times=travel_times)
+
+            # Tableaux des visites
+            current_start = np.array(current_start, dtype=np.int64)
+            duration = np.array(current_end, dtype=np.int64) - current_start
+            pinned = np.array([bool(e.binome_id) for e in candidates], dtype=bool)
+            planned = np.where(pinned, current_start, self._planned_starts(candidates, current_start, interventions))
+            search = _TourSearch(
+                matrix=matrix,
+                planned=planned,
+                duration=duration,
+                loc=np.array([matrix.index_of(e.latitude, e.longitude) for e in candidates], dtype=np.int64),
+                locked=self.locked_mask(candidates, interventions),
+                windows=windows,
+                home_idx={name: matrix.index_of(*home) for name, home in homes.items()},
+                pinned=pinned
+            )
+
+            # Tournées par (intervenant, jour)
+            tours: Dict[Tuple[str, int], List[int]] = {}
+            for idx in np.argsort(planned, kind='stable'):
+                event = candidates[idx]
+                tours.setdefault((event.intervenant, day_of(planned[idx])), []).append(int(idx))
+
+            summary["initial_travel"] = int(sum(search.tour_cost(key[0], tour) for key, tour in tours.items()))
+
+            deadline = start_time + self.time_budget_seconds
+            days = sorted({key[1] for key in tours})
+            modified = set()
+            improved = True
+            while improved and time.time() < deadline:
+                improved = False
+                for day in days:
+                    names = sorted(name for (name, d) in tours if d == day)
+                    if len(names) < 2:
+                        continue
+                    for move in (search.try_or_opt, search.try_swap, search.try_two_opt_star):
+                        changed = move(tours, names, day, deadline)
+                        if changed:
+                            improved = True
+                            summary["moves"] += len(changed) // 2
+                            modified.update(changed)
+                    if time.time() >= deadline:
+                        logger.info(f"⏱️ Budget d'optimisation atteint ({self.time_budget_seconds:.1f}s)")
+                        break
+
+            summary["final_travel"] = int(sum(search.tour_cost(key[0], tour) for key, tour in tours.items()))
+            summary["saved_minutes"] = summary["initial_travel"] - summary["final_travel"]
+
+            # Réécrire uniquement les tournées modifiées
+            colors = {}
+            for event in candidates:
+                colors.setdefault(event.intervenant, event.color)
+            for key in modified:
+                name = key[0]
+                tour = tours.get(key, [])
+                starts = search.schedule(name, tour)
+                previous_loc = None
+                for position, idx in enumerate(tour):
+                    event = candidates[idx]
+                    event.intervenant = name
+                    event.color = colors.get(name, event.color)
+                    event.start = minutes_to_iso(starts[position])
+                    event.end = minutes_to_iso(starts[position] + duration[idx])
+                    trajet = 0 if previous_loc is None else matrix.between(previous_loc, int(search.loc[idx]))
+                    event.trajet_precedent = f"{trajet} min"
+                    previous_loc = int(search.loc[idx])
+
+            summary["duration_ms"] = round((time.time() - start_time) * 1000, 1)
+            logger.info(f"🧭 Optimisation des tournées: {summary['moves']} mouvements, "
+                        f"{summary['saved_minutes']} min de trajet économisées "
+                        f"({summary['initial_travel']} → {summary['final_travel']} min) en {summary['duration_ms']}ms")
+            return planning_events, summary
+
+        except Exception as e:
+            logger.error(f"Erreur optimisation des tournées: {str(e)}")
+            return planning_events, summary
+
+    def _planned_starts(self, events: List[PlanningEvent], current_start: np.ndarray,
+                        interventions: List[Intervention]) -> np.ndarray:
+        """Heure de début prévue de chaque visite (celle de l'intervention d'origine si retrouvée)"""
+        by_client_day = {}
+        for intervention in interventions:
+            minutes = intervention.start_minutes
+            if minutes is None:
+                continue
+            by_client_day.setdefault((intervention.client, day_of(minutes)), []).append(minutes)
+
+        planned = current_start.copy()
+        for i, event in enumerate(events):
+            options = by_client_day.get((event.client, day_of(current_start[i])))
+            if options:
+                # L'heure prévue la plus proche, sans dépasser l'heure actuelle
+                earlier = [m for m in options if m <= current_start[i]]
+                planned[i] = max(earlier) if earlier else min(options)
+        return planned
+
+    def locked_mask(self, events: List[PlanningEvent], interventions: List[Intervention]) -> np.ndarray:
+        """Visites non déplaçables: intervenant imposé ou binôme (horaire illisible: non verrouillée)"""
+        locked_clients = set()
+        for intervention in interventions:
+            if (intervention.intervenant or intervention.binome) and intervention.start_minutes is not None:
+                locked_clients.add((intervention.client, day_of(intervention.start_minutes)))
+        mask = np.zeros(len(events), dtype=bool)
+        for position, event in enumerate(events):
+            if event.binome_id:
+                mask[position] = True
+                continue
+            try:
+                mask[position] = (event.client, day_of(event.start_minutes)) in locked_clients
+            except ValueError:
+                continue
+        return mask
+
+# Instance globale de l'optimiseur de tournées
+route_optimizer = RouteOptimizer()
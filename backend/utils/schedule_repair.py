@@ -0,0 +1,221 @@
+import bisect
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from models import Intervenant, NON_PLANIFIABLE_COLOR
+from utils.event_table import EventTable
+from utils.time_utils import (
+    day_of, parse_plage_horaire, within_plage, ends_before_day_end,
+    MINUTES_PER_DAY, START_TOLERANCE_MINUTES, MAX_DAILY_MINUTES
+)
+from utils.travel_matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """Visite occupant un créneau dans la chronologie d'un intervenant"""
+    __slots__ = ('position', 'origin', 'start', 'end', 'loc', 'locked', 'pinned')
+
+    def __init__(self, position: int, start: int, end: int, loc: int, locked: bool, pinned: bool = False):
+        self.position = position
+        self.origin = start  # Heure de début de référence pour la tolérance
+        self.start = start
+        self.end = end
+        self.loc = loc
+        self.locked = locked  # Intervenant non modifiable
+        self.pinned = pinned  # Horaire non modifiable (binôme aligné sur son second intervenant)
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+class _DayIndex:
+    """Index des créneaux occupés par (intervenant, jour), trié par début: les trous sont les créneaux libres"""
+
+    def __init__(self):
+        self.timelines: Dict[Tuple[str, int], List[_Slot]] = {}
+        self.by_day: Dict[int, Set[str]] = {}
+
+    def add(self, name: str, day: int, slot: _Slot) -> None:
+        timeline = self.timelines.setdefault((name, day), [])
+        timeline.insert(bisect.bisect_right(timeline, slot.start, key=lambda s: s.start), slot)
+        self.by_day.setdefault(day, set()).add(name)
+
+    def get(self, name: str, day: int) -> List[_Slot]:
+        return self.timelines.get((name, day), [])
+
+    def worked(self, name: str, day: int) -> int:
+        """Minutes de visite déjà attribuées à l'intervenant ce jour-là"""
+        return sum(slot.duration for slot in self.get(name, day))
+
+class ScheduleRepairer:
+    """Répare les conflits d'horaires par mouvements locaux avant de marquer une visite non planifiable"""
+
+    def repair(self, table: EventTable, names: List[str], codes: np.ndarray, positions: np.ndarray,
+               starts: np.ndarray, ends: np.ndarray, locations: np.ndarray, matrix: TravelMatrix,
+               conflicting: Set[str], locked_ids: Optional[Set[str]] = None,
+               intervenants: Optional[List[Intervenant]] = None) -> Dict[str, int]:
+        """Répare les chronologies des intervenants en conflit (tableaux triés par intervenant puis début)
+
+        Sans liste d'intervenants, seuls ceux déjà présents dans le planning le jour de la visite peuvent la
+        reprendre (ni plage horaire ni domicile connus).
+        """
+        locked_ids = locked_ids or set()
+        # Effectif complet: plage horaire et domicile (index dans la matrice) de chaque intervenant
+        roster = {i.nom_prenom: (parse_plage_horaire(i.plage_horaire_autorisee), matrix.index_of(i.latitude, i.longitude))
+                  for i in intervenants or []}
+        summary = {"shifted": 0, "swapped": 0, "reassigned": 0, "flagged": 0}
+
+        in_binome = table.binomes.codes != table.binomes.code_of(None)
+        index = _DayIndex()
+        for k in range(len(positions)):
+            position = int(positions[k])
+            binome = bool(in_binome[position])
+            slot = _Slot(position, int(starts[k]), int(ends[k]), int(locations[k]),
+                         table.ids[position] in locked_ids or binome, binome)
+            index.add(names[codes[k]], day_of(slot.start), slot)
+
+        assignments: Dict[int, str] = {}
+        flagged: Dict[int, str] = {}
+        touched: Set[Tuple[str, int]] = set()
+
+        for name, day in sorted(key for key in index.timelines if key[0] in conflicting):
+            timeline = index.get(name, day)
+            i = 1
+            while i < len(timeline):
+                prev, cur = timeline[i - 1], timeline[i]
+                required = prev.end + matrix.between(prev.loc, cur.loc)
+                if required <= cur.start:
+                    i += 1
+                    continue
+                touched.add((name, day))
+
+                # 1. Décalage dans la tolérance de début (5 à 10 min)
+                if not cur.pinned and required <= cur.origin + START_TOLERANCE_MINUTES \
+                        and self._fits_day(required + cur.duration, day):
+                    cur.start, cur.end = required, required + cur.duration
+                    summary["shifted"] += 1
+                    i += 1
+                    continue
+
+                # 2. Inversion avec la visite précédente
+                if not (cur.pinned or prev.pinned) and self._try_swap(timeline, i, matrix, day):
+                    summary["swapped"] += 1
+                    i += 1
+                    continue
+
+                # 3. Réattribution à l'intervenant libre le plus proche (visite courante, sinon la précédente)
+                moved = None
+                if not cur.locked:
+                    moved = self._try_reassign(cur, name, day, index, matrix, roster)
+                    if moved:
+                        timeline.pop(i)
+                        assignments[cur.position] = moved
+                elif not prev.locked:
+                    moved = self._try_reassign(prev, name, day, index, matrix, roster)
+                    if moved:
+                        timeline.pop(i - 1)
+                        assignments[prev.position] = moved
+                        i = max(i - 1, 1)
+                if moved:
+                    touched.add((moved, day))
+                    summary["reassigned"] += 1
+                    continue
+
+                # 4. Aucun mouvement possible: visite non planifiable
+                timeline.pop(i)
+                flagged[cur.position] = "Conflit horaire sans créneau libre (trajet inclus)"
+                summary["flagged"] += 1
+
+        self._apply(table, index, touched, assignments, flagged, matrix)
+        return summary
+
+    def _fits_day(self, end: int, day: int) -> bool:
+        """Vérifie que la visite se termine avant la fin des heures de travail"""
+        return ends_before_day_end(end, day)
+
+    def _try_swap(self, timeline: List[_Slot], i: int, matrix: TravelMatrix, day: int) -> bool:
+        """Place la visite courante avant la précédente si les deux restent dans la tolérance"""
+        prev, cur = timeline[i - 1], timeline[i]
+        before = timeline[i - 2] if i >= 2 else None
+
+        cur_start = cur.origin if before is None else max(cur.origin, before.end + matrix.between(before.loc, cur.loc))
+        if cur_start > cur.origin + START_TOLERANCE_MINUTES:
+            return False
+        prev_start = max(prev.origin, cur_start + cur.duration + matrix.between(cur.loc, prev.loc))
+        if prev_start > prev.origin + START_TOLERANCE_MINUTES or not self._fits_day(prev_start + prev.duration, day):
+            return False
+
+        prev.start, prev.end = prev_start, prev_start + prev.duration
+        cur.start, cur.end = cur_start, cur_start + cur.duration
+        timeline[i - 1], timeline[i] = cur, prev
+        return True
+
+    def _try_reassign(self, slot: _Slot, owner: str, day: int, index: _DayIndex, matrix: TravelMatrix,
+                      roster: Dict[str, Tuple[Optional[Tuple[int, int]], int]]) -> Optional[str]:
+        """Insère la visite dans le créneau libre le moins coûteux d'un autre intervenant, libre toute la journée
+        compris (plage horaire, départ du domicile et maximum journalier respectés)"""
+        def leg(origin: int, destination: int) -> int:
+            # Domicile inconnu: trajet non compté
+            return matrix.between(origin, destination) if origin >= 0 and destination >= 0 else 0
+
+        best = None
+        for name in sorted(set(roster) | index.by_day.get(day, set())):
+            if name == owner:
+                continue
+            window, home = roster.get(name, (None, -1))
+            if index.worked(name, day) + slot.duration > MAX_DAILY_MINUTES:
+                continue
+            timeline = index.get(name, day)
+            position = bisect.bisect_left(timeline, slot.origin, key=lambda s: s.start)
+            before = timeline[position - 1] if position > 0 else None
+            after = timeline[position] if position < len(timeline) else None
+            previous_loc = before.loc if before else home
+            next_loc = after.loc if after else home
+
+            travel_in = leg(previous_loc, slot.loc)
+            if before is None:
+                start = slot.origin
+                # Première visite: joignable depuis le domicile en partant au début de la plage horaire
+                if window and window[0] + travel_in > start % MINUTES_PER_DAY + START_TOLERANCE_MINUTES:
+                    continue
+            else:
+                start = max(slot.origin, before.end + travel_in)
+            if start > slot.origin + START_TOLERANCE_MINUTES or not self._fits_day(start + slot.duration, day) \
+                    or not within_plage(start, slot.duration, window):
+                continue
+            travel_out = leg(slot.loc, next_loc)
+            if after is not None and start + slot.duration + travel_out > after.start:
+                continue
+            cost = travel_in + travel_out - leg(previous_loc, next_loc)
+            if best is None or cost < best[0]:
+                best = (cost, name, start)
+
+        if best is None:
+            return None
+        _, name, start = best
+        slot.start, slot.end = start, start + slot.duration
+        index.add(name, day, slot)
+        return name
+
+    def _apply(self, table: EventTable, index: _DayIndex, touched: Set[Tuple[str, int]],
+               assignments: Dict[int, str], flagged: Dict[int, str], matrix: TravelMatrix) -> None:
+        """Reporte horaires, intervenants et trajets sur les événements des journées modifiées"""
+        for key in touched:
+            previous = None
+            for slot in index.get(*key):
+                table.set_times(slot.position, slot.start, slot.end)
+                if slot.position in assignments:
+                    table.intervenants[slot.position] = assignments[slot.position]
+                table.trajets[slot.position] = "0 min" if previous is None else f"{matrix.between(previous.loc, slot.loc)} min"
+                previous = slot
+
+        for position, raison in flagged.items():
+            logger.warning(f"Intervention {table.clients[position]} marquée non planifiable: {raison}")
+            table.flag(position, raison, NON_PLANIFIABLE_COLOR)
+
+# Instance globale du service de réparation des plannings
+schedule_repairer = ScheduleRepairer()
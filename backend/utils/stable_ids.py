@@ -0,0 +1,37 @@
+import hashlib
+from typing import Any, Container, Optional, Union
+
+ID_DIGEST_BYTES = 8  # 16 caractères hexadécimaux
+KEY_SEPARATOR = '\x1f'
+
+def stable_id(*parts: Any) -> str:
+    """Identifiant déterministe: empreinte BLAKE2b des éléments d'une clé naturelle"""
+    key = KEY_SEPARATOR.join('' if part is None else str(part) for part in parts)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=ID_DIGEST_BYTES).hexdigest()
+
+def _coordinate(value: float) -> str:
+    # Arrondi au micro-degré (~10 cm): 48.5734 et 48.57340000001 désignent le même lieu
+    return f"{float(value):.6f}"
+
+def visit_id(client: str, start: Optional[Union[int, str]], latitude: float, longitude: float) -> str:
+    """Identifiant d'une visite: client, début (minutes depuis l'epoch, sinon texte brut) et lieu
+
+    Une intervention et l'événement de planning qui la place au même horaire partagent le même identifiant.
+    """
+    return stable_id('visite', client.strip(), start, _coordinate(latitude), _coordinate(longitude))
+
+def intervenant_id(nom_prenom: str) -> str:
+    """Identifiant d'un intervenant, dérivé de son nom"""
+    return stable_id('intervenant', ' '.join(nom_prenom.split()))
+
+def derived_id(parent_id: str, *qualifiers: Any) -> str:
+    """Identifiant rattaché à un autre (second poste d'un binôme, identifiant de binôme...)"""
+    return stable_id(parent_id, *qualifiers)
+
+def unique_id(base_id: str, taken: Container[str]) -> str:
+    """Identifiant libre dans un planning: les occurrences suivantes d'une même clé sont numérotées"""
+    candidate, occurrence = base_id, 1
+    while candidate in taken:
+        candidate = derived_id(base_id, occurrence)
+        occurrence += 1
+    return candidate
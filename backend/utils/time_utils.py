@@ -0,0 +1,96 @@
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# Référence commune pour les horaires exprimés en minutes entières
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+
+# Décalage maximal autorisé de l'heure de début (cf. prompt: 5 à 10 minutes)
+START_TOLERANCE_MINUTES = 10
+
+MAX_DAILY_MINUTES = 13 * 60  # Maximum légal de 13h de travail par jour
+END_OF_DAY_MINUTES = 22 * 60  # Fin des heures de travail (22h)
+
+def iso_to_minutes(value: str) -> int:
+    """Convertit une date ISO ("2025-06-29T08:00:00") en minutes depuis l'epoch"""
+    dt = datetime.fromisoformat(value.replace('Z', ''))
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None)
+    return int((dt - EPOCH).total_seconds() // 60)
+
+def minutes_to_datetime(minutes: int) -> datetime:
+    """Convertit des minutes depuis l'epoch en datetime (naïf)"""
+    return EPOCH + timedelta(minutes=int(minutes))
+
+def minutes_to_iso(minutes: int) -> str:
+    """Convertit des minutes depuis l'epoch en date ISO complète "YYYY-MM-DDTHH:MM:SS" """
+    return minutes_to_datetime(minutes).isoformat()
+
+def intervention_date_to_minutes(value: str) -> int:
+    """Convertit une date d'intervention ("29/06/2025 08:00") en minutes depuis l'epoch"""
+    dt = datetime.strptime(value.strip(), "%d/%m/%Y %H:%M")
+    return int((dt - EPOCH).total_seconds() // 60)
+
+def duree_to_minutes(value: str) -> int:
+    """Convertit une durée "HH:MM" en minutes"""
+    hours, minutes = value.strip().split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+def day_of(minutes: int) -> int:
+    """Retourne l'index du jour (jours depuis l'epoch) d'un horaire en minutes"""
+    return int(minutes) // MINUTES_PER_DAY
+
+def day_bounds(day: int) -> Tuple[int, int]:
+    """Retourne les bornes [début, fin) d'un jour en minutes depuis l'epoch"""
+    return day * MINUTES_PER_DAY, (day + 1) * MINUTES_PER_DAY
+
+def within_plage(start: int, duration: int, window: Optional[Tuple[int, int]]) -> bool:
+    """Vérifie qu'une visite tient dans une plage horaire autorisée (minutes depuis minuit, None: pas de plage)"""
+    if not window:
+        return True
+    minute_of_day = int(start) % MINUTES_PER_DAY
+    return window[0] <= minute_of_day and minute_of_day + duration <= window[1]
+
+def ends_before_day_end(end: int, day: int) -> bool:
+    """Vérifie qu'une visite se termine avant la fin des heures de travail de sa journée"""
+    return end - day * MINUTES_PER_DAY <= END_OF_DAY_MINUTES
+
+def parse_trajet_minutes(value) -> int:
+    """Extrait le nombre de minutes d'un trajet au format "X min" """
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = ''.join(ch for ch in str(value) if ch.isdigit())
+    return int(digits) if digits else 0
+
+def parse_plage_horaire(value: str) -> Optional[Tuple[int, int]]:
+    """Convertit une plage horaire "14h00-22h00" en bornes (minutes depuis minuit)"""
+    if not value:
+        return None
+    try:
+        debut, fin = value.replace(' ', '').lower().split('-')
+
+        def to_minutes(part: str) -> int:
+            hours, _, minutes = part.partition('h')
+            return int(hours) * 60 + (int(minutes) if minutes else 0)
+
+        return to_minutes(debut), to_minutes(fin)
+    except (ValueError, AttributeError):
+        return None
+
+def parse_heures_contrat(value) -> Optional[int]:
+    """Convertit un volume horaire de contrat ("35h", "151h30", "37,5") en minutes"""
+    if value is None:
+        return None
+    match = re.search(r'(\d+)(?:[.,](\d+))?\s*(?:h\s*(\d{1,2}))?', str(value).lower())
+    if not match:
+        return None
+    hours, decimals, minutes = match.groups()
+    total = int(hours) * 60
+    if decimals:
+        total += round(float(f"0.{decimals}") * 60)
+    if minutes:
+        total += int(minutes)
+    return total or None
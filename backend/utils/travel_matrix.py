@@ -0,0 +1,76 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.travel_cache_service import travel_cache_service
+
+logger = logging.getLogger(__name__)
+
+# Temps de repli quand un trajet est absent du cache (même valeur que le fallback OSRM)
+DEFAULT_TRAVEL_MINUTES = 15
+
+def coordinate_key(lat: float, lon: float) -> str:
+    """Clé de coordonnées identique à celle du cache des trajets"""
+    return f"{lat:.6f},{lon:.6f}"
+
+class TravelMatrix:
+    """Matrice dense des temps de trajet (en minutes) indexée par coordonnées"""
+
+    def __init__(self, coordinates: Iterable[Tuple[float, float]],
+                 travel_times: Optional[Dict[str, Dict[str, int]]] = None,
+                 default_minutes: int = DEFAULT_TRAVEL_MINUTES):
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+        for lat, lon in coordinates:
+            key = coordinate_key(lat, lon)
+            if key not in self.index:
+                self.index[key] = len(self.keys)
+                self.keys.append(key)
+
+        self.default_minutes = default_minutes
+        self.missing_routes = 0
+
+        size = len(self.keys)
+        self.minutes = np.full((size, size), default_minutes, dtype=np.int32)
+        np.fill_diagonal(self.minutes, 0)
+
+        # Par défaut, lecture directe du cache persistant (pas d'appel OSRM)
+        source = travel_times if travel_times is not None else travel_cache_service.cache_dict
+        for i, origin in enumerate(self.keys):
+            row = source.get(origin)
+            if not row:
+                self.missing_routes += size - 1
+                continue
+            for j, destination in enumerate(self.keys):
+                if i == j:
+                    continue
+                value = row.get(destination)
+                if value is None:
+                    self.missing_routes += 1
+                else:
+                    self.minutes[i, j] = int(value)
+
+        if self.missing_routes:
+            logger.debug(f"Matrice de trajets: {self.missing_routes} trajets absents, {default_minutes} min par défaut")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def index_of(self, lat: float, lon: float) -> int:
+        """Retourne l'index matriciel d'une coordonnée (-1 si inconnue)"""
+        return self.index.get(coordinate_key(lat, lon), -1)
+
+    def between(self, i: int, j: int) -> int:
+        """Temps de trajet entre deux index (défaut si l'un des deux est inconnu)"""
+        if i < 0 or j < 0:
+            return 0 if i == j and i >= 0 else self.default_minutes
+        return int(self.minutes[i, j])
+
+    def travel(self, lat1: float, lon1: float, lat2: float, lon2: float) -> int:
+        """Temps de trajet entre deux coordonnées"""
+        i = self.index_of(lat1, lon1)
+        j = self.index_of(lat2, lon2)
+        if i < 0 and j < 0 and coordinate_key(lat1, lon1) == coordinate_key(lat2, lon2):
+            return 0
+        return self.between(i, j)
@@ -0,0 +1,246 @@
+import bisect
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from models import EventMove, PlanningEvent, ValidationConflict
+from utils.time_utils import iso_to_minutes, day_of
+from utils.travel_cache_service import travel_cache_service
+from utils.travel_matrix import DEFAULT_TRAVEL_MINUTES, coordinate_key
+
+logger = logging.getLogger(__name__)
+
+class ValidationSession:
+    """Planning en cours d'édition: intervalles triés par intervenant pour valider chaque modification localement"""
+
+    def __init__(self, session_id: str, planning_events: List[PlanningEvent]):
+        self.session_id = session_id
+        self.events: Dict[str, PlanningEvent] = {}
+        self.intervals: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.binomes: Dict[str, Set[str]] = {}
+        self.updated_at = datetime.now()
+        for event in planning_events:
+            if event.id in self.events:
+                raise ValueError(f"Identifiant d'événement en double: {event.id}")
+            self.events[event.id] = event
+            self._index(event)
+
+    def insert(self, event: PlanningEvent) -> List[ValidationConflict]:
+        """Ajoute un événement et retourne les conflits qu'il introduit"""
+        if event.id in self.events:
+            raise ValueError(f"L'événement {event.id} existe déjà")
+        self._entry(event)  # Horaire illisible: ValueError avant toute modification de la session
+        self.events[event.id] = event
+        self._index(event)
+        self.updated_at = datetime.now()
+        return self.conflicts_for(event.id)
+
+    def move(self, event_id: str, move: EventMove) -> List[ValidationConflict]:
+        """Déplace un événement (horaire et/ou intervenant) et retourne les conflits introduits"""
+        event = self.events[event_id]
+        start, end = iso_to_minutes(move.start), iso_to_minutes(move.end)
+        if end <= start:
+            raise ValueError("L'heure de fin doit être postérieure à l'heure de début")
+
+        self._unindex(event)
+        event.start, event.end = move.start, move.end
+        if move.intervenant:
+            event.intervenant = move.intervenant
+        self._index(event)
+        self.updated_at = datetime.now()
+        return self.conflicts_for(event_id)
+
+    def delete(self, event_id: str) -> List[ValidationConflict]:
+        """Supprime un événement (une suppression n'introduit aucun conflit, sauf binôme devenu incomplet)"""
+        event = self.events[event_id]
+        self._unindex(event)
+        del self.events[event_id]
+        self.updated_at = datetime.now()
+
+        conflicts = []
+        for partner_id in self.binomes.get(event.binome_id, ()):
+            partner = self.events[partner_id]
+            conflicts.append(ValidationConflict(
+                type="binome_desaligne",
+                intervenant=partner.intervenant,
+                event_id=partner_id,
+                other_event_id=event_id,
+                message=f"Binôme {partner.client}: second intervenant supprimé"
+            ))
+        return conflicts
+
+    def conflicts_for(self, event_id: str) -> List[ValidationConflict]:
+        """Conflits entre un événement et ses voisins dans la chronologie de son intervenant"""
+        event = self.events[event_id]
+        conflicts = []
+        intervals = self.intervals.get(event.intervenant)
+        if intervals is not None and not event.non_planifiable:
+            start, end = event.start_minutes, event.end_minutes
+            position = bisect.bisect_left(intervals, (start, end, event_id))
+
+            if position > 0:
+                conflict = self._check_previous(event.intervenant, intervals[position - 1],
+                                                self._latest_before(intervals, position), intervals[position])
+                if conflict:
+                    conflicts.append(conflict)
+            # Tous les suivants qui chevauchent, puis le premier suivant pour le trajet
+            for following in intervals[position + 1:]:
+                conflict = self._check_pair(event.intervenant, intervals[position], following)
+                if conflict:
+                    conflicts.append(conflict)
+                if following[0] >= end:
+                    break
+
+        conflicts.extend(self._check_binome(event))
+        return conflicts
+
+    def all_conflicts(self) -> List[ValidationConflict]:
+        """Conflits de tout le planning (balayage des intervalles triés de chaque intervenant)"""
+        conflicts = []
+        for intervenant, intervals in self.intervals.items():
+            latest = None  # Intervalle de fin la plus tardive depuis le début de la journée
+            for previous, current in zip(intervals, intervals[1:]):
+                if latest is None or day_of(latest[0]) != day_of(previous[0]) or previous[1] > latest[1]:
+                    latest = previous
+                conflict = self._check_previous(intervenant, previous, latest, current)
+                if conflict:
+                    conflicts.append(conflict)
+        for members in self.binomes.values():
+            if members:
+                conflicts.extend(self._check_binome(self.events[min(members)]))
+        return conflicts
+
+    def _latest_before(self, intervals: List[Tuple[int, int, str]], position: int) -> Tuple[int, int, str]:
+        """Intervalle de fin la plus tardive parmi ceux qui précèdent la position le même jour"""
+        latest = intervals[position - 1]
+        day = day_of(latest[0])
+        for previous in reversed(intervals[:position - 1]):
+            if day_of(previous[0]) != day:
+                break
+            if previous[1] > latest[1]:
+                latest = previous
+        return latest
+
+    def _check_previous(self, intervenant: str, previous: Tuple[int, int, str], latest: Tuple[int, int, str],
+                        current: Tuple[int, int, str]) -> Optional[ValidationConflict]:
+        """Vérifie un événement contre ses prédécesseurs: chevauchement avec celui qui finit le plus tard
+        (une longue visite peut en englober plusieurs), trajet depuis le précédent immédiat"""
+        conflict = self._check_pair(intervenant, latest, current) if latest is not previous else None
+        return conflict or self._check_pair(intervenant, previous, current)
+
+    def _check_pair(self, intervenant: str, previous: Tuple[int, int, str],
+                    current: Tuple[int, int, str]) -> Optional[ValidationConflict]:
+        """Vérifie que l'intervenant peut enchaîner deux événements (trajet compris)"""
+        if day_of(previous[0]) != day_of(current[0]):
+            return None
+        travel = self._travel(self.events[previous[2]], self.events[current[2]])
+        missing = previous[1] + travel - current[0]
+        if missing <= 0:
+            return None
+
+        prev_event, curr_event = self.events[previous[2]], self.events[current[2]]
+        if previous[1] > current[0]:
+            return ValidationConflict(
+                type="chevauchement",
+                intervenant=intervenant,
+                event_id=current[2],
+                other_event_id=previous[2],
+                missing_minutes=missing,
+                message=f"{prev_event.client} se termine à {prev_event.end}, {curr_event.client} commence à {curr_event.start}"
+            )
+        return ValidationConflict(
+            type="trajet_insuffisant",
+            intervenant=intervenant,
+            event_id=current[2],
+            other_event_id=previous[2],
+            missing_minutes=missing,
+            message=f"Trajet de {travel} min entre {prev_event.client} et {curr_event.client}: il manque {missing} min"
+        )
+
+    def _check_binome(self, event: PlanningEvent) -> List[ValidationConflict]:
+        """Vérifie que les deux intervenants d'un binôme restent alignés"""
+        if not event.binome_id:
+            return []
+        conflicts = []
+        for partner_id in self.binomes.get(event.binome_id, ()):
+            if partner_id == event.id:
+                continue
+            partner = self.events[partner_id]
+            if (partner.start, partner.end) != (event.start, event.end) or partner.intervenant == event.intervenant:
+                conflicts.append(ValidationConflict(
+                    type="binome_desaligne",
+                    intervenant=event.intervenant,
+                    event_id=event.id,
+                    other_event_id=partner_id,
+                    message=f"Binôme {event.client}: {event.intervenant} et {partner.intervenant} ne sont pas alignés"
+                ))
+        return conflicts
+
+    def _travel(self, origin: PlanningEvent, destination: PlanningEvent) -> int:
+        """Temps de trajet depuis le cache persistant (défaut si absent)"""
+        if coordinate_key(origin.latitude, origin.longitude) == coordinate_key(destination.latitude, destination.longitude):
+            return 0
+        minutes = travel_cache_service.get_travel_time(origin.latitude, origin.longitude,
+                                                       destination.latitude, destination.longitude)
+        return DEFAULT_TRAVEL_MINUTES if minutes is None else int(minutes)
+
+    def _entry(self, event: PlanningEvent) -> Optional[Tuple[int, int, str]]:
+        """Intervalle d'un événement dans la chronologie de son intervenant (None s'il n'y figure pas)"""
+        if event.non_planifiable or not event.intervenant or event.intervenant == "Non assigné":
+            return None
+        return event.start_minutes, event.end_minutes, event.id
+
+    def _index(self, event: PlanningEvent) -> None:
+        entry = self._entry(event)
+        if event.binome_id:
+            self.binomes.setdefault(event.binome_id, set()).add(event.id)
+        if entry is not None:
+            bisect.insort(self.intervals.setdefault(event.intervenant, []), entry)
+
+    def _unindex(self, event: PlanningEvent) -> None:
+        if event.binome_id:
+            self.binomes.get(event.binome_id, set()).discard(event.id)
+        intervals = self.intervals.get(event.intervenant)
+        if not intervals:
+            return
+        entry = (event.start_minutes, event.end_minutes, event.id)
+        position = bisect.bisect_left(intervals, entry)
+        if position < len(intervals) and intervals[position] == entry:
+            intervals.pop(position)
+
+class ValidationSessionManager:
+    """Sessions de validation incrémentale conservées en mémoire"""
+
+    def __init__(self):
+        self.session_ttl = timedelta(minutes=int(os.getenv('VALIDATION_SESSION_TTL_MINUTES', '120')))
+        self.sessions: Dict[str, ValidationSession] = {}
+
+    def create(self, planning_events: List[PlanningEvent]) -> ValidationSession:
+        """Ouvre une session sur un planning"""
+        self.purge_expired()
+        session = ValidationSession(str(uuid.uuid4()), planning_events)
+        self.sessions[session.session_id] = session
+        logger.info(f"🧩 Session de validation {session.session_id} ouverte ({len(planning_events)} événements)")
+        return session
+
+    def get(self, session_id: str) -> Optional[ValidationSession]:
+        """Retourne une session active"""
+        return self.sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        """Ferme une session"""
+        return self.sessions.pop(session_id, None) is not None
+
+    def purge_expired(self) -> None:
+        """Supprime les sessions inactives depuis plus que la durée de conservation"""
+        limit = datetime.now() - self.session_ttl
+        expired = [sid for sid, session in self.sessions.items() if session.updated_at < limit]
+        for session_id in expired:
+            del self.sessions[session_id]
+        if expired:
+            logger.info(f"🧹 {len(expired)} session(s) de validation expirée(s) supprimée(s)")
+
+# Instance globale du gestionnaire de sessions de validation
+validation_session_manager = ValidationSessionManager()
@@ -0,0 +1,121 @@
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from models import Intervenant, IntervenantWorkload, PlanningEvent
+from utils.event_table import EventTable
+from utils.time_utils import EPOCH, MINUTES_PER_DAY, parse_trajet_minutes, parse_heures_contrat
+
+logger = logging.getLogger(__name__)
+
+def _format_minutes(minutes: int) -> str:
+    """Formate une durée en "37h10" """
+    return f"{int(minutes) // 60}h{int(minutes) % 60:02d}"
+
+class WorkloadLedger:
+    """Comptabilité vectorisée du temps de travail (interventions + trajets) par semaine ISO et par mois"""
+
+    def compute(self, planning_events: Union[EventTable, Sequence[PlanningEvent]],
+                intervenants: Optional[List[Intervenant]] = None) -> List[IntervenantWorkload]:
+        """Calcule la charge de chaque intervenant et signale les dépassements de contrat"""
+        intervenants = intervenants or []
+        table = EventTable.of(planning_events)
+        rows = np.flatnonzero(table.planned)
+        event_codes = table.intervenants.codes[rows]
+        names = [table.intervenants.values[code] for code in np.unique(event_codes)]
+
+        # Tous les intervenants connus figurent dans le bilan, même sans intervention
+        all_names = sorted(set(names) | {i.nom_prenom for i in intervenants})
+        if not all_names:
+            return []
+        name_index = {name: k for k, name in enumerate(all_names)}
+        count = len(all_names)
+
+        weekly_contract = np.zeros(count, dtype=np.int64)
+        monthly_contract = np.zeros(count, dtype=np.int64)
+        for intervenant in intervenants:
+            k = name_index[intervenant.nom_prenom]
+            weekly_contract[k] = parse_heures_contrat(intervenant.heure_hebdomaire) or 0
+            monthly_contract[k] = parse_heures_contrat(intervenant.heure_mensuel) or 0
+
+        # Codes de la table de chaînes -> rang alphabétique; trajets convertis une fois par libellé distinct
+        remap = np.zeros(len(table.intervenants.values), dtype=np.int64)
+        for name in names:
+            remap[table.intervenants.code_of(name)] = name_index[name]
+        codes = remap[event_codes]
+        starts = table.starts[rows]
+        work = table.ends[rows] - starts
+        trajet_minutes = np.array([parse_trajet_minutes(label) for label in table.trajets.values], dtype=np.int64)
+        travel = trajet_minutes[table.trajets.codes[rows]]
+        load = work + travel
+
+        days = starts // MINUTES_PER_DAY
+        weeks = days - (days + 3) % 7  # Lundi de la semaine ISO (le 01/01/1970 est un jeudi)
+        months = (np.datetime64('1970-01-01', 'D') + days).astype('datetime64[M]').astype(np.int64)
+
+        work_total = np.bincount(codes, weights=work, minlength=count).astype(np.int64)
+        travel_total = np.bincount(codes, weights=travel, minlength=count).astype(np.int64)
+
+        overruns: Dict[int, List[str]] = {}
+        weekly_peak = self._peak_utilisation(codes, weeks, load, weekly_contract, count, overruns, self._week_label)
+        monthly_peak = self._peak_utilisation(codes, months, load, monthly_contract, count, overruns, self._month_label)
+
+        workloads = []
+        for k, name in enumerate(all_names):
+            workloads.append(IntervenantWorkload(
+                intervenant=name,
+                minutes_travail=int(work_total[k]),
+                minutes_trajet=int(travel_total[k]),
+                contrat_hebdo_minutes=int(weekly_contract[k]) or None,
+                contrat_mensuel_minutes=int(monthly_contract[k]) or None,
+                utilisation_hebdo=round(float(weekly_peak[k]), 1),
+                utilisation_mensuelle=round(float(monthly_peak[k]), 1),
+                depassements=overruns.get(k, [])
+            ))
+
+        total_overruns = sum(len(labels) for labels in overruns.values())
+        if total_overruns:
+            logger.warning(f"⚠️ {total_overruns} dépassement(s) de contrat horaire détecté(s)")
+            for k, labels in overruns.items():
+                for label in labels:
+                    logger.warning(f"   ⏱️ {all_names[k]} - {label}")
+        return workloads
+
+    def _peak_utilisation(self, codes: np.ndarray, periods: np.ndarray, load: np.ndarray, contract: np.ndarray,
+                          count: int, overruns: Dict[int, List[str]], label) -> np.ndarray:
+        """Charge par (intervenant, période) et taux d'utilisation de la période la plus chargée"""
+        peak = np.zeros(count, dtype=np.float64)
+        if len(codes) == 0:
+            return peak
+
+        keys, inverse = np.unique(np.stack([codes, periods], axis=1), axis=0, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=load).astype(np.int64)
+        key_codes, key_periods = keys[:, 0], keys[:, 1]
+
+        has_contract = contract[key_codes] > 0
+        rate = np.zeros(len(totals), dtype=np.float64)
+        rate[has_contract] = totals[has_contract] * 100.0 / contract[key_codes][has_contract]
+        np.maximum.at(peak, key_codes, rate)
+
+        for j in np.flatnonzero(has_contract & (totals > contract[key_codes])):
+            code = int(key_codes[j])
+            overruns.setdefault(code, []).append(
+                f"{label(int(key_periods[j]))}: {_format_minutes(totals[j])} / {_format_minutes(contract[code])}"
+            )
+        return peak
+
+    def _week_label(self, monday: int) -> str:
+        year, week, _ = (EPOCH + timedelta(days=monday)).isocalendar()
+        return f"Semaine {year}-W{week:02d}"
+
+    def _month_label(self, month: int) -> str:
+        return f"Mois {np.datetime64(month, 'M')}"
+
+    def count_overruns(self, workloads: List[IntervenantWorkload]) -> int:
+        """Nombre total de semaines/mois en dépassement"""
+        return sum(len(workload.depassements) for workload in workloads)
+
+# Instance globale du registre de charge de travail
+workload_ledger = WorkloadLedger()
@@ -33,6 +33,17 @@ function App() {
     setCurrentStep(3);
   };
 
+  const handlePlanningProgress = (partialPlanning) => {
+    // Le calendrier se remplit au fur et à mesure que l'IA produit les interventions
+    // (statistiques et exports disponibles seulement une fois le planning complet)
+    setPlanningData(partialPlanning);
+    setStats(null);
+    if (!partialPlanning) {
+      // Génération en échec: le planning partiel est retiré
+      setCurrentStep(2);
+    }
+  };
+
   const handleReset = () => {
     setInterventionsFile(null);
     setIntervenantsFile(null);
@@ -186,6 +197,7 @@ function App() {
                 interventionsFile={interventionsFile}
                 intervenantsFile={intervenantsFile}
                 onPlanningGenerated={handlePlanningGenerated}
+                onPlanningProgress={handlePlanningProgress}
               />
             </div>
           )}
@@ -124,7 +124,8 @@ const ExportButtons = ({ planningData, stats }) => {
     }
   };
 
-  const isDataAvailable = planningData && planningData.length > 0;
+  // Planning complet uniquement: les statistiques n'arrivent qu'à la fin de la génération
+  const isDataAvailable = planningData && planningData.length > 0 && stats;
 
   return (
     <Card className="bg-gradient-to-br from-indigo-50 to-purple-50 border-indigo-200">
@@ -5,12 +5,11 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/
 import { Alert, AlertDescription } from './ui/alert';
 import { Badge } from './ui/badge';
 import { Progress } from './ui/progress';
-import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGenerated }) => {
+const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGenerated, onPlanningProgress }) => {
   const [processing, setProcessing] = useState(false);
   const [progress, setProgress] = useState(0);
   const [currentStep, setCurrentStep] = useState('');
@@ -159,19 +158,12 @@ const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGene
         }
       };
 
-      // Lancer simulation et appel API en parallèle
-      const [_, response] = await Promise.all([
+      // Lancer simulation et génération en streaming en parallèle
+      const [_, result] = await Promise.all([
         simulateProgress(),
-        axios.post(`${API}/upload-csv`, formData, {
-          headers: {
-            'Content-Type': 'multipart/form-data',
-          },
-          timeout: 300000, // 5 minutes timeout
-        })
+        streamPlanning(formData)
       ]);
 
-      const result = response.data;
-
       // Finalisation
       setProgress(100);
       setCurrentStep('✅ SUCCÈS COMPLET');
@@ -183,23 +175,7 @@ const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGene
       });
 
       // Convertir les données backend au format frontend
-      const frontendPlanning = result.planning.map(event => ({
-        id: event.id,
-        title: `${event.client} - ${event.intervenant}`,
-        start: event.start,
-        end: event.end,
-        backgroundColor: event.color,
-        borderColor: event.color,
-        extendedProps: {
-          client: event.client,
-          intervenant: event.intervenant,
-          address: event.adresse,
-          duration: calculateDuration(event.start, event.end),
-          nonPlanifiable: event.non_planifiable,
-          trajetPrecedent: event.trajet_precedent || "0 min",
-          raison: event.raison
-        }
-      }));
+      const frontendPlanning = result.planning.map(toFrontendEvent);
 
       setGenerationStatus({
         type: 'success',
@@ -228,6 +204,10 @@ const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGene
         type: 'error',
         message: errorMessage
       });
+      // Le planning partiel reçu avant l'erreur ne doit pas rester affiché ni exportable
+      if (onPlanningProgress) {
+        onPlanningProgress(null);
+      }
       setProgress(0);
       setCurrentStep('❌ ERREUR');
       setDetailedStep('');
@@ -245,6 +225,90 @@ const PlanningGenerator = ({ interventionsFile, intervenantsFile, onPlanningGene
     }
   };
 
+  // Lit le flux Server-Sent Events du backend et affiche les événements au fil de l'eau
+  const streamPlanning = async (formData) => {
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), 300000); // 5 minutes timeout
+
+    try {
+      const response = await fetch(`${API}/upload-csv/stream`, {
+        method: 'POST',
+        body: formData,
+        signal: controller.signal
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `Erreur HTTP ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder('utf-8');
+      const partialPlanning = [];
+      let buffer = '';
+      let result = null;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Les messages SSE sont séparés par une ligne vide
+        let separatorIndex;
+        while ((separatorIndex = buffer.indexOf('\n\n')) >= 0) {
+          const rawMessage = buffer.slice(0, separatorIndex);
+          buffer = buffer.slice(separatorIndex + 2);
+
+          let eventType = 'message';
+          let data = '';
+          rawMessage.split('\n').forEach(line => {
+            if (line.startsWith('event:')) eventType = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+          });
+          if (!data) continue;
+          const payload = JSON.parse(data);
+
+          if (eventType === 'planning_event') {
+            partialPlanning.push(toFrontendEvent(payload));
+            setDetailedStep(`📥 ${partialPlanning.length} interventions reçues de l'IA...`);
+            if (onPlanningProgress) {
+              onPlanningProgress([...partialPlanning]);
+            }
+          } else if (eventType === 'complete') {
+            result = payload;
+          } else if (eventType === 'error') {
+            throw new Error(payload.detail);
+          }
+        }
+      }
+
+      if (!result) {
+        throw new Error('Flux interrompu avant la fin de la génération du planning');
+      }
+      return result;
+    } finally {
+      clearTimeout(timeoutId);
+    }
+  };
+
+  const toFrontendEvent = (event) => ({
+    id: event.id,
+    title: `${event.client} - ${event.intervenant}`,
+    start: event.start,
+    end: event.end,
+    backgroundColor: event.color,
+    borderColor: event.color,
+    extendedProps: {
+      client: event.client,
+      intervenant: event.intervenant,
+      address: event.adresse,
+      duration: calculateDuration(event.start, event.end),
+      nonPlanifiable: event.non_planifiable,
+      trajetPrecedent: event.trajet_precedent || "0 min",
+      raison: event.raison
+    }
+  });
+
   const calculateDuration = (start, end) => {
     const startTime = new Date(start);
     const endTime = new Date(end);